@@ -0,0 +1,93 @@
+import streamlit as st
+
+import documents
+import ledger
+import metrics
+import quoting
+from mrp import MRP
+import steps
+
+
+def render_admin_page():
+    """Metrics overview for operators: timings, counters and the document cache"""
+    st.title("Performance Metrics")
+    data = metrics.REGISTRY.to_dict()
+
+    st.markdown("### Timings")
+    timings = [h for h in data['histograms'] if h['name'].endswith('_seconds')]
+    if timings:
+        st.dataframe([
+            {
+                'metric': h['name'],
+                'labels': ", ".join(f"{k}={v}" for k, v in h['labels'].items()),
+                'count': h['count'],
+                'mean ms': 1000 * h['sum'] / h['count'] if h['count'] else 0.0,
+                'p50 ms': 1000 * h['p50'],
+                'p95 ms': 1000 * h['p95'],
+                'p99 ms': 1000 * h['p99'],
+                'max ms': 1000 * h['max']
+            }
+            for h in timings
+        ])
+    else:
+        st.info("No timings recorded yet.")
+
+    st.markdown("### Session State Size")
+    for h in data['histograms']:
+        if h['name'] == 'session_state_bytes' and h['count']:
+            st.markdown(f"- Mean: {h['sum'] / h['count']:,.0f} bytes")
+            st.markdown(f"- Max: {h['max']:,.0f} bytes")
+
+    st.markdown("### Counters")
+    for c in data['counters']:
+        labels = ", ".join(f"{k}={v}" for k, v in c['labels'].items())
+        st.markdown(f"- {c['name']}{f' ({labels})' if labels else ''}: {c['value']:,}")
+
+    st.markdown("### Step Module Imports")
+    if steps.IMPORT_TIMES:
+        for module, seconds in sorted(steps.IMPORT_TIMES.items()):
+            st.markdown(f"- {module}: {1000 * seconds:.1f} ms")
+    else:
+        st.markdown("No step modules loaded yet.")
+
+    st.markdown("### Document Cache")
+    info = documents.cache_info()
+    st.markdown(
+        f"- Hits: {info['hits']:,}\n- Misses: {info['misses']:,}\n"
+        f"- Evictions: {info['evictions']:,}\n- Size: {info['size']:,} / {info['maxsize']:,}"
+    )
+
+    st.markdown("### Quote Cache")
+    info = quoting.QUOTES.cache.info()
+    st.markdown(
+        f"- Hits: {info['hits']:,}\n- Misses: {info['misses']:,}\n- Expired: {info['expirations']:,}\n"
+        f"- Evictions: {info['evictions']:,}\n- Size: {info['size']:,} / {info['maxsize']:,}, TTL {info['ttl']:g} s"
+    )
+
+    st.markdown("### Open Requisitions")
+    requisitions = MRP.requisitions()
+    if requisitions:
+        st.dataframe([
+            {'vendor': vendor, 'item': line.item, 'quantity': line.quantity, 'unit cost': line.unit_cost,
+             'lead time': line.lead_time}
+            for vendor, lines in sorted(requisitions.items())
+            for line in lines
+        ])
+    else:
+        st.markdown("No back order is short of parts.")
+
+    st.markdown("### Ledger")
+    st.dataframe([
+        {'account': account.replace('_', ' ').title(), **totals}
+        for account, totals in ledger.LEDGER.trial_balance().items()
+    ])
+    as_of = ledger.LEDGER.last_day()
+    aging = ledger.LEDGER.aging(as_of)
+    st.markdown(f"A/R aging as of {as_of or 'today'}: " + ", ".join(f"{label} days ${amount:,.0f}" for label, amount in aging.items()))
+
+    st.download_button(
+        label="💾 Download Prometheus Metrics",
+        data=metrics.REGISTRY.to_prometheus(),
+        file_name="metrics.prom",
+        mime="text/plain"
+    )
@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory import InventoryEngine  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent reservation latency of the ATP engine")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=100_000, help="reservations per thread")
+    parser.add_argument("--skus", type=int, default=500)
+    parser.add_argument("--locations", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    stock = [(f"SKU-{s}", f"LOC-{l}", 10 ** 9) for s in range(args.skus) for l in range(args.locations)]
+    engine = InventoryEngine(stock)
+    latencies = [None] * args.threads
+
+    def worker(index):
+        samples = np.empty(args.orders)
+        for n in range(args.orders):
+            started = time.perf_counter()
+            engine.reserve(f"SKU-{n % args.skus}", 1, f"{index}-{n}")
+            samples[n] = time.perf_counter() - started
+        latencies[index] = samples
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = np.concatenate(latencies) * 1e6
+    total = samples.size
+    p50, p99 = np.percentile(samples, [50, 99])
+    print(f"{total:,} reservations on {args.threads} threads in {elapsed:.2f}s ({total / elapsed:,.0f}/s)")
+    print(f"latency p50 {p50:.1f} us, p99 {p99:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+sys.path.insert(0, ROOT)
+
+# Every route through the STEPS flow: the decision taken on each branching step and the steps it visits
+PATHS = {
+    'reject': ({3: "Reject"}, (1, 2, 3, 1)),
+    'in_stock': ({3: "Approve", 4: "In Stock"}, (1, 2, 3, 4, 8, 9, 10)),
+    'production': ({3: "Approve", 4: "Out of Stock", 5: "Available"}, (1, 2, 3, 4, 5, 7, 8, 9, 10)),
+    'procurement': ({3: "Approve", 4: "Out of Stock", 5: "Not Available"}, (1, 2, 3, 4, 5, 6, 7, 8, 9, 10)),
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def _deep_size(value, seen=None):
+    """Approximate resident size of a value and everything it references"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in value)
+    elif hasattr(value, '__slots__'):
+        size += sum(_deep_size(getattr(value, name, None), seen) for name in value.__slots__)
+    return size
+
+
+class Session:
+    """One simulated trainee clicking through a path of the app"""
+
+    def __init__(self, path_name, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.path_name = path_name
+        self.decisions, self.route = PATHS[path_name]
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.done = False
+        self.step = None
+        self.visited = []
+
+    def _stock_up(self, decision):
+        """Receive the goods or parts the session's decision needs
+
+        Sessions of a worker share its INVENTORY and MRP, so without this the
+        in-stock path would quietly turn into a back order, and production into
+        procurement, once earlier sessions drain the stock.
+        """
+        from engine import new_order
+        from inventory import INVENTORY
+        from mrp import MRP
+
+        if decision == "In Stock":
+            order = new_order()
+            INVENTORY.receive(order['product'], order['quantity'])
+        elif decision == "Available":
+            key = self.app.session_state['order_key']
+            while lines := MRP.shortages(key):
+                for line in lines:
+                    MRP.receive(line.item, line.quantity)
+
+    def _timed(self, label, action, samples):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        action()
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        if self.app.exception:
+            raise RuntimeError(f"{self.path_name} session failed on {label}: {self.app.exception}")
+        samples.setdefault(label, {'wall': [], 'cpu': []})
+        samples[label]['wall'].append(wall)
+        samples[label]['cpu'].append(cpu)
+
+    def tick(self, samples):
+        """Perform the next interaction of this session"""
+        import steps  # after main() has pointed the stores at the benchmark's files
+
+        if self.step is None:
+            self._timed("first_paint", self.app.run, samples)
+            self.step = self.app.session_state['current_step']
+            self.visited.append(self.step)
+            return
+
+        step = self.step
+        if step in self.decisions:
+            self._stock_up(self.decisions[step])
+            radio = self.app.radio(key=steps.decision_key(step))
+            self._timed(f"{step}:decision", lambda: radio.set_value(self.decisions[step]).run(), samples)
+
+        button = self.app.button[0]
+        self._timed(f"{step}:proceed", lambda: button.click().run(), samples)
+        self.step = self.app.session_state['current_step']
+        self.visited.append(self.step)
+        self.done = self.step == 10 or (self.step == 1 and step == 3)
+        if self.done and tuple(self.visited) != self.route:
+            raise RuntimeError(f"{self.path_name} session visited steps {self.visited}, expected {list(self.route)}")
+
+    def memory(self):
+        state = dict(self.app.session_state.items())
+        return _deep_size(state)
+
+
+def _run_worker(paths, timeout):
+    """Drive a group of sessions round-robin so they interleave like a live class
+
+    AppTest runs scripts on a process-wide Streamlit runtime, so the sessions of
+    one worker cannot run on threads of their own: they take turns, one
+    interaction at a time. Only the workers run in parallel.
+    """
+    sessions = [Session(path_name, timeout) for path_name in paths]
+    samples = {}
+    active = list(sessions)
+    while active:
+        for session in active:
+            session.tick(samples)
+        active = [session for session in active if not session.done]
+    memory = [session.memory() for session in sessions]
+    return samples, memory
+
+
+def _stats(values):
+    values = np.asarray(values) * 1000.0
+    stats = {'count': int(values.size), 'mean': float(values.mean())}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        stats[f"p{p}"] = float(value)
+    return stats
+
+
+def run_benchmark(sessions, workers, timeout=30):
+    """Run `sessions` headless sessions spread over `workers` processes and aggregate the samples"""
+    paths = [list(PATHS)[i % len(PATHS)] for i in range(sessions)]
+    groups = [paths[i::workers] for i in range(workers) if paths[i::workers]]
+
+    started = time.perf_counter()
+    samples, memory = {}, []
+    with ProcessPoolExecutor(max_workers=len(groups)) as pool:
+        for worker_samples, worker_memory in pool.map(_run_worker, groups, [timeout] * len(groups)):
+            for label, values in worker_samples.items():
+                merged = samples.setdefault(label, {'wall': [], 'cpu': []})
+                merged['wall'].extend(values['wall'])
+                merged['cpu'].extend(values['cpu'])
+            memory.extend(worker_memory)
+    elapsed = time.perf_counter() - started
+
+    def order(label):
+        step, _, kind = label.partition(":")
+        return (0, 0, "") if label == "first_paint" else (1, int(step), kind)
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sessions': sessions,
+        'workers': len(groups),
+        'concurrency': len(groups),  # interactions in flight at once: one per worker
+        'elapsed_s': elapsed,
+        'latency_ms': {label: _stats(samples[label]['wall']) for label in sorted(samples, key=order)},
+        'cpu_ms': {label: _stats(samples[label]['cpu']) for label in sorted(samples, key=order)},
+        'session_state_bytes': {
+            'mean': float(np.mean(memory)),
+            'max': int(np.max(memory))
+        }
+    }
+
+
+def print_report(result):
+    print(f"{result['sessions']} sessions on {result['workers']} workers in {result['elapsed_s']:.1f}s")
+    print(f"Effective concurrency: {result['concurrency']} interactions at once; "
+          f"the sessions of a worker take turns")
+    print(f"{'interaction':<16}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'cpu p50':>10}")
+    for label, stats in result['latency_ms'].items():
+        cpu = result['cpu_ms'][label]
+        print(f"{label:<16}{stats['count']:>6}{stats['p50']:>10.1f}{stats['p95']:>10.1f}"
+              f"{stats['p99']:>10.1f}{cpu['p50']:>10.1f}")
+    memory = result['session_state_bytes']
+    print(f"Session state: mean {memory['mean']:,.0f} bytes, max {memory['max']:,} bytes")
+
+
+def compare(result, baseline, threshold=0.10):
+    """Print p95 latency and CPU changes against a baseline; return the regressed interactions"""
+    regressions = []
+    print(f"Comparison against baseline from {baseline['created']} (threshold {threshold:.0%})")
+    if baseline.get('concurrency', baseline['workers']) != result['concurrency']:
+        print(f"Warning: the baseline ran {baseline.get('concurrency', baseline['workers'])} interactions at once, "
+              f"this run {result['concurrency']}; latencies are not comparable")
+    for metric in ('latency_ms', 'cpu_ms'):
+        for label, stats in result[metric].items():
+            before = baseline[metric].get(label)
+            if before is None or before['p95'] == 0:
+                continue
+            change = stats['p95'] / before['p95'] - 1
+            flag = "REGRESSION" if change > threshold else ""
+            print(f"{metric:<11}{label:<16}{before['p95']:>10.1f}{stats['p95']:>10.1f}{change:>+9.1%}  {flag}")
+            if flag:
+                regressions.append((metric, label))
+    before = baseline['session_state_bytes']['mean']
+    after = result['session_state_bytes']['mean']
+    print(f"Session state bytes: {before:,.0f} -> {after:,.0f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive headless sessions through every path of the app")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--timeout", type=float, default=30, help="seconds allowed per script run")
+    parser.add_argument("--save", help="write the results to this JSON file, e.g. as a new baseline")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="p95 increase counted as a regression")
+    args = parser.parse_args(argv)
+
+    # Keep benchmark orders and document numbers out of the real databases
+    workdir = tempfile.mkdtemp(prefix="revenue-bench-")
+    os.environ['ORDER_STORE_PATH'] = os.path.join(workdir, "orders.db")
+    os.environ['DOCUMENT_NUMBERS_PATH'] = os.path.join(workdir, "document_numbers.db")
+
+    result = run_benchmark(args.sessions, args.workers, args.timeout)
+    print_report(result)
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        if compare(result, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory import InventoryEngine  # noqa: E402
+from quoting import QuoteEngine  # noqa: E402
+
+
+def catalogue(products, customers, contracts, rng):
+    """Tiered list prices in two effective periods per product, plus customer contract prices"""
+    today = date.today()
+    rows = []
+    for n in range(products):
+        product = f"SKU-{n:06d}"
+        base = rng.randrange(50, 2000)
+        for start, end, scale in ((None, today, 1.0), (today + timedelta(days=1), None, 1.05)):
+            for min_quantity, discount in ((1, 1.0), (50, 0.96), (250, 0.92), (1000, 0.88)):
+                rows.append((product, None, min_quantity, round(base * scale * discount, 2), start, end))
+    for _ in range(contracts):
+        product = f"SKU-{rng.randrange(products):06d}"
+        customer = f"Customer {rng.randrange(customers):05d}"
+        rows.append((product, customer, 1, rng.randrange(40, 1900), None, None))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure quote latency over a large tiered price catalogue")
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--customers", type=int, default=2_000)
+    parser.add_argument("--contracts", type=int, default=50_000, help="customer-specific price rows")
+    parser.add_argument("--inquiries", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=500, help="lines per quote_many call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    rows = catalogue(args.products, args.customers, args.contracts, rng)
+    inventory = InventoryEngine((f"SKU-{n:06d}", "Main", rng.randrange(0, 500)) for n in range(args.products))
+    started = time.perf_counter()
+    quotes = QuoteEngine(rows, inventory=inventory)
+    loaded = time.perf_counter() - started
+
+    # Inquiries cluster on popular products and customers, as real traffic does
+    lines = [
+        (f"Customer {int(rng.paretovariate(1.2)) % args.customers:05d}",
+         f"SKU-{int(rng.paretovariate(1.1)) % args.products:06d}",
+         rng.choice((1, 10, 60, 300, 1200)))
+        for _ in range(args.inquiries)
+    ]
+
+    latencies = []
+    for line in lines:
+        started = time.perf_counter()
+        quotes.quote(*line)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    started = time.perf_counter()
+    for start in range(0, len(lines), args.batch):
+        quotes.quote_many(lines[start:start + args.batch])
+    batched = time.perf_counter() - started
+
+    info = quotes.cache.info()
+    print(f"Loaded {len(rows):,} price rows in {loaded * 1000:.0f} ms")
+    print(
+        f"{len(lines):,} single quotes: mean {statistics.fmean(latencies) * 1e6:.1f} us, "
+        f"p50 {latencies[len(latencies) // 2] * 1e6:.1f} us, p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us"
+    )
+    print(f"Batches of {args.batch}: {batched / len(lines) * 1e6:.1f} us per line")
+    print(f"Price cache: {info['hits']:,} hits, {info['misses']:,} misses, {info['size']:,} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from business_days import CALENDAR  # noqa: E402
+from scheduling import DEFAULT_WORK_CENTERS, HORIZON_DAYS, ProductionScheduler  # noqa: E402
+
+
+def run(args, load):
+    """Schedule, then cancel, the orders with the bottleneck at `load`"""
+    rng = random.Random(args.seed)
+    quantities = [rng.randrange(10, 200) for _ in range(args.orders)]
+    # Scale the default work centers so the bottleneck runs at `load` over --days
+    bottleneck = min(capacity for _, capacity, _ in DEFAULT_WORK_CENTERS)
+    scale = sum(quantities) / (bottleneck * load * args.days)
+    scheduler = ProductionScheduler(
+        [(name, math.ceil(capacity * scale), cost) for name, capacity, cost in DEFAULT_WORK_CENTERS], args.rule,
+        horizon=args.horizon
+    )
+    start = CALENDAR.index(date.today())
+    orders = []
+    for n, quantity in enumerate(quantities):
+        release = start + rng.randrange(args.days)
+        due = release + rng.randrange(5, 40)
+        orders.append((n, quantity, CALENDAR.nth(release), CALENDAR.nth(due)))
+
+    def timed(calls):
+        samples = np.empty(len(calls))
+        reloads = scheduler.reloads
+        for i, (call, call_args) in enumerate(calls):
+            started = time.perf_counter()
+            call(*call_args)
+            samples[i] = time.perf_counter() - started
+        return samples * 1e6, (scheduler.reloads - reloads) / len(calls)
+
+    results = [("schedule", *timed([(scheduler.schedule, order) for order in orders]))]
+    cancelled = rng.sample(range(args.orders), int(args.orders * args.cancel))
+    results.append(("cancel", *timed([(scheduler.cancel, (key,)) for key in cancelled])))
+
+    print(f"Bottleneck at {load:.0%} of capacity:")
+    for name, samples, reloads in results:
+        p50, p99 = np.percentile(samples, [50, 99])
+        print(
+            f"  {samples.size:,} {name} calls in {samples.sum() / 1e6:.2f}s: latency p50 {p50:.1f} us, "
+            f"p99 {p99:.1f} us, {reloads:.1f} orders (re)loaded per call"
+        )
+    utilization = scheduler.utilization(date.today(), args.days)
+    late = sum(1 for n in range(args.orders) if scheduler.shortfall(n))
+    print("  utilization: " + ", ".join(f"{name} {share:.0%}" for name, share in utilization.items())
+          + f"; {late:,} orders past the horizon")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add and cancel latency of the production scheduler")
+    parser.add_argument("--orders", type=int, default=2_000, help="production orders to schedule")
+    parser.add_argument("--cancel", type=float, default=0.1, help="share of orders cancelled afterwards")
+    parser.add_argument("--rule", choices=("edd", "cr"), default="edd")
+    parser.add_argument("--days", type=int, default=250, help="business days the releases spread over")
+    # An overloaded shop is the worst case: an urgent order pushes back every order queued behind it
+    parser.add_argument("--load", type=float, nargs="+", default=[0.8, 1.2],
+                        help="demand as a share of the bottleneck's capacity, one run per value")
+    parser.add_argument("--horizon", type=int, default=HORIZON_DAYS, help="business days an order may be loaded over")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for load in args.load:
+        run(args, load)
+
+
+if __name__ == "__main__":
+    main()
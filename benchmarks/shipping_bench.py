@@ -0,0 +1,54 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shipping import DESTINATIONS, ORIGIN, SERVICE_LEVELS, Shipment, ShippingEngine  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rate and consolidate a day of shipments")
+    parser.add_argument("--shipments", type=int, default=5_000)
+    parser.add_argument("--max-weight", type=int, default=3_000, help="heaviest shipment in kg")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    shipments = [
+        Shipment(n, ORIGIN, rng.choice(DESTINATIONS), rng.choice(SERVICE_LEVELS), rng.randrange(15, args.max_weight, 15))
+        for n in range(args.shipments)
+    ]
+    engine = ShippingEngine()
+
+    started = time.perf_counter()
+    separate = sum(engine.rates.quote(*shipment[1:])[1] for shipment in shipments)
+    rated = time.perf_counter() - started
+
+    started = time.perf_counter()
+    loads, charges = engine.consolidate(shipments)
+    consolidated = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for shipment in shipments:
+        engine.ship(shipment.key, date.today(), *shipment[1:])
+    _, _, settled = engine.ship(-1, date.today() + timedelta(days=1), ORIGIN, DESTINATIONS[0], SERVICE_LEVELS[0], 15)
+    online = time.perf_counter() - started
+
+    weight = sum(shipment.weight for shipment in shipments)
+    print(f"Rated {len(shipments):,} shipments one by one in {rated * 1000:.0f} ms: ${separate:,.2f}")
+    print(
+        f"Consolidated into {len(loads):,} loads ({weight / (len(loads) * engine.capacity):.0%} full) "
+        f"in {consolidated * 1000:.0f} ms: ${sum(charges.values()):,.2f}"
+    )
+    print(
+        f"Shipped one at a time onto open loads in {online * 1000:.0f} ms ({online / len(shipments) * 1e6:.1f} us each), "
+        f"settled at ${sum(settled.values()):,.2f} when the day closed"
+    )
+
+
+if __name__ == "__main__":
+    main()
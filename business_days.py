@@ -0,0 +1,154 @@
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+MONDAY_TO_FRIDAY = (1, 1, 1, 1, 1, 0, 0)
+
+
+def ordinal(value=None):
+    """Date ordinal of a date or datetime; None means today"""
+    return (value or date.today()).toordinal()
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th (1-based, -1 for last) given weekday of a month"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def us_federal_holidays(years):
+    """Observed US federal holidays for the given years"""
+    holidays = set()
+    for year in years:
+        holidays.update((
+            _observed(date(year, 1, 1)),
+            _nth_weekday(year, 1, 0, 3),    # Martin Luther King Jr. Day
+            _nth_weekday(year, 2, 0, 3),    # Presidents' Day
+            _nth_weekday(year, 5, 0, -1),   # Memorial Day
+            _observed(date(year, 7, 4)),
+            _nth_weekday(year, 9, 0, 1),    # Labor Day
+            _nth_weekday(year, 10, 0, 2),   # Columbus Day
+            _observed(date(year, 11, 11)),
+            _nth_weekday(year, 11, 3, 4),   # Thanksgiving
+            _observed(date(year, 12, 25)),
+        ))
+        if year >= 2021:
+            holidays.add(_observed(date(year, 6, 19)))
+    return holidays
+
+
+def load_holidays(path):
+    """Read holidays from a file with one ISO date per line; # starts a comment"""
+    holidays = set()
+    with open(path) as fh:
+        for line in fh:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                holidays.add(date.fromisoformat(line))
+    return holidays
+
+
+class BusinessCalendar:
+    """Working-day calendar with constant-time business-day arithmetic
+
+    Two arrays are precomputed over the covered range: `cum[i]` counts the business
+    days before day offset i, and `days[k]` is the offset of the k-th business day.
+    Adding N business days is then two array lookups instead of a day-by-day scan,
+    for one date or for a whole NumPy array of dates.
+    """
+
+    def __init__(self, holidays=(), weekmask=MONDAY_TO_FRIDAY, start=date(1970, 1, 1), end=date(2100, 1, 1)):
+        self.start = start
+        self.end = end
+        self._start_ordinal = start.toordinal()
+        self._start64 = np.datetime64(start, 'D')
+
+        offsets = np.arange((end - start).days)
+        working = np.asarray(weekmask, dtype=bool)[(start.weekday() + offsets) % 7]
+        for holiday in holidays:
+            if start <= holiday < end:
+                working[(holiday - start).days] = False
+        self.holidays = frozenset(holidays)
+        self.working = working
+        self.cum = np.concatenate(([0], np.cumsum(working))).astype(np.int64)
+        self.days = np.flatnonzero(working).astype(np.int64)
+
+    def _offset(self, day):
+        offset = day.toordinal() - self._start_ordinal
+        if not 0 <= offset < self.working.size:
+            raise ValueError(f"{day} is outside the calendar range {self.start} to {self.end}")
+        return offset
+
+    def is_business_day(self, day):
+        return bool(self.working[self._offset(day)])
+
+    def add(self, day, n):
+        """Date `n` business days after (or before, if negative) `day`; keeps the time of day"""
+        if n == 0:
+            return day
+        offset = self._offset(day)
+        k = self.cum[offset + 1] + n - 1 if n > 0 else self.cum[offset] + n
+        if not 0 <= k < self.days.size:
+            raise ValueError(f"{day} plus {n} business days is outside the calendar range")
+        return day + timedelta(days=int(self.days[k]) - offset)
+
+    def roll_forward(self, day):
+        """`day` itself if it is a business day, otherwise the next business day"""
+        return day if self.is_business_day(day) else self.add(day, 1)
+
+    def between(self, start, end):
+        """Business days in [start, end)"""
+        return int(self.cum[self._offset(end)] - self.cum[self._offset(start)])
+
+    def index(self, day):
+        """Business-day number of `day`, or of the next business day if `day` is not one"""
+        return int(self.cum[self._offset(day)])
+
+    def nth(self, k):
+        """Date of business day number `k`, the inverse of index()"""
+        if not 0 <= k < self.days.size:
+            raise ValueError("result outside the calendar range")
+        return self.start + timedelta(days=int(self.days[k]))
+
+    def _offsets(self, dates):
+        offsets = (np.asarray(dates, dtype='datetime64[D]') - self._start64).astype(np.int64)
+        if offsets.size and (offsets.min() < 0 or offsets.max() >= self.working.size):
+            raise ValueError(f"dates outside the calendar range {self.start} to {self.end}")
+        return offsets
+
+    def add_array(self, dates, n):
+        """Vectorized add(): `dates` is array-like of datetime64[D], `n` a scalar or array"""
+        offsets = self._offsets(dates)
+        n = np.asarray(n, dtype=np.int64)
+        k = np.where(n > 0, self.cum[offsets + 1] + n - 1, self.cum[offsets] + n)
+        if k.size and (k.min() < 0 or k.max() >= self.days.size):
+            raise ValueError("result outside the calendar range")
+        result = np.where(n == 0, offsets, self.days[np.clip(k, 0, self.days.size - 1)])
+        return self._start64 + result
+
+    def between_array(self, start, end):
+        """Vectorized between()"""
+        return self.cum[self._offsets(end)] - self.cum[self._offsets(start)]
+
+
+def default_calendar():
+    """Calendar with the holidays from REVENUE_HOLIDAYS, or US federal holidays"""
+    path = os.environ.get('REVENUE_HOLIDAYS')
+    holidays = load_holidays(path) if path else us_federal_holidays(range(1970, 2100))
+    return BusinessCalendar(holidays)
+
+
+CALENDAR = default_calendar()
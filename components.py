@@ -0,0 +1,87 @@
+import os
+import time
+
+import streamlit as st
+
+import metrics
+from documents import render
+from store import open_store
+
+
+@st.cache_resource
+def get_order_store():
+    """Order store shared by all sessions"""
+    return open_store(os.environ.get('ORDER_STORE_PATH', 'orders.db'))
+
+
+def load_order(refresh=False):
+    """This session's order from the store, tagged with its key
+
+    `refresh` re-reads it from disk rather than the store's cache, for actions
+    that must see what another process (payments.py) wrote meanwhile.
+    """
+    key = st.session_state.order_key
+    store = get_order_store()
+    order = (store.refresh(key) if refresh else store.get(key)).to_order()
+    order['order_key'] = key
+    return order
+
+
+def save_order(order):
+    """Write the order back and have the next run redraw the whole page"""
+    get_order_store().put(st.session_state.order_key, order, st.session_state.current_step)
+    st.session_state.step_changed = True
+
+
+def order_action(label, action):
+    """Button that applies `action(order)` to this session's stored order"""
+    def apply():
+        order = load_order(refresh=True)
+        action(order)
+        save_order(order)
+
+    st.button(label, on_click=apply)
+
+
+# Add function to handle document downloads
+@metrics.timed("download_button_seconds")
+def create_download_button(document):
+    """Create a download button for a rendered document"""
+    st.download_button(
+        label=f"💾 Download {document.title}",
+        data=document.payload,
+        file_name=f"{document.filename}.md",
+        mime="text/markdown"
+    )
+
+
+def display_document(name, order, document_type=None, download=True):
+    """Display a rendered document with consistent formatting and optional download button"""
+    started = time.perf_counter()
+    document = render(name, order)
+    document_type = document_type or document.kind
+    st.markdown("---")
+    st.markdown(f"### 📄 {document.title}")
+
+    if document_type == "notice":
+        st.info(document.content)
+    elif document_type == "warning":
+        st.warning(document.content)
+    elif document_type == "error":
+        st.error(document.content)
+    else:
+        st.markdown(document.content)
+
+    # Add download button unless disabled
+    if download:
+        create_download_button(document)
+
+    st.markdown("---")
+    metrics.observe("display_document_seconds", time.perf_counter() - started, document=name)
+
+
+def scenario(role, text):
+    """Role and scenario header shown at the top of every step"""
+    st.markdown(f"### Your Role: {role}")
+    st.markdown("#### Scenario")
+    st.markdown(text)
@@ -0,0 +1,224 @@
+import csv
+import os
+import threading
+
+import numpy as np
+
+import engine
+
+# Customers known when no REVENUE_CUSTOMERS file is configured: (name, credit limit, open balance)
+DEFAULT_ACCOUNTS = (
+    ('BikeWorld Wholesale', 100000, 30000),
+)
+
+
+class CreditEngine:
+    """Per-customer credit exposure, updated incrementally as orders move through the cycle
+
+    Exposure is approved-but-uninvoiced orders plus open invoices. Every customer has
+    an integer index into NumPy arrays of limits and running exposure, so a single
+    event is O(1) and batches of orders are scored in one vectorized pass without
+    rescanning invoice history.
+    """
+
+    def __init__(self, accounts=(), capacity=1024):
+        self._lock = threading.Lock()
+        self._index = {}
+        self.customers = []
+        self.limits = np.zeros(capacity)
+        self.pending_totals = np.zeros(capacity)
+        self.open_totals = np.zeros(capacity)
+        self._pending = {}
+        self._open = {}
+        self._invoiced = set()
+        for name, limit, open_balance in accounts:
+            customer = self._customer(name)
+            self.limits[customer] = limit
+            if open_balance:
+                self._open[f"opening-balance:{name}"] = (customer, open_balance)
+                self.open_totals[customer] += open_balance
+
+    def _customer(self, name):
+        """Index of `name`, adding the customer with a zero limit if it is new"""
+        customer = self._index.get(name)
+        if customer is None:
+            customer = self._index[name] = len(self.customers)
+            self.customers.append(name)
+            if customer >= self.limits.size:
+                size = self.limits.size * 2
+                self.limits = np.resize(self.limits, size)
+                self.pending_totals = np.resize(self.pending_totals, size)
+                self.open_totals = np.resize(self.open_totals, size)
+                self.limits[customer:] = 0
+                self.pending_totals[customer:] = 0
+                self.open_totals[customer:] = 0
+        return customer
+
+    def set_limit(self, name, limit):
+        with self._lock:
+            self.limits[self._customer(name)] = limit
+
+    def account(self, name):
+        """Limit, open invoices, pending orders and total exposure of one customer"""
+        with self._lock:
+            customer = self._index.get(name)
+            if customer is None:
+                return {'credit_limit': 0.0, 'open_invoices': 0.0, 'pending_orders': 0.0, 'exposure': 0.0}
+            pending = float(self.pending_totals[customer])
+            open_invoices = float(self.open_totals[customer])
+            return {
+                'credit_limit': float(self.limits[customer]),
+                'open_invoices': open_invoices,
+                'pending_orders': pending,
+                'exposure': pending + open_invoices
+            }
+
+    def exposure_after(self, name, order_key, amount):
+        """(limit, exposure without this order, exposure with it) for a credit check"""
+        with self._lock:
+            customer = self._index.get(name)
+            if customer is None:
+                return 0.0, 0.0, float(amount)  # a new customer has no limit and nothing open
+            exposure = self.pending_totals[customer] + self.open_totals[customer]
+            entry = self._pending.get(order_key)
+            if entry is not None:
+                exposure -= entry[1]
+            return float(self.limits[customer]), float(exposure), float(exposure + amount)
+
+    def approve(self, name, order_key, amount):
+        """Add an approved order to the customer's pending exposure"""
+        with self._lock:
+            self._release(order_key)
+            customer = self._customer(name)
+            self._pending[order_key] = (customer, amount)
+            self.pending_totals[customer] += amount
+
+    def _release(self, order_key):
+        entry = self._pending.pop(order_key, None)
+        if entry is not None:
+            customer, amount = entry
+            self.pending_totals[customer] -= amount
+        return entry
+
+    def cancel(self, order_key):
+        """Drop a pending order, e.g. when it is rejected after an earlier approval"""
+        with self._lock:
+            return self._release(order_key) is not None
+
+    def invoice(self, name, order_key, invoice_key, amount):
+        """Move an order from pending exposure to an open invoice of `amount`
+
+        The invoice is opened once; invoicing it again only drops the order's pending exposure.
+        """
+        with self._lock:
+            self._release(order_key)
+            if invoice_key in self._invoiced:
+                return
+            self._invoiced.add(invoice_key)
+            customer = self._customer(name)
+            self._open[invoice_key] = (customer, amount)
+            self.open_totals[customer] += amount
+
+    def record_payment(self, invoice_key, amount):
+        """Reduce an open invoice by a payment; returns the amount still open"""
+        with self._lock:
+            entry = self._open.get(invoice_key)
+            if entry is None:
+                raise KeyError(f"No open invoice {invoice_key}")
+            customer, open_amount = entry
+            applied = min(amount, open_amount)
+            self.open_totals[customer] -= applied
+            remaining = open_amount - applied
+            if remaining > 0:
+                self._open[invoice_key] = (customer, remaining)
+            else:
+                del self._open[invoice_key]
+            return remaining
+
+    def evaluate(self, names, amounts):
+        """Score a batch of new orders against credit limits in one pass
+
+        Orders of the same customer are taken in the given sequence, each on top of
+        the ones before it. Returns arrays of approval flags, exposure after each
+        order and limit utilization. Customers the engine does not know yet are
+        scored with no limit and nothing open, without being added.
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        unknown = {}
+        with self._lock:
+            customers = np.fromiter(
+                (self._index[name] if name in self._index else -1 - unknown.setdefault(name, len(unknown))
+                 for name in names),
+                dtype=np.int64, count=amounts.size
+            )
+            known = np.maximum(customers, 0)
+            limits = np.where(customers >= 0, self.limits[known], 0)
+            exposure = np.where(customers >= 0, self.pending_totals[known] + self.open_totals[known], 0)
+
+        # Running total of each customer's orders within the batch
+        order = np.argsort(customers, kind='stable')
+        sorted_customers = customers[order]
+        running = np.cumsum(amounts[order])
+        starts = np.flatnonzero(np.r_[True, sorted_customers[1:] != sorted_customers[:-1]])
+        group_offsets = np.repeat(running[starts] - amounts[order][starts], np.diff(np.r_[starts, amounts.size]))
+        cumulative = np.empty_like(amounts)
+        cumulative[order] = running - group_offsets
+
+        exposure_after = exposure + cumulative
+        with np.errstate(divide='ignore', invalid='ignore'):
+            utilization = np.where(limits > 0, exposure_after / limits, np.inf)
+        return {
+            'approved': exposure_after <= limits,
+            'exposure_after': exposure_after,
+            'utilization': utilization
+        }
+
+    def evaluate_pending(self):
+        """Re-score every pending order against current limits, e.g. in a nightly run"""
+        with self._lock:
+            keys = list(self._pending)
+            customers = np.fromiter((self._pending[k][0] for k in keys), dtype=np.int64, count=len(keys))
+            amounts = np.fromiter((self._pending[k][1] for k in keys), dtype=np.float64, count=len(keys))
+            exposure = self.pending_totals[customers] + self.open_totals[customers]
+            limits = self.limits[customers]
+        return {
+            'order_keys': keys,
+            'amounts': amounts,
+            'within_limit': exposure <= limits,
+            'exposure': exposure
+        }
+
+
+def load_accounts(path):
+    """Read (customer, credit_limit, open_balance) rows from a CSV file with those headers"""
+    with open(path, newline="") as fh:
+        return [
+            (row['customer'], float(row['credit_limit']), float(row.get('open_balance') or 0))
+            for row in csv.DictReader(fh)
+        ]
+
+
+def default_credit():
+    """Credit engine seeded from REVENUE_CUSTOMERS, or the default customer"""
+    path = os.environ.get('REVENUE_CUSTOMERS')
+    return CreditEngine(load_accounts(path) if path else DEFAULT_ACCOUNTS)
+
+
+CREDIT = default_credit()
+
+
+def check_credit(order, decision):
+    """Step 3 transition: an approval adds the order to the customer's exposure"""
+    order_key = engine.order_key(order)
+    if decision == "Reject":
+        CREDIT.cancel(order_key)
+    else:
+        CREDIT.approve(order['customer_name'], order_key, order['total_value'])
+    return engine.check_credit(order, decision)
+
+
+def invoice(order, decision=None):
+    """Step 9 transition: the invoice replaces the pending order in the exposure"""
+    order_key = engine.order_key(order)
+    amount = order['total_value'] + order['costs']['shipping']
+    CREDIT.invoice(order['customer_name'], order_key, order.get('invoice_number') or order_key, amount)
@@ -0,0 +1,645 @@
+import string
+import textwrap
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from business_days import CALENDAR
+from engine import DESTINATION, PRODUCTION_DAYS, format_date, visited_steps, whole
+
+# The engines (credit, inventory, mrp, quoting, scheduling, shipping, numbering) are
+# imported by the functions that read them, so a page loads only the ones its
+# documents show.
+
+PAYMENT_TERMS_DAYS = 30
+
+# A rendered document: what the step page shows and what the download button serves
+Rendered = namedtuple('Rendered', 'title content kind filename payload')
+
+
+def _lookup(order, path):
+    """Read a dotted path such as 'costs.shipping' from the order as a hashable value"""
+    value = order
+    for part in path.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+    return value
+
+
+def _credit(order):
+    """(limit, exposure, exposure with this order) of the customer, whole amounts as ints"""
+    from credit import CREDIT
+    values = CREDIT.exposure_after(order['customer_name'], order.get('order_key'), order['total_value'])
+    return tuple(whole(value) for value in values)
+
+
+def _materials_check(order, live):
+    """Bought parts of the order with what stock and open purchases leave short"""
+    from mrp import MRP
+    short = {line.item: line.quantity for line in live['shortages']}
+    explosion = MRP.explode(order['product'])
+    if not explosion:
+        return f"- No bill of materials for {order['product']}"
+    return "\n".join(
+        f"- {part}: {whole(per_unit * order['quantity'])} needed, {whole(short.get(part, 0))} short"
+        for part, per_unit in explosion.items()
+    )
+
+
+def _purchase_lines(live, with_cost=False):
+    """The order's purchase lines grouped by vendor"""
+    lines = sorted(live['purchases'], key=lambda line: (line.vendor, line.item))
+    if not lines:
+        return "- Nothing to purchase: stock and open purchases cover the order"
+    text = []
+    for line in lines:
+        entry = f"- {line.vendor}: {line.item}, {whole(line.quantity)} units"
+        if with_cost:
+            entry += f" @ ${line.unit_cost:,} = ${line.quantity * line.unit_cost:,.2f}"
+        else:
+            entry += f", lead time {line.lead_time} business days"
+        text.append(entry)
+    return "\n".join(text)
+
+
+def _quote(order):
+    """(unit price, price source, available, lead days) quoted for the inquiry"""
+    from inventory import INVENTORY
+    from quoting import QUOTES
+    try:
+        quote = QUOTES.quote(order['customer_name'], order['product'], order['quantity'], order['current_date'])
+    except KeyError:
+        # Not in the catalogue: the standard price, with stock and lead time still live
+        available = INVENTORY.available(order['product'], on=order['current_date'])
+        return order['unit_price'], "Standard price", available, QUOTES.lead_days(order['quantity'], available)
+    return whole(quote.unit_price), quote.price_source, quote.available, quote.lead_days
+
+
+def _schedule(order):
+    """(completion date, operations, units past the horizon) of the order on the production schedule"""
+    from scheduling import SCHEDULER
+    key = order.get('order_key')
+    return SCHEDULER.completion(key), tuple(SCHEDULER.operations(key)), SCHEDULER.shortfall(key)
+
+
+def _load(order):
+    """(orders, weight) of the load the order shipped on, or None before shipping"""
+    from shipping import SHIPPING
+    load = SHIPPING.load_of(order.get('order_key'))
+    return None if load is None else (len(load.shipments), whole(load.weight))
+
+
+def _completion_date(order, live):
+    completion = live['schedule'][0]
+    return format_date(completion or CALENDAR.add(order['current_date'], PRODUCTION_DAYS))
+
+
+def _production_schedule(live):
+    _, operations, short = live['schedule']
+    if not operations:
+        return "- Not scheduled yet"
+    lines = [f"- {name}: {format_date(first)} to {format_date(last)}" for name, first, last in operations]
+    if short:
+        lines.append(f"- Late: {short:,} units do not fit on the schedule within its horizon")
+    return "\n".join(lines)
+
+
+def _load_summary(order, live):
+    if live['load'] is None:
+        return f"Consolidated on shipping with other orders to {order.get('destination') or DESTINATION}"
+    shipments, weight = live['load']
+    if shipments == 1:
+        return "Single shipment"
+    return f"Consolidated load of {shipments} orders, {weight:,} kg"
+
+
+def _shipment_weight(order):
+    from shipping import shipment_weight
+    return whole(shipment_weight(order))
+
+
+def _available_stock(order):
+    from inventory import INVENTORY
+    return INVENTORY.available(order['product'])
+
+
+def _stock_location(order):
+    from inventory import INVENTORY
+    return INVENTORY.primary_location(order['product'])
+
+
+def _shortages(order):
+    from mrp import MRP
+    return tuple(MRP.shortages(order.get('order_key')))
+
+
+def _purchases(order):
+    from mrp import MRP
+    return tuple(MRP.purchases(order.get('order_key')))
+
+
+def _shipping_source(order):
+    return "Production" if order.get('inventory_status') == "Out of Stock" else "Inventory"
+
+
+# Template values that are computed from the order: name -> (order fields used, function)
+DERIVED = {
+    'date': (('current_date',), lambda o: format_date(o['current_date'])),
+    'expected_delivery': (('expected_delivery',), lambda o: format_date(o['expected_delivery'])),
+    'due_date': (
+        ('current_date',),
+        lambda o: format_date(CALENDAR.roll_forward(o['current_date'] + timedelta(days=PAYMENT_TERMS_DAYS)))
+    ),
+    'shipping_source': (('inventory_status',), _shipping_source),
+    'destination': (('destination',), lambda o: o.get('destination') or DESTINATION),
+    'carrier': (('carrier',), lambda o: o.get('carrier') or "Assigned on shipping"),
+    'shipment_weight': (('product', 'quantity'), _shipment_weight),
+    'freight': (('costs.shipping',), lambda o: o['costs']['shipping']),
+    'production_cost': (('costs.production',), lambda o: o['costs']['production']),
+    'total_invoice': (
+        ('total_value', 'costs.shipping'),
+        lambda o: o['total_value'] + o['costs']['shipping']
+    ),
+    'amount_received': (('amount_paid',), lambda o: o.get('amount_paid') or 0),
+    'payment_status': (('payment_status',), lambda o: o.get('payment_status') or "Awaiting Payment"),
+    'rejection_customer': (
+        ('documents.rejection_notice',),
+        lambda o: o['documents']['rejection_notice']['customer']
+    ),
+    'rejection_date': (
+        ('documents.rejection_notice',),
+        lambda o: o['documents']['rejection_notice']['date']
+    ),
+    'rejection_reason': (
+        ('documents.rejection_notice',),
+        lambda o: o['documents']['rejection_notice']['reason']
+    ),
+}
+
+# Document numbers kept on the order: field -> sequence prefix. Numbers are issued
+# when the order reaches the step of the first document that shows them.
+DOCUMENT_NUMBERS = {
+    'po_number': 'PO',
+    'sales_order_number': 'SO',
+    'back_order_number': 'BO',
+    'requisition_number': 'PR',
+    'vendor_po_number': 'PO-V',
+    'production_order_number': 'MO',
+    'picking_ticket_number': 'PT',
+    'packing_slip_number': 'PS',
+    'bol_number': 'BOL',
+    'shipment_number': 'SHP',
+    'invoice_number': 'INV',
+}
+
+# Shared live state the documents read: name -> function returning a hashable snapshot
+# of it for the order. Each is read once per render, for both the cache key and the text.
+SOURCES = {
+    'available_stock': _available_stock,
+    'stock_location': _stock_location,
+    'quote': _quote,
+    'credit': _credit,
+    'shortages': _shortages,
+    'purchases': _purchases,
+    'schedule': _schedule,
+    'load': _load,
+}
+
+# Template values computed from live state: name -> (order fields used, sources used, function(order, live))
+LIVE = {
+    'available_stock': ((), ('available_stock',), lambda o, live: live['available_stock']),
+    'stock_location': ((), ('stock_location',), lambda o, live: live['stock_location']),
+    'quoted_price': ((), ('quote',), lambda o, live: live['quote'][0]),
+    'price_basis': ((), ('quote',), lambda o, live: live['quote'][1]),
+    'quoted_available': ((), ('quote',), lambda o, live: live['quote'][2]),
+    'lead_days': ((), ('quote',), lambda o, live: live['quote'][3]),
+    'materials_check': (('product', 'quantity'), ('shortages',), _materials_check),
+    'completion_date': (('current_date',), ('schedule',), _completion_date),
+    'production_schedule': ((), ('schedule',), lambda o, live: _production_schedule(live)),
+    'load_summary': (('destination',), ('load',), _load_summary),
+    'requisition_lines': ((), ('purchases',), lambda o, live: _purchase_lines(live)),
+    'vendor_order_lines': ((), ('purchases',), lambda o, live: _purchase_lines(live, with_cost=True)),
+    'purchase_total': (
+        (),
+        ('purchases',),
+        lambda o, live: sum(line.quantity * line.unit_cost for line in live['purchases'])
+    ),
+    'credit_limit': ((), ('credit',), lambda o, live: live['credit'][0]),
+    'open_liabilities': ((), ('credit',), lambda o, live: live['credit'][1]),
+    'exposure_after': ((), ('credit',), lambda o, live: live['credit'][2]),
+}
+
+
+class DocumentTemplate:
+    """A document body, dedented and parsed once at import time"""
+
+    def __init__(self, title, filename, body, kind="notice"):
+        self.title = title
+        self.filename = filename
+        self.kind = kind
+        self.body = textwrap.dedent(body)
+        self.names = tuple(dict.fromkeys(
+            name for _, name, _, _ in string.Formatter().parse(self.body) if name
+        ))
+        # Order fields and live sources the rendered text depends on; these make up the cache key
+        self.live = tuple(name for name in self.names if name in LIVE)
+        self.sources = tuple(dict.fromkeys(source for name in self.live for source in LIVE[name][1]))
+        fields = []
+        for name in self.names:
+            if name in LIVE:
+                fields.extend(LIVE[name][0])
+            else:
+                fields.extend(DERIVED[name][0] if name in DERIVED else (name,))
+        self.fields = tuple(dict.fromkeys(fields))
+
+    def live_data(self, order, live=None):
+        """Current value of every live source, except those already captured in `live`"""
+        return {
+            source: live[source] if live and source in live else SOURCES[source](order)
+            for source in self.sources
+        }
+
+    def key(self, order, live):
+        return (
+            self.filename,
+            *(_lookup(order, field) for field in self.fields),
+            *(live[source] for source in self.sources)
+        )
+
+    def _value(self, name, order, live):
+        if name in LIVE:
+            return LIVE[name][2](order, live)
+        if name in DERIVED:
+            return DERIVED[name][1](order)
+        return order[name]
+
+    def render(self, order, live=None):
+        """Render with the live sources in `live` where given, e.g. captured when the step ran"""
+        live = self.live_data(order, live)
+        values = {name: self._value(name, order, live) for name in self.names}
+        content = self.body.format_map(values)
+        payload = f"""# {self.title}\n\n{content}"""
+        return Rendered(self.title, content, self.kind, self.filename, payload)
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a bounded size and hit/miss/eviction counters"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize
+            }
+
+
+TEMPLATES = {t.filename: t for t in (
+    DocumentTemplate("Response to Inquiry", "response_to_inquiry", """
+    **Date:** {date}
+    **To:** {customer_name}
+    **Subject:** Response to Product Inquiry
+
+    **Product Details:**
+    - Product: {product}
+    - Quantity: {quantity}
+    - Unit Price: ${quoted_price} ({price_basis})
+    - Available Quantity: {quoted_available} units
+    - Delivery Timeframe: {lead_days} business days
+
+    Please submit a Purchase Order (PO) if these terms are acceptable.
+    """),
+    DocumentTemplate("Rejected Order Notification", "order_rejection_notice", """
+    **To:** {rejection_customer}
+    **Date:** {rejection_date}
+    **Subject:** Order Status Update
+
+    We regret to inform you that your order could not be processed at this time.
+    Reason: {rejection_reason}
+
+    Please contact our credit department for further information.
+    """, "error"),
+    DocumentTemplate("Purchase Order Received", "purchase_order", """
+    **Purchase Order**
+    PO Number: {po_number}
+
+    **Order Details:**
+    - Customer: {customer_name}
+    - Product: {product}
+    - Quantity: {quantity}
+    - Unit Price: ${unit_price}
+    - Total Value: ${total_value:,}
+
+    **Delivery Requirements:**
+    - Requested Delivery Date: {expected_delivery}
+    - Shipping Address: BikeWorld Wholesale, 123 Bike Street, NY
+
+    🔜 Next Step: Check customer's credit limit before approving the order.
+    """),
+    DocumentTemplate("Credit Check Report", "credit_check_report", """
+    **Credit Assessment Report**
+    Customer: {customer_name}
+    Date: {date}
+
+    **Current Credit Status:**
+    - Credit Limit: ${credit_limit:,}
+    - Current Open Liabilities: ${open_liabilities:,}
+    - New Order Value: ${total_value:,}
+    - Total Exposure After Order: ${exposure_after:,}
+
+    **Decision Required:**
+    ✅ Approved: Order moves to Inventory Check
+    ❌ Rejected: Generate Rejection Notice
+    """),
+    DocumentTemplate("Inventory Status Report", "inventory_status_report", """
+    **Inventory Check Report**
+    Date: {date}
+
+    **Required:**
+    - Product: {product}
+    - Quantity Needed: {quantity}
+
+    **Current Inventory Status:**
+    - Available in FG Stock: {available_stock} units
+    - Location: {stock_location}
+
+    **Decision Required:**
+    ✅ FG in Stock: Proceed to Shipping
+    ❌ FG Out of Stock: Create Back Order & Move to Production
+    """),
+    DocumentTemplate("Back Order Processing", "back_order_processing", """
+    **Back Order & Production Check**
+    Date: {date}
+
+    **Back Order Details:**
+    - Order ID: {back_order_number}
+    - Product: {product}
+    - Quantity: {quantity}
+
+    **Raw Materials Check:**
+    {materials_check}
+
+    **Decision Required:**
+    ✅ Raw Materials Available: Proceed with Production
+    ❌ Raw Materials Out of Stock: Trigger Procurement Process
+    """),
+    DocumentTemplate("Purchase Requisition", "purchase_requisition", """
+    **Purchase Requisition (PR)**
+    PR Number: {requisition_number}
+    Date: {date}
+
+    **Material Requirements:**
+    {requisition_lines}
+    - Required By: {expected_delivery}
+
+    **Vendor Terms:** Net 30
+    """),
+    DocumentTemplate("Purchase Order to Vendor", "purchase_order_vendor", """
+    **Purchase Order (PO) to Vendor**
+    PO Number: {vendor_po_number}
+
+    **Order Details:**
+    {vendor_order_lines}
+    - Total Cost: ${purchase_total:,.2f}
+
+    **Delivery Requirements:**
+    - Delivery Address: Warehouse Receiving Dock
+    - Required By: {expected_delivery}
+    """),
+    DocumentTemplate("Production Order", "production_order", """
+    **Production Order**
+    Production Order #: {production_order_number}
+    Date: {date}
+
+    **Production Details:**
+    - Product: {product}
+    - Quantity: {quantity} units
+    - Status: In Production
+    - Start Date: {date}
+    - Estimated Completion: {completion_date}
+
+    **Schedule:**
+    {production_schedule}
+
+    **Cost Information:**
+    - Production Cost: ${production_cost:,}
+
+    **Next Steps:**
+    ✔ Production team notified
+    ✔ Materials allocated
+    ✔ Production scheduled
+    """),
+    DocumentTemplate("Picking Ticket", "picking_ticket", """
+    **Picking Ticket**
+    Picking Ticket #: {picking_ticket_number}
+
+    **Order Information:**
+    - Sales Order ID: {sales_order_number}
+    - Customer: {customer_name}
+    - Product: {product}
+    - Quantity: {quantity}
+    - Source: {shipping_source}
+    - Location: Aisle 7, Shelf 3
+    - Status: Ready for Picking
+    """),
+    DocumentTemplate("Packing Slip", "packing_slip", """
+    **Packing Slip**
+    Packing Slip #: {packing_slip_number}
+
+    **Shipment Details:**
+    - Customer: {customer_name}
+    - Sales Order ID: {sales_order_number}
+    - Product: {product}
+    - Quantity: {quantity}
+    - Total Weight: {shipment_weight:,} kg
+    - Packing Date: {date}
+    - Status: Packed
+    """),
+    DocumentTemplate("Bill of Lading", "bill_of_lading", """
+    **Bill of Lading (BoL)**
+    BoL #: {bol_number}
+
+    **Shipment Information:**
+    - Carrier: {carrier}
+    - Shipment ID: {shipment_number}
+    - Origin: Bicycle Manufacturer Warehouse, CA
+    - Destination: {customer_name}, {destination}
+    - Product: {product}
+    - Quantity: {quantity}
+    - Total Weight: {shipment_weight:,} kg
+    - Load: {load_summary}
+
+    **Shipping Terms:**
+    - Freight Charges: ${freight:,}
+    - Incoterms: FOB (Free on Board)
+    - Insurance: $200,000 coverage
+
+    **Status:** Ready for Shipment
+    """),
+    DocumentTemplate("Invoice", "customer_invoice", """
+    **Invoice**
+    Invoice #: {invoice_number}
+    Date: {date}
+
+    **Bill To:**
+    {customer_name}
+    123 Bike Street
+    New York, NY
+
+    **Order Details:**
+    - Sales Order ID: {sales_order_number}
+    - Product: {product}
+    - Quantity: {quantity}
+    - Unit Price: ${unit_price}
+    - Total Product Cost: ${total_value:,}
+
+    **Additional Charges:**
+    - Freight Cost: ${freight:,}
+
+    **Payment Details:**
+    - Total Invoice Amount: ${total_invoice:,}
+    - Payment Terms: Net 30
+    - Due Date: {due_date}
+
+    **Status:** Sent to Customer
+    """),
+    DocumentTemplate("Accounts Receivable Update", "ar_journal_entry", """
+    **A/R Journal Entry**
+    Date: {date}
+
+    **Debit:**
+    - Accounts Receivable: ${total_invoice:,}
+
+    **Credit:**
+    - Sales Revenue: ${total_value:,}
+    - Freight Revenue: ${freight:,}
+    """),
+    DocumentTemplate("Payment Processing", "payment_processing", """
+    **Payment Details**
+    Invoice #: {invoice_number}
+
+    **Amount Due:**
+    - Total Invoice Amount: ${total_invoice:,}
+    - Due Date: {due_date}
+
+    **Payment Method:**
+    - Wire Transfer
+    - Payment Terms: Net 30
+
+    **Bank Information:**
+    - Bank: Commerce Bank
+    - Account: XXXXXXXX
+    - Reference: {invoice_number}
+
+    **Received:** ${amount_received:,}
+
+    **Status:** {payment_status}
+    """),
+)}
+
+# Documents issued at each step, in display order
+STEP_DOCUMENTS = {
+    1: ('response_to_inquiry',),
+    2: ('purchase_order',),
+    3: ('credit_check_report',),
+    4: ('inventory_status_report',),
+    5: ('back_order_processing',),
+    6: ('purchase_requisition', 'purchase_order_vendor'),
+    7: ('production_order',),
+    8: ('picking_ticket', 'packing_slip', 'bill_of_lading'),
+    9: ('customer_invoice', 'ar_journal_entry'),
+    10: ('payment_processing',)
+}
+
+cache = LRUCache()
+
+
+def render(name, order):
+    """Render document `name` for `order`, reusing the cached text while its fields are unchanged"""
+    template = TEMPLATES[name]
+    live = template.live_data(order)
+    key = template.key(order, live)
+    rendered = cache.get(key)
+    if rendered is None:
+        rendered = template.render(order, live)
+        cache.put(key, rendered)
+    return rendered
+
+
+def issue_numbers(order, step):
+    """Give the order the document numbers its documents at `step` show; returns the new ones"""
+    from numbering import NUMBERS
+    issued = {}
+    for name in STEP_DOCUMENTS.get(step, ()):
+        for field in TEMPLATES[name].names:
+            if field in DOCUMENT_NUMBERS and order.get(field) is None:
+                issued[field] = order[field] = NUMBERS.number(DOCUMENT_NUMBERS[field])
+    return issued
+
+
+def live_values(order, step):
+    """Current live sources of the documents at `step`, to render them later as of now"""
+    return {
+        source: SOURCES[source](order)
+        for document in STEP_DOCUMENTS.get(step, ())
+        for source in TEMPLATES[document].sources
+    }
+
+
+def cache_info():
+    """Hit/miss/eviction counters of the rendered-document cache"""
+    return cache.info()
+
+
+def order_documents(order, current_step, cached=True, snapshots=None):
+    """Lazily render every document the order has produced up to `current_step`
+
+    Bulk callers pass cached=False so exports do not evict the documents of live sessions.
+    `snapshots` maps a step to the (order, live sources) captured when it ran (see
+    live_values); that step's documents are rendered from them and are not cached.
+    """
+    names = [(step, name) for step in visited_steps(order, current_step) for name in STEP_DOCUMENTS[step]]
+    if 'rejection_notice' in order.get('documents', {}):
+        names.insert(1, (None, 'order_rejection_notice'))
+    for step, name in names:
+        if snapshots and step in snapshots:
+            yield TEMPLATES[name].render(*snapshots[step])
+        elif cached:
+            yield render(name, order)
+        else:
+            yield TEMPLATES[name].render(order)
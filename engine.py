@@ -0,0 +1,366 @@
+import argparse
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+import business_days
+
+# Define the steps
+STEPS = {
+    1: "Customer Inquiry & Response",
+    2: "Order Placement",
+    3: "Credit Check & Approval",
+    4: "Inventory Management",
+    5: "Back Order Processing",
+    6: "Procurement",
+    7: "Production",
+    8: "Shipping Process",
+    9: "Billing Process",
+    10: "Cash Collections"
+}
+
+# Default order economics
+QUANTITY = 100
+UNIT_PRICE = 500
+PRODUCT_COST = 50000
+DESTINATION = "NY"
+SERVICE_LEVEL = "Standard"
+
+# Business days added to the timeline by each transition
+CREDIT_CHECK_DAYS = 1
+INVENTORY_CHECK_DAYS = 1
+MATERIALS_CHECK_DAYS = 1
+PROCUREMENT_DAYS = 10
+PRODUCTION_DAYS = 3
+SHIPPING_DAYS = 2
+DELIVERY_BUFFER_DAYS = 5
+
+# Costs booked by each transition
+SHIPPING_COST_FROM_STOCK = 2000
+SHIPPING_COST_FROM_PRODUCTION = 3500
+PROCUREMENT_COST = 40000
+PRODUCTION_COST = 35000
+
+# Fulfilment paths reported by the batch simulation
+PATH_REJECTED = 0
+PATH_FROM_STOCK = 1
+PATH_PRODUCTION = 2
+PATH_PROCUREMENT = 3
+PATH_NAMES = {
+    PATH_REJECTED: "Rejected",
+    PATH_FROM_STOCK: "From Stock",
+    PATH_PRODUCTION: "Production",
+    PATH_PROCUREMENT: "Procurement + Production"
+}
+
+
+def format_date(date, calendar=None):
+    """Format datetime object to string, flagging non-business days when given a calendar"""
+    text = date.strftime("%B %d, %Y")
+    if calendar is not None and not calendar.is_business_day(date):
+        text += " (non-business day)"
+    return text
+
+
+def order_key(order):
+    """Key the shared engines know the order by; orders get one when they are stored"""
+    try:
+        return order['order_key']
+    except KeyError:
+        raise KeyError("order has no order_key; give it one (store.new_key) before running transitions") from None
+
+
+def whole(value):
+    """Whole-number floats as ints, so amounts format without a trailing .0; other values unchanged"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def new_order(current_date=None):
+    """Create the default order for a new session"""
+    if current_date is None:
+        current_date = datetime.now()
+    return {
+        'customer_name': 'BikeWorld Wholesale',
+        'product': 'Mountain Bike (Black)',
+        'quantity': QUANTITY,
+        'unit_price': UNIT_PRICE,
+        'total_value': QUANTITY * UNIT_PRICE,
+        'price_source': None,
+        'credit_status': None,
+        'inventory_status': None,
+        'materials_status': None,
+        'payment_status': None,
+        'amount_paid': 0,
+        'destination': DESTINATION,
+        'service_level': SERVICE_LEVEL,
+        'carrier': None,
+        'start_date': current_date,
+        'current_date': current_date,
+        'expected_delivery': business_days.CALENDAR.add(current_date, DELIVERY_BUFFER_DAYS),
+        'documents': {},
+        'costs': {
+            'product_cost': PRODUCT_COST,
+            'shipping': 0,
+            'procurement': 0,
+            'production': 0
+        }
+    }
+
+
+def update_timeline(order, days_to_add):
+    """Update the timeline with additional business days"""
+    calendar = business_days.CALENDAR
+    order['current_date'] = calendar.add(order['current_date'], days_to_add)
+    order['expected_delivery'] = max(
+        calendar.add(order['current_date'], DELIVERY_BUFFER_DAYS),
+        order['expected_delivery']
+    )
+
+
+# Each transition applies the work done in its step to the order and returns the
+# step to jump to, or None to move on to the following step.
+
+def check_credit(order, decision):
+    """Handle Credit Check Decision"""
+    order['credit_status'] = decision
+    if decision == "Reject":
+        order['documents']['rejection_notice'] = {
+            'reason': 'Credit Check Failed',
+            'date': format_date(order['current_date']),
+            'customer': order['customer_name']
+        }
+        return 1  # Reset to start
+    update_timeline(order, CREDIT_CHECK_DAYS)
+
+
+def check_inventory(order, decision):
+    """Handle Inventory Decision"""
+    order['inventory_status'] = decision
+    if decision == "In Stock":
+        order['costs']['shipping'] = SHIPPING_COST_FROM_STOCK
+        update_timeline(order, INVENTORY_CHECK_DAYS)
+        return 8  # Skip to Shipping
+    update_timeline(order, INVENTORY_CHECK_DAYS)
+
+
+def check_materials(order, decision):
+    """Handle Raw Materials Decision"""
+    order['materials_status'] = decision
+    if decision == "Available":
+        order['costs']['production'] = PRODUCTION_COST
+        update_timeline(order, MATERIALS_CHECK_DAYS)
+        return 7  # Skip to Production
+    update_timeline(order, MATERIALS_CHECK_DAYS)
+
+
+def procure(order, decision=None):
+    """Add procurement costs"""
+    order['costs']['procurement'] = PROCUREMENT_COST
+    update_timeline(order, PROCUREMENT_DAYS)
+
+
+def produce(order, decision=None):
+    """Add production time"""
+    order['costs']['production'] = PRODUCTION_COST
+    update_timeline(order, PRODUCTION_DAYS)
+
+
+def ship(order, decision=None):
+    """Add shipping costs for out of stock"""
+    if order.get('inventory_status') == "Out of Stock":
+        order['costs']['shipping'] = SHIPPING_COST_FROM_PRODUCTION
+    update_timeline(order, SHIPPING_DAYS)
+
+
+# Transition out of each step; steps without an entry only move on. These book
+# the flat costs and durations above; the app runs the engine-backed transitions
+# of the step registry (steps.REGISTRY) instead.
+TRANSITIONS = {
+    3: check_credit,
+    4: check_inventory,
+    5: check_materials,
+    6: procure,
+    7: produce,
+    8: ship
+}
+
+
+def advance(order, current, decision=None, transition=None):
+    """Apply the transition out of step `current` to `order` and return the next step
+
+    `decision` is the radio choice made on steps 3, 4 and 5 and is ignored elsewhere.
+    `transition` overrides the handler from TRANSITIONS, e.g. one loaded by the step registry.
+    """
+    handler = transition or TRANSITIONS.get(current)
+    jump = handler(order, decision) if handler else None
+    if jump is not None:
+        return jump
+
+    # Normal progression
+    if current < len(STEPS):
+        return current + 1
+    return current
+
+
+def next_step(order, current):
+    """Step that follows `current` given the decisions already recorded on the order"""
+    if current == 3 and order.get('credit_status') == "Reject":
+        return 1
+    if current == 4 and order.get('inventory_status') == "In Stock":
+        return 8
+    if current == 5 and order.get('materials_status') == "Available":
+        return 7
+    return min(current + 1, len(STEPS))
+
+
+def visited_steps(order, current_step):
+    """Steps the order has passed through, ending with `current_step`"""
+    steps = [1]
+    while steps[-1] != current_step and len(steps) < len(STEPS):
+        steps.append(next_step(order, steps[-1]))
+    return steps
+
+
+def simulate_batch(n_orders, p_credit_approve=0.9, p_in_stock=0.5, p_materials_available=0.5,
+                   max_credit_attempts=1, quantity=QUANTITY, unit_price=UNIT_PRICE,
+                   product_cost=PRODUCT_COST, production_cost=PRODUCTION_COST,
+                   procurement_cost=PROCUREMENT_COST, shipping_cost_from_stock=SHIPPING_COST_FROM_STOCK,
+                   shipping_cost_from_production=SHIPPING_COST_FROM_PRODUCTION,
+                   production_days=PRODUCTION_DAYS, procurement_days=PROCUREMENT_DAYS,
+                   shipping_days=SHIPPING_DAYS, start_date=None, seed=None):
+    """Push `n_orders` simulated orders through all steps at once
+
+    Every order draws its credit, inventory and raw materials decisions from the
+    given branch probabilities. A rejected order loops back to step 1 and is
+    re-checked up to `max_credit_attempts` times before it is counted as lost.
+    Returns a dict of per-order NumPy arrays; lost orders have zero cost, zero
+    revenue and a NaN lead time.
+
+    This is the flat model of TRANSITIONS: every order pays the constant costs and
+    takes the constant durations given here. The app's steps diverge from it: they
+    price from the quote tiers, buy what MRP finds short, take production time and cost
+    from the finite-capacity schedule and split freight over consolidated loads, none of
+    which the batch sees. Lead times are in business days; with a
+    `start_date` (a date or an array of datetime64 dates) the result also holds
+    each order's completion date and its lead time in calendar days.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Credit: number of checks until the first approval, lost if above the cap
+    attempts = rng.geometric(p_credit_approve, n_orders) if p_credit_approve > 0 \
+        else np.full(n_orders, max_credit_attempts + 1)
+    approved = attempts <= max_credit_attempts
+    attempts = np.minimum(attempts, max_credit_attempts)
+
+    in_stock = rng.random(n_orders) < p_in_stock
+    materials = rng.random(n_orders) < p_materials_available
+    from_stock = approved & in_stock
+    production = approved & ~in_stock & materials
+    procurement = approved & ~in_stock & ~materials
+
+    path = np.full(n_orders, PATH_REJECTED, dtype=np.int8)
+    path[from_stock] = PATH_FROM_STOCK
+    path[production] = PATH_PRODUCTION
+    path[procurement] = PATH_PROCUREMENT
+
+    # Days per path, mirroring the update_timeline calls of TRANSITIONS
+    stock_path_days = CREDIT_CHECK_DAYS + INVENTORY_CHECK_DAYS + shipping_days
+    production_path_days = stock_path_days + MATERIALS_CHECK_DAYS + production_days
+    procurement_path_days = production_path_days + procurement_days
+    path_days = np.array([np.nan, stock_path_days, production_path_days, procurement_path_days])
+    lead_time = path_days[path]
+
+    # Costs per path, mirroring the costs booked by TRANSITIONS
+    path_shipping = np.array([0, shipping_cost_from_stock, shipping_cost_from_production,
+                              shipping_cost_from_production], dtype=np.float64)
+    path_other = np.array([0, 0, production_cost, production_cost + procurement_cost],
+                          dtype=np.float64)
+    shipping = path_shipping[path]
+    total_cost = np.where(approved, product_cost, 0) + shipping + path_other[path]
+    revenue = np.where(approved, quantity * unit_price, 0) + shipping
+    margin = revenue - total_cost
+
+    result = {
+        'path': path,
+        'credit_attempts': attempts,
+        'lead_time': lead_time,
+        'total_cost': total_cost,
+        'revenue': revenue,
+        'margin': margin
+    }
+    if start_date is not None:
+        start = np.broadcast_to(np.asarray(start_date, dtype='datetime64[D]'), (n_orders,))
+        completion = business_days.CALENDAR.add_array(start, np.nan_to_num(lead_time).astype(np.int64))
+        completion = np.where(approved, completion, np.datetime64('NaT'))
+        result['completion_date'] = completion
+        result['calendar_lead_time'] = np.where(approved, (completion - start).astype(np.float64), np.nan)
+    return result
+
+
+def summarize(result, percentiles=(5, 50, 95, 99)):
+    """Summarize a batch simulation into path shares and percentile distributions"""
+    path = result['path']
+    completed = path != PATH_REJECTED
+    summary = {
+        'orders': int(path.size),
+        'paths': {
+            name: float(np.count_nonzero(path == code)) / max(path.size, 1)
+            for code, name in PATH_NAMES.items()
+        }
+    }
+    for key in ('lead_time', 'calendar_lead_time', 'total_cost', 'margin'):
+        if key not in result:
+            continue
+        values = result[key][completed]
+        if values.size == 0:
+            summary[key] = None
+            continue
+        summary[key] = {'mean': float(values.mean())}
+        for p, value in zip(percentiles, np.percentile(values, percentiles)):
+            summary[key][f"p{p}"] = float(value)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo simulation of the revenue cycle")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--p-credit-approve", type=float, default=0.9)
+    parser.add_argument("--p-in-stock", type=float, default=0.5)
+    parser.add_argument("--p-materials-available", type=float, default=0.5)
+    parser.add_argument("--max-credit-attempts", type=int, default=1)
+    parser.add_argument("--start-date", type=date.fromisoformat, default=None,
+                        help="first day of the orders (YYYY-MM-DD); adds calendar-day lead times")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    result = simulate_batch(
+        args.orders,
+        p_credit_approve=args.p_credit_approve,
+        p_in_stock=args.p_in_stock,
+        p_materials_available=args.p_materials_available,
+        max_credit_attempts=args.max_credit_attempts,
+        start_date=args.start_date,
+        seed=args.seed
+    )
+    summary = summarize(result)
+    elapsed = time.perf_counter() - started
+
+    print(f"Simulated {summary['orders']:,} orders in {elapsed:.2f}s")
+    print("Flat cost model: constant costs and durations, without the quotes, MRP purchases, "
+          "production schedule and consolidated freight of the app's steps")
+    for name, share in summary['paths'].items():
+        print(f"- {name}: {share:.1%}")
+    for key in ('lead_time', 'calendar_lead_time', 'total_cost', 'margin'):
+        stats = summary.get(key)
+        if stats is None:
+            continue
+        formatted = ", ".join(f"{label} {value:,.1f}" for label, value in stats.items())
+        print(f"{key.replace('_', ' ').title()}: {formatted}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import io
+import sys
+import zipfile
+
+from documents import order_documents
+from store import open_store
+
+
+def write_documents(archive, documents, folder=""):
+    """Compress rendered documents into `archive` one at a time"""
+    count = 0
+    for document in documents:
+        with archive.open(f"{folder}{document.filename}.md", "w") as entry:
+            entry.write(document.payload.encode("utf-8"))
+        count += 1
+    return count
+
+
+def write_order(archive, order, current_step, folder=""):
+    """Render the order's documents one at a time and compress each into `archive`"""
+    return write_documents(archive, order_documents(order, current_step, cached=False), folder)
+
+
+def export_orders(orders, fileobj, compresslevel=6):
+    """Stream a ZIP with one folder per order into `fileobj`
+
+    `orders` is an iterable of (key, order, current_step) and is consumed lazily, so
+    memory stays bounded however many orders are exported. `fileobj` does not need
+    to be seekable. Returns the number of documents written.
+    """
+    count = 0
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as archive:
+        for key, order, current_step in orders:
+            count += write_order(archive, order, current_step, folder=f"{key}/")
+    return count
+
+
+def order_packet(order, current_step):
+    """ZIP of every document one order has produced, for the download button"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        write_order(archive, order, current_step)
+    return buffer.getvalue()
+
+
+def stored_orders(store):
+    """Yield (key, order, current_step) for every order in the store
+
+    Only the stored order fields survive: the schedule, loads, purchases and
+    credit exposure live in the engines of the process that ran the order, so
+    documents rendered here show those sections as this process sees them.
+    """
+    for key, record in store.items():
+        order = record.to_order()
+        order['order_key'] = key
+        yield key, order, record.current_step
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the documents of all stored orders as one ZIP, from their stored fields")
+    parser.add_argument("output", help="ZIP file to write, or - for stdout")
+    parser.add_argument("--db", default="orders.db", help="order store to export")
+    args = parser.parse_args(argv)
+
+    store = open_store(args.db)
+    if args.output == "-":
+        count = export_orders(stored_orders(store), sys.stdout.buffer)
+    else:
+        with open(args.output, "wb") as fileobj:
+            count = export_orders(stored_orders(store), fileobj)
+    store.close()
+    print(f"Exported {count:,} documents", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
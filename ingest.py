@@ -0,0 +1,292 @@
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import steps
+from credit import CREDIT
+from documents import issue_numbers, live_values, order_documents
+from engine import STEPS, UNIT_PRICE, advance, new_order, whole
+from export import write_documents
+from payments import restore_books
+from quoting import PO_PRICE
+from shipping import SERVICE_LEVELS
+from store import new_key, open_store
+
+# Allowed values of the optional per-record decision columns, by step
+DECISIONS = {
+    3: ('credit_decision', ("Approve", "Reject")),
+    4: ('inventory_decision', ("In Stock", "Out of Stock")),
+    5: ('materials_decision', ("Available", "Not Available")),
+}
+
+
+def read_records(fileobj, fmt):
+    """Yield (line number, record dict) from a CSV or JSONL stream, one line at a time"""
+    if fmt == "jsonl":
+        for number, line in enumerate(fileobj, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError as exc:
+                    yield number, exc
+    else:
+        for number, row in enumerate(csv.DictReader(fileobj), 2):
+            yield number, row
+
+
+def to_order(record):
+    """Validate one purchase order record and build the order it describes; raises ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError(f"not a record: {record}")
+    customer = str(record.get('customer_name') or record.get('customer') or "").strip()
+    product = str(record.get('product') or "").strip()
+    if not customer:
+        raise ValueError("customer_name is required")
+    if not product:
+        raise ValueError("product is required")
+    try:
+        quantity = float(record.get('quantity'))
+    except (TypeError, ValueError):
+        quantity = None
+    if quantity is None or not quantity.is_integer():  # also rejects NaN and infinity
+        raise ValueError(f"quantity must be a whole number, got {record.get('quantity')!r}")
+    quantity = int(quantity)
+    unit_price = record.get('unit_price') or UNIT_PRICE
+    try:
+        unit_price = float(unit_price)
+    except (TypeError, ValueError):
+        raise ValueError(f"unit_price must be a number, got {unit_price!r}") from None
+    if not math.isfinite(unit_price):
+        raise ValueError(f"unit_price must be a finite number, got {unit_price!r}")
+    if quantity <= 0 or unit_price <= 0:
+        raise ValueError("quantity and unit_price must be positive")
+    order_date = record.get('order_date')
+    try:
+        order_date = datetime.fromisoformat(order_date) if order_date else None
+    except (TypeError, ValueError):
+        raise ValueError(f"order_date must be an ISO date, got {order_date!r}") from None
+    order = new_order(order_date)
+
+    unit_price = whole(unit_price)
+    order.update(
+        customer_name=customer,
+        product=product,
+        quantity=quantity,
+        unit_price=unit_price,
+        total_value=quantity * unit_price
+    )
+    if record.get('unit_price'):
+        order['price_source'] = PO_PRICE  # otherwise step 1 quotes the catalogue price
+    if record.get('po_number'):
+        order['po_number'] = str(record['po_number'])
+    if record.get('destination'):
+        order['destination'] = str(record['destination']).strip()
+    service_level = record.get('service_level')
+    if service_level:
+        if service_level not in SERVICE_LEVELS:
+            raise ValueError(f"service_level must be one of {', '.join(SERVICE_LEVELS)}, got {service_level!r}")
+        order['service_level'] = service_level
+
+    decisions = {}
+    for step, (field, allowed) in DECISIONS.items():
+        value = record.get(field)
+        if value:
+            if value not in allowed:
+                raise ValueError(f"{field} must be one of {', '.join(allowed)}, got {value!r}")
+            decisions[step] = value
+    return order, decisions
+
+
+def decide(order, step, decisions):
+    """Decision for a branching step: the record's own, else what the shared state supports"""
+    if step in decisions:
+        return decisions[step]
+    if step == 3:
+        limit, _, exposure_after = CREDIT.exposure_after(
+            order['customer_name'], order['order_key'], order['total_value']
+        )
+        return "Approve" if exposure_after <= limit else "Reject"
+    if step == 4:
+        return "In Stock"  # check_inventory turns this into a back order without stock
+    if step == 5:
+        return "Available"
+    return None
+
+
+def _snapshot(order):
+    """Copy of the order that later steps leave alone: they set fields and update the nested dicts"""
+    return {field: dict(value) if isinstance(value, dict) else value for field, value in order.items()}
+
+
+def run_order(order, decisions):
+    """Take one order through the same transitions as "Proceed to Next Step"
+
+    Stops at the last step, or back at step 1 when credit is rejected. Returns the
+    final step and, for every step on the way, a copy of the order and the live
+    document sources as they stood when it ran, so its documents show that moment.
+    """
+    step = 1
+    snapshots = {}
+    issue_numbers(order, step)
+    while True:
+        snapshots[step] = (_snapshot(order), live_values(order, step))
+        if step == len(STEPS):
+            return step, snapshots
+        following = advance(order, step, decide(order, step, decisions), steps.transition(step))
+        if following < step:
+            return following, snapshots
+        step = following
+        issue_numbers(order, step)
+
+
+def _render(batch):
+    """Worker: render the documents of a batch of finished orders"""
+    return [
+        (key, list(order_documents(order, current_step, cached=False, snapshots=snapshots)))
+        for key, order, current_step, snapshots in batch
+    ]
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Ingestor:
+    """Streams purchase order records through the revenue cycle into the order store
+
+    Records are read, validated and run through the step transitions one at a time
+    on the calling thread, because credit, inventory, the schedule and document
+    numbers are shared state of this process. That serial stage is the ceiling:
+    about 1,300 orders a second on one core, so a million records take some 13
+    minutes. Rendering documents is independent per order, so batches of finished
+    orders go to a process pool and are written to the ZIP in input order. At most
+    `max_pending` batches are in flight: when the pool falls behind, reading waits.
+
+    A record whose transitions fail is written to the rejects with its error, and
+    what it held in the shared engines is released. The shared engines drop what
+    finished orders no longer need, so memory grows only with the open invoices
+    they keep for credit checks and the ledger.
+    """
+
+    def __init__(self, store, archive=None, rejects=None, workers=None, batch_size=256, max_pending=None):
+        self.store = store
+        self.archive = archive
+        self.rejects = rejects
+        self.workers = workers or os.cpu_count()
+        self.batch_size = batch_size
+        self.max_pending = max_pending or 2 * self.workers
+        self.counts = {'read': 0, 'invalid': 0, 'failed': 0, 'completed': 0, 'rejected': 0, 'documents': 0}
+        self.transition_seconds = 0.0
+
+    def _reject(self, number, error, count='invalid'):
+        self.counts[count] += 1
+        if self.rejects is not None:
+            self.rejects.write(json.dumps({'line': number, 'error': str(error)}) + "\n")
+
+    def orders(self, records):
+        """Yield (key, order, final step, step snapshots) for every valid record, storing each"""
+        for number, record in records:
+            self.counts['read'] += 1
+            try:
+                if isinstance(record, Exception):
+                    raise ValueError(f"invalid JSON: {record}")
+                order, decisions = to_order(record)
+            except ValueError as exc:
+                self._reject(number, exc)
+                continue
+            key = new_key()
+            order['order_key'] = key
+            started = time.perf_counter()
+            try:
+                current_step, snapshots = run_order(order, decisions)
+            except Exception as exc:  # one bad order must not end the run
+                steps.release(key)
+                self._reject(number, f"{type(exc).__name__}: {exc}", 'failed')
+                continue
+            finally:
+                self.transition_seconds += time.perf_counter() - started
+            self.store.put(key, order, current_step)
+            self.counts['completed' if current_step == len(STEPS) else 'rejected'] += 1
+            yield key, order, current_step, snapshots
+
+    def _write(self, rendered):
+        for key, documents in rendered:
+            self.counts['documents'] += write_documents(self.archive, documents, folder=f"{key}/")
+
+    def run(self, records):
+        batches = _batches(self.orders(records), self.batch_size)
+        if self.archive is None:
+            for _ in batches:
+                pass
+            return self.counts
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            for batch in batches:
+                if len(pending) >= self.max_pending:
+                    self._write(pending.popleft().result())
+                pending.append(pool.submit(_render, batch))
+            while pending:
+                self._write(pending.popleft().result())
+        return self.counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a CSV or JSONL file of customer purchase orders through the revenue cycle")
+    parser.add_argument("input", help="CSV or JSONL file of purchase orders, or - for stdin")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: from the file extension)")
+    parser.add_argument("--db", default="orders.db", help="order store to write the orders to")
+    parser.add_argument("--documents", help="ZIP file to write every order's documents to")
+    parser.add_argument("--rejects", help="JSONL file listing the records that failed validation or processing")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="document rendering processes")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if args.input.endswith((".jsonl", ".ndjson")) else "csv")
+    if args.input == "-":
+        source = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    else:
+        source = open(args.input, newline="", encoding="utf-8")
+    rejects = open(args.rejects, "w") if args.rejects else None
+    archive = None
+    if args.documents:
+        archive = zipfile.ZipFile(args.documents, "w", zipfile.ZIP_DEFLATED)
+    store = open_store(args.db)
+    restore_books(store)  # orders already in the store count towards credit exposure
+
+    started = time.perf_counter()
+    try:
+        ingestor = Ingestor(store, archive, rejects, args.workers, args.batch_size)
+        counts = ingestor.run(read_records(source, fmt))
+    finally:
+        source.close()
+        store.close()
+        if archive is not None:
+            archive.close()
+        if rejects is not None:
+            rejects.close()
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Read {counts['read']:,} records in {elapsed:.1f}s ({counts['read'] / elapsed:,.0f}/s): "
+        f"{counts['completed']:,} completed, {counts['rejected']:,} rejected on credit, "
+        f"{counts['invalid']:,} invalid, {counts['failed']:,} failed, {counts['documents']:,} documents; "
+        f"{ingestor.transition_seconds:.1f}s in the serial step transitions",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
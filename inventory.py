@@ -0,0 +1,198 @@
+import bisect
+import csv
+import os
+import threading
+from collections import namedtuple
+
+import engine
+from business_days import ordinal
+
+DEFAULT_LOCATION = "Warehouse Aisle 7, Shelf 3"
+
+# Finished goods on hand when no REVENUE_INVENTORY file is configured: (sku, location, quantity)
+DEFAULT_STOCK = (
+    ('Mountain Bike (Black)', DEFAULT_LOCATION, 120),
+)
+
+Reservation = namedtuple('Reservation', 'order_key sku location quantity need_date scheduled')
+
+
+class StockPosition:
+    """Finished goods of one SKU at one location, with its own lock
+
+    Reservations due today or earlier are a plain counter. Scheduled receipts and
+    future-dated reservations are kept as a sorted list of (day, delta) events, so
+    availability on a day is the lowest projected balance from that day onwards.
+    """
+    __slots__ = ('sku', 'location', 'on_hand', 'reserved', 'events', 'lock')
+
+    def __init__(self, sku, location, on_hand=0):
+        self.sku = sku
+        self.location = location
+        self.on_hand = on_hand
+        self.reserved = 0
+        self.events = []
+        self.lock = threading.Lock()
+
+    def available(self, day):
+        """Quantity that can still be promised on `day` without starving later commitments"""
+        balance = self.on_hand - self.reserved
+        events = self.events
+        index = 0
+        while index < len(events) and events[index][0] <= day:
+            balance += events[index][1]
+            index += 1
+        lowest = balance
+        for _, delta in events[index:]:
+            balance += delta
+            if balance < lowest:
+                lowest = balance
+        return lowest
+
+    def add_event(self, day, delta):
+        bisect.insort(self.events, (day, delta))
+
+    def remove_event(self, day, delta):
+        index = bisect.bisect_left(self.events, (day, delta))
+        if index < len(self.events) and self.events[index] == (day, delta):
+            del self.events[index]
+
+
+class InventoryEngine:
+    """Available-to-promise inventory shared by every session in the server process
+
+    Positions are indexed by (sku, location) and by SKU. Each position has its own
+    lock, so reservations for different SKUs or locations never wait on each other;
+    the engine-wide lock is only taken to create a position.
+    """
+
+    def __init__(self, stock=()):
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._locations = {}
+        self._reservations = {}
+        for sku, location, quantity in stock:
+            self.position(sku, location).on_hand += quantity
+
+    def position(self, sku, location=DEFAULT_LOCATION):
+        key = (sku, location)
+        position = self._positions.get(key)
+        if position is None:
+            with self._lock:
+                position = self._positions.get(key)
+                if position is None:
+                    position = self._positions[key] = StockPosition(sku, location)
+                    self._locations.setdefault(sku, []).append(location)
+        return position
+
+    def locations(self, sku):
+        return tuple(self._locations.get(sku, ()))
+
+    def available(self, sku, location=None, on=None):
+        """ATP for `sku` on date `on` (default today), at one location or summed over all"""
+        day = ordinal(on)
+        locations = (location,) if location else self.locations(sku)
+        total = 0
+        for name in locations:
+            position = self.position(sku, name)
+            with position.lock:
+                total += position.available(day)
+        return total
+
+    def primary_location(self, sku):
+        """Location with the most stock available today"""
+        locations = self.locations(sku)
+        if not locations:
+            return DEFAULT_LOCATION
+        return max(locations, key=lambda name: self.available(sku, name))
+
+    def receive(self, sku, quantity, location=DEFAULT_LOCATION, on=None):
+        """Book a receipt: on hand now, or scheduled for a future date"""
+        position = self.position(sku, location)
+        day = ordinal(on)
+        with position.lock:
+            if day <= ordinal(None):
+                position.on_hand += quantity
+            else:
+                position.add_event(day, quantity)
+
+    def reserve(self, sku, quantity, order_key, need_date=None, location=None):
+        """Reserve `quantity` for `order_key` at the first location that can cover it
+
+        Returns the Reservation, or None when no single location has enough available
+        on `need_date`. Reserving again for the same order replaces its reservation.
+        """
+        self.release(order_key)
+        day = ordinal(need_date)
+        today = ordinal(None)
+        for name in (location,) if location else self.locations(sku):
+            position = self.position(sku, name)
+            with position.lock:
+                if position.available(day) < quantity:
+                    continue
+                scheduled = day > today
+                if scheduled:
+                    position.add_event(day, -quantity)
+                else:
+                    position.reserved += quantity
+            reservation = Reservation(order_key, sku, name, quantity, day, scheduled)
+            self._reservations[order_key] = reservation
+            return reservation
+        return None
+
+    def release(self, order_key):
+        """Cancel the reservation of `order_key`, if any"""
+        reservation = self._reservations.pop(order_key, None)
+        if reservation is None:
+            return None
+        position = self.position(reservation.sku, reservation.location)
+        with position.lock:
+            if reservation.scheduled:
+                position.remove_event(reservation.need_date, -reservation.quantity)
+            else:
+                position.reserved -= reservation.quantity
+        return reservation
+
+    def issue(self, order_key):
+        """Ship a reservation: the reserved quantity leaves on-hand stock"""
+        reservation = self.release(order_key)
+        if reservation is None:
+            return None
+        position = self.position(reservation.sku, reservation.location)
+        with position.lock:
+            position.on_hand -= reservation.quantity
+        return reservation
+
+    def reservation(self, order_key):
+        return self._reservations.get(order_key)
+
+
+def load_stock(path):
+    """Read (sku, location, quantity) rows from a CSV file with those column headers"""
+    with open(path, newline="") as fh:
+        return [(row['sku'], row['location'], int(row['quantity'])) for row in csv.DictReader(fh)]
+
+
+def default_inventory():
+    """Inventory seeded from REVENUE_INVENTORY, or the single default SKU"""
+    path = os.environ.get('REVENUE_INVENTORY')
+    return InventoryEngine(load_stock(path) if path else DEFAULT_STOCK)
+
+
+INVENTORY = default_inventory()
+
+
+def check_inventory(order, decision):
+    """Step 4 transition: an In Stock decision must reserve the goods, else it becomes a back order"""
+    if decision == "In Stock":
+        reservation = INVENTORY.reserve(order['product'], order['quantity'], engine.order_key(order))
+        if reservation is None:
+            decision = "Out of Stock"
+    return engine.check_inventory(order, decision)
+
+
+def ship(order, decision=None):
+    """Step 8 transition: goods reserved from stock leave the warehouse"""
+    if order.get('inventory_status') == "In Stock":
+        INVENTORY.issue(engine.order_key(order))
+    return engine.ship(order, decision)
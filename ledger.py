@@ -0,0 +1,287 @@
+import threading
+from datetime import date
+
+import numpy as np
+
+import credit
+import engine
+
+# Chart of accounts; an entry's account is its index here
+ACCOUNTS = ('cash', 'accounts_receivable', 'sales_revenue', 'freight_revenue')
+CASH, RECEIVABLE, SALES, FREIGHT = range(len(ACCOUNTS))
+
+# A/R aging buckets by days since the invoice date: (label, first day, last day)
+AGING_BUCKETS = (('0-30', 0, 30), ('31-60', 31, 60), ('61-90', 61, 90), ('90+', 91, None))
+
+# How long a closed load's final freight waits for its order to be invoiced
+SETTLED_RETAIN_DAYS = 30
+
+# One journal line. Debits are positive amounts and credits negative, so every
+# journal sums to zero. `invoice` is the index of the invoice the line belongs to.
+ENTRY = np.dtype([
+    ('journal', np.int64),
+    ('day', 'datetime64[D]'),
+    ('account', np.int16),
+    ('invoice', np.int64),
+    ('amount', np.float64),
+])
+
+
+def _day64(value):
+    """datetime64[D] of a date, datetime or datetime64; None means today"""
+    value = value or date.today()
+    return np.datetime64(value.date() if hasattr(value, 'date') else value, 'D')
+
+
+class Ledger:
+    """Double-entry general ledger in columnar NumPy storage
+
+    Journal lines are appended to one structured array that doubles when full, so
+    reports are single vectorized passes (bincount, masks) over the columns. Account
+    balances and each invoice's invoiced and paid amounts are also kept as running
+    totals, so the figures shown per order are O(1) lookups.
+
+    The ledger also settles freight billed on consolidated loads (see
+    settle_freight()); orders whose load can no longer close are forgotten as
+    later shipments arrive, so that state stays as small as the open loads.
+    """
+
+    def __init__(self, capacity=4096, settled_retain_days=SETTLED_RETAIN_DAYS):
+        self._lock = threading.Lock()
+        self.entries = np.zeros(capacity, dtype=ENTRY)
+        self.size = 0
+        self.journals = 0
+        self.balances = np.zeros(len(ACCOUNTS))
+        self._invoices = {}
+        self.invoice_keys = []
+        self.invoice_days = np.zeros(capacity, dtype='datetime64[D]')
+        self.invoiced = np.zeros(capacity)
+        self.paid = np.zeros(capacity)
+        self.settled_retain_days = settled_retain_days
+        # Orders invoiced while their load is still open: order key -> (invoice, freight billed, invoice day)
+        self._billed = {}
+        # Orders whose load closed before they were invoiced: order key -> (final freight, day it closed)
+        self._settled = {}
+
+    def _invoice(self, key, day=None):
+        """Index of invoice `key`, registering it (dated `day`) if it is new"""
+        index = self._invoices.get(key)
+        if index is None:
+            index = self._invoices[key] = len(self.invoice_keys)
+            self.invoice_keys.append(key)
+            if index >= self.invoiced.size:
+                size = 2 * self.invoiced.size
+                self.invoice_days = np.resize(self.invoice_days, size)
+                self.invoiced = np.resize(self.invoiced, size)
+                self.paid = np.resize(self.paid, size)
+                self.invoiced[index:] = 0
+                self.paid[index:] = 0
+            self.invoice_days[index] = _day64(day)
+        return index
+
+    def post(self, day, lines, invoice=None, adjustment=False):
+        """Append one balanced journal of (account, amount) lines; returns its number
+
+        Receivable lines count as invoiced when positive and as paid when negative,
+        except in an `adjustment`, which changes the invoiced amount either way.
+        """
+        if not lines:
+            raise ValueError("A journal needs at least one line")
+        if round(sum(amount for _, amount in lines), 6) != 0:
+            raise ValueError(f"Unbalanced journal: debits and credits differ by {sum(a for _, a in lines)}")
+        day = _day64(day)
+        with self._lock:
+            return self._post(day, lines, invoice, adjustment)
+
+    def _post(self, day, lines, invoice, adjustment=False):
+        """post() of a checked journal, with the lock held"""
+        index = -1 if invoice is None else self._invoice(invoice, day)
+        if self.size + len(lines) > self.entries.size:
+            self.entries = np.resize(self.entries, max(2 * self.entries.size, self.size + len(lines)))
+        journal = self.journals
+        self.journals += 1
+        for account, amount in lines:
+            self.entries[self.size] = (journal, day, account, index, amount)
+            self.size += 1
+            self.balances[account] += amount
+            if account == RECEIVABLE and index >= 0:
+                if amount > 0 or adjustment:
+                    self.invoiced[index] += amount
+                else:
+                    self.paid[index] -= amount
+        return journal
+
+    @staticmethod
+    def _invoice_lines(sales, freight):
+        lines = [(RECEIVABLE, sales + freight), (SALES, -sales)]
+        if freight:
+            lines.append((FREIGHT, -freight))
+        return lines
+
+    def record_invoice(self, invoice, day, sales, freight):
+        """Dr Accounts Receivable, Cr Sales Revenue and Freight Revenue"""
+        return self.post(day, self._invoice_lines(sales, freight), invoice)
+
+    def invoice_order(self, order_key, invoice, day, sales, freight, consolidated=False):
+        """Post an order's invoice unless it is posted already; returns the freight billed, or None if it was
+
+        An order whose load closed before it was invoiced is billed the load's final
+        charge. One on a `consolidated` load still open is billed `freight` and
+        remembered, to be settled when the load closes.
+        """
+        day = _day64(day)
+        with self._lock:
+            if invoice in self._invoices:
+                return None
+            settled = self._settled.pop(order_key, None)
+            if settled is not None:
+                freight = engine.whole(settled[0])
+            elif consolidated:
+                self._billed[order_key] = (invoice, freight, day)
+            self._post(day, self._invoice_lines(sales, freight), invoice)
+            return freight
+
+    def settle_freight(self, charges, day):
+        """Settle {order key: final freight} of loads closed by a shipment on `day`
+
+        An invoiced order is credited the difference to what it was billed; returns
+        {invoice: credit} of those. One not invoiced yet is billed its final charge
+        when it is.
+        """
+        day = _day64(day)
+        credits = {}
+        with self._lock:
+            for order_key, charge in charges.items():
+                billed = self._billed.pop(order_key, None)
+                if billed is None:
+                    self._settled[order_key] = (charge, day)
+                    continue
+                invoice, freight, _ = billed
+                difference = round(freight - charge, 2)
+                if difference:
+                    self._post(day, [(FREIGHT, difference), (RECEIVABLE, -difference)], invoice, adjustment=True)
+                    credits[invoice] = difference
+            self._forget(day)
+        return credits
+
+    def _forget(self, day):
+        """Drop the freight state no load will settle any more, oldest first
+
+        A shipment on `day` has closed the loads of every earlier day, so an order
+        still billed from before it was on a load this process never closes (one
+        from before a restart). A final charge waits `settled_retain_days` for its
+        order to be invoiced.
+        """
+        while self._billed:
+            order_key, (_, _, invoiced) = next(iter(self._billed.items()))
+            if invoiced >= day:
+                break
+            del self._billed[order_key]
+        expired = day - np.timedelta64(self.settled_retain_days, 'D')
+        while self._settled:
+            order_key, (_, closed) = next(iter(self._settled.items()))
+            if closed >= expired:
+                break
+            del self._settled[order_key]
+
+    def record_freight_credit(self, invoice, day, amount):
+        """Dr Freight Revenue, Cr Accounts Receivable: the invoice's freight falls by `amount`"""
+        return self.post(day, [(FREIGHT, amount), (RECEIVABLE, -amount)], invoice, adjustment=True)
+
+    def record_payment(self, invoice, day, amount):
+        """Dr Cash, Cr Accounts Receivable"""
+        return self.post(day, [(CASH, amount), (RECEIVABLE, -amount)], invoice)
+
+    def balance(self, account):
+        return float(self.balances[ACCOUNTS.index(account) if isinstance(account, str) else account])
+
+    def invoice_summary(self, invoice):
+        """Invoiced, paid and open amount of one invoice, or None if it is unknown"""
+        index = self._invoices.get(invoice)
+        if index is None:
+            return None
+        invoiced, paid = float(self.invoiced[index]), float(self.paid[index])
+        return {'invoiced': invoiced, 'paid': paid, 'open': invoiced - paid}
+
+    def _columns(self):
+        with self._lock:
+            return self.entries[:self.size], len(self.invoice_keys)
+
+    def trial_balance(self):
+        """Debit and credit totals per account, aggregated from the journal lines"""
+        entries, _ = self._columns()
+        amounts = entries['amount']
+        debits = np.bincount(entries['account'], weights=np.where(amounts > 0, amounts, 0), minlength=len(ACCOUNTS))
+        credits = np.bincount(entries['account'], weights=np.where(amounts < 0, -amounts, 0), minlength=len(ACCOUNTS))
+        return {
+            account: {'debit': float(debit), 'credit': float(credit), 'balance': float(debit - credit)}
+            for account, debit, credit in zip(ACCOUNTS, debits, credits)
+        }
+
+    def revenue(self, start=None, end=None):
+        """Sales and freight revenue posted in [start, end); both bounds are optional"""
+        entries, _ = self._columns()
+        mask = np.isin(entries['account'], (SALES, FREIGHT))
+        if start is not None:
+            mask &= entries['day'] >= _day64(start)
+        if end is not None:
+            mask &= entries['day'] < _day64(end)
+        totals = np.bincount(entries['account'][mask], weights=-entries['amount'][mask], minlength=len(ACCOUNTS))
+        return {'sales_revenue': float(totals[SALES]), 'freight_revenue': float(totals[FREIGHT])}
+
+    def last_day(self):
+        """Day of the latest journal line, or None while the ledger is empty"""
+        entries, _ = self._columns()
+        return entries['day'].max().astype(date) if entries.size else None
+
+    def aging(self, as_of=None):
+        """Open receivables bucketed by days since the invoice date, as of `as_of`
+
+        `as_of` defaults to the latest day posted rather than today, as simulated
+        orders are dated ahead of the calendar.
+        """
+        entries, invoices = self._columns()
+        as_of = _day64(as_of or (entries['day'].max() if entries.size else None))
+        receivable = (entries['account'] == RECEIVABLE) & (entries['invoice'] >= 0) & (entries['day'] <= as_of)
+        open_amounts = np.bincount(
+            entries['invoice'][receivable], weights=entries['amount'][receivable], minlength=invoices
+        )
+        with self._lock:
+            ages = (as_of - self.invoice_days[:invoices]).astype(np.int64)
+        buckets = {}
+        for label, first, last in AGING_BUCKETS:
+            mask = (ages >= first) & (open_amounts > 0.005)
+            if last is not None:
+                mask &= ages <= last
+            buckets[label] = float(open_amounts[mask].sum())
+        return buckets
+
+
+LEDGER = Ledger()
+
+
+def settle_freight(charges, day):
+    """Settle {order key: final freight} of closed loads in the ledger, then in the credit exposure"""
+    for key, difference in LEDGER.settle_freight(charges, day).items():
+        if difference > 0:
+            try:
+                credit.CREDIT.record_payment(key, difference)  # a credit shrinks the exposure like a payment
+            except KeyError:
+                pass  # the invoice is paid already
+
+
+def invoice(order, decision=None):
+    """Step 9 transition: post the invoice to the ledger, then to the credit exposure
+
+    Both are idempotent on their own: an order that started over after it was
+    invoiced keeps its posted invoice, but still drops the exposure step 3 added again.
+    """
+    order_key = engine.order_key(order)
+    key = order.get('invoice_number') or order_key
+    freight = LEDGER.invoice_order(
+        order_key, key, order['current_date'], order['total_value'], order['costs']['shipping'],
+        consolidated=bool(order.get('carrier'))
+    )
+    if freight is not None:
+        order['costs']['shipping'] = freight
+    credit.invoice(order, decision)
@@ -0,0 +1,275 @@
+import bisect
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Histogram bucket upper bounds, Prometheus style: seconds for timers, bytes for sizes
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class CounterValue:
+    """Monotonic counter"""
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Bucketed distribution of observed values with count, sum and max"""
+    __slots__ = ('buckets', 'counts', 'count', 'total', 'max', '_lock')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket that contains it"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'sum': self.total,
+                'max': self.max,
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95),
+                'p99': self.quantile(0.99),
+                'bounds': list(self.buckets),
+                'buckets': list(self.counts)
+            }
+
+
+class Metrics:
+    """Process-wide registry of counters and histograms, keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def _series(self, table, factory, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        series = table.get(key)
+        if series is None:
+            with self._lock:
+                series = table.setdefault(key, factory())
+        return series
+
+    def count(self, name, amount=1, **labels):
+        self._series(self.counters, CounterValue, name, labels).add(amount)
+
+    def observe(self, name, value, buckets=BUCKETS, **labels):
+        self._series(self.histograms, lambda: Histogram(buckets), name, labels).observe(value)
+
+    def timer(self, name, **labels):
+        """Context manager that records the duration of its block, also when it raises"""
+        return _Timer(self, name, labels)
+
+    def timed(self, name, **labels):
+        """Decorator version of timer()"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Timer(self, name, labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_dict(self):
+        def label_text(labels):
+            return ",".join(f"{k}={v}" for k, v in labels)
+
+        with self._lock:
+            counters = list(self.counters.items())
+            histograms = list(self.histograms.items())
+        return {
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': counter.value}
+                for (name, labels), counter in sorted(counters, key=lambda i: (i[0][0], label_text(i[0][1])))
+            ],
+            'histograms': [
+                {'name': name, 'labels': dict(labels), **series.snapshot()}
+                for (name, labels), series in sorted(histograms, key=lambda i: (i[0][0], label_text(i[0][1])))
+            ]
+        }
+
+    def to_prometheus(self, prefix="revenue_"):
+        """Render all series in the Prometheus text exposition format"""
+        def labels_text(labels, extra=()):
+            pairs = [*labels.items(), *extra]
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        data = self.to_dict()
+        lines = []
+        for name in dict.fromkeys(c['name'] for c in data['counters']):
+            lines.append(f"# TYPE {prefix}{name}_total counter")
+            for c in data['counters']:
+                if c['name'] == name:
+                    lines.append(f"{prefix}{name}_total{labels_text(c['labels'])} {c['value']}")
+        for name in dict.fromkeys(h['name'] for h in data['histograms']):
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for h in data['histograms']:
+                if h['name'] != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip((*h['bounds'], "+Inf"), h['buckets']):
+                    cumulative += count
+                    lines.append(f"{prefix}{name}_bucket{labels_text(h['labels'], [('le', bound)])} {cumulative}")
+                lines.append(f"{prefix}{name}_sum{labels_text(h['labels'])} {h['sum']}")
+                lines.append(f"{prefix}{name}_count{labels_text(h['labels'])} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Write the metrics to `path` atomically; .json gives JSON, anything else Prometheus text"""
+        if path.endswith(".json"):
+            text = json.dumps(self.to_dict(), indent=2)
+        else:
+            text = self.to_prometheus()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def start_dumper(metrics, path, interval=15.0):
+    """Dump `metrics` to `path` every `interval` seconds from a daemon thread"""
+    def loop():
+        while True:
+            time.sleep(interval)
+            metrics.dump(path)
+
+    thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+    thread.start()
+    return thread
+
+
+_profiled_threads = set()
+
+
+def profile_path(directory, name):
+    """File in `directory` for the folded stacks of `name`, which may come from a URL
+
+    A name other than a hex key is hashed, so it cannot reach outside `directory`.
+    """
+    if not re.fullmatch(r"[0-9a-f]{1,64}", name):
+        name = hashlib.sha256(name.encode()).hexdigest()
+    directory = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(directory, f"{name}.folded"))
+    if os.path.dirname(path) != directory:
+        raise ValueError(f"Profile path {path} is outside {directory}")
+    return path
+
+
+def profile_thread(path, interval=0.005):
+    """Start sampling the calling thread into `path` unless it is already being sampled"""
+    thread_id = threading.get_ident()
+    if thread_id in _profiled_threads:
+        return None
+    _profiled_threads.add(thread_id)
+    return SamplingProfiler(path, thread_id, interval).start()
+
+
+class SamplingProfiler:
+    """Sample the stack of one thread until it exits and append folded stacks to a file
+
+    The output is the collapsed format read by flamegraph.pl and speedscope:
+    one "outer;...;inner count" line per distinct stack.
+    """
+
+    def __init__(self, path, thread_id=None, interval=0.005):
+        self.path = path
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+
+    def start(self):
+        threading.Thread(target=self._run, name="sampling-profiler", daemon=True).start()
+        return self
+
+    def _run(self):
+        while True:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            del frame
+            time.sleep(self.interval)
+        _profiled_threads.discard(self.thread_id)
+        self.write()
+
+    def write(self):
+        if not self.stacks:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as fh:
+            for stack, count in self.stacks.items():
+                fh.write(f"{stack} {count}\n")
+
+
+REGISTRY = Metrics()
+count = REGISTRY.count
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+timed = REGISTRY.timed
@@ -0,0 +1,313 @@
+import csv
+import heapq
+import os
+import threading
+from collections import namedtuple
+
+import engine
+import inventory
+
+# An item of the item master. Items with a bill of materials are made, the rest bought.
+Item = namedtuple('Item', 'name vendor unit_cost lead_time')
+
+# One planned or placed purchase of a bought item
+PurchaseLine = namedtuple('PurchaseLine', 'item quantity vendor unit_cost lead_time')
+
+# Item master used when no REVENUE_ITEMS file is configured:
+# (item, vendor, unit cost, lead time in business days, on hand)
+DEFAULT_ITEMS = (
+    ('Mountain Bike (Black)', None, 0, 0, 0),
+    ('Bike Frames (Black)', 'Premium Bike Frames Ltd.', 400, 10, 150),
+    ('Wheelset', None, 0, 0, 0),
+    ('Rim', 'Alloy Rim Co.', 25, 7, 400),
+    ('Spoke', 'Alloy Rim Co.', 0.25, 7, 12800),
+    ('Hub', 'Velo Components', 30, 5, 400),
+    ('Tire', 'Trail Tires Inc.', 20, 4, 400),
+    ('Drivetrain', None, 0, 0, 0),
+    ('Crankset', 'Velo Components', 60, 5, 200),
+    ('Chain', 'Velo Components', 15, 5, 200),
+    ('Derailleur', 'Velo Components', 45, 5, 200),
+    ('Cassette', 'Velo Components', 40, 5, 200),
+)
+
+# Bill of materials used when no REVENUE_BOM file is configured: (parent, component, quantity per parent)
+DEFAULT_BOM = (
+    ('Mountain Bike (Black)', 'Bike Frames (Black)', 1),
+    ('Mountain Bike (Black)', 'Wheelset', 1),
+    ('Mountain Bike (Black)', 'Drivetrain', 1),
+    ('Wheelset', 'Rim', 2),
+    ('Wheelset', 'Spoke', 64),
+    ('Wheelset', 'Hub', 2),
+    ('Wheelset', 'Tire', 2),
+    ('Drivetrain', 'Crankset', 1),
+    ('Drivetrain', 'Chain', 1),
+    ('Drivetrain', 'Derailleur', 1),
+    ('Drivetrain', 'Cassette', 1),
+)
+
+
+class MRPEngine:
+    """Material requirements planning over a multi-level bill of materials
+
+    Every item has a low-level code (its deepest level in any BOM), so processing
+    items by code sees all parents of an item before the item itself. Gross and net
+    requirements are kept per item for all open back orders together. When one order
+    changes, only the items below its product are re-netted, lowest code first, and
+    the walk stops wherever the net requirement does not change. Per-unit explosions
+    of an item into bought parts are memoized.
+    """
+
+    def __init__(self, items=DEFAULT_ITEMS, bom=DEFAULT_BOM):
+        self._lock = threading.Lock()
+        self.items = {}
+        self.on_hand = {}
+        self.on_order = {}
+        for name, vendor, unit_cost, lead_time, on_hand in items:
+            self.items[name] = Item(name, vendor, unit_cost, lead_time)
+            self.on_hand[name] = on_hand
+            self.on_order[name] = 0
+        self.children = {name: [] for name in self.items}
+        self.parents = {name: [] for name in self.items}
+        for parent, component, quantity in bom:
+            for name in (parent, component):
+                if name not in self.items:
+                    raise ValueError(f"BOM item {name!r} is not in the item master")
+            self.children[parent].append((component, quantity))
+            self.parents[component].append((parent, quantity))
+        self.level = self._low_level_codes()
+
+        self.demand = dict.fromkeys(self.items, 0)
+        self.gross = dict.fromkeys(self.items, 0)
+        self.net = dict.fromkeys(self.items, 0)
+        self._orders = {}
+        self._explosions = {}
+        self._below = {}
+
+    def _low_level_codes(self):
+        """Deepest BOM level of every item, by a topological walk; rejects cyclic BOMs"""
+        level = dict.fromkeys(self.items, 0)
+        waiting = {name: len(parents) for name, parents in self.parents.items()}
+        ready = [name for name, count in waiting.items() if count == 0]
+        seen = 0
+        while ready:
+            name = ready.pop()
+            seen += 1
+            for component, _ in self.children[name]:
+                level[component] = max(level[component], level[name] + 1)
+                waiting[component] -= 1
+                if waiting[component] == 0:
+                    ready.append(component)
+        if seen != len(self.items):
+            raise ValueError("The bill of materials contains a cycle")
+        return level
+
+    def bought(self, name):
+        return not self.children[name]
+
+    def explode(self, name):
+        """Bought parts per unit of `name` through every level, ignoring stock; memoized"""
+        explosion = self._explosions.get(name)
+        if explosion is None:
+            if name not in self.items:
+                return {}
+            if self.bought(name):
+                explosion = {name: 1}
+            else:
+                explosion = {}
+                for component, quantity in self.children[name]:
+                    for part, per_unit in self.explode(component).items():
+                        explosion[part] = explosion.get(part, 0) + quantity * per_unit
+            self._explosions[name] = explosion
+        return explosion
+
+    def _items_below(self, name):
+        """`name` and everything in its BOM; memoized"""
+        below = self._below.get(name)
+        if below is None:
+            below = {name}
+            for component, _ in self.children[name]:
+                below |= self._items_below(component)
+            self._below[name] = below = frozenset(below)
+        return below
+
+    def _renet(self, dirty):
+        """Recompute gross and net requirements from the `dirty` items downwards"""
+        heap = [(self.level[name], name) for name in dirty]
+        heapq.heapify(heap)
+        queued = set(dirty)
+        while heap:
+            _, name = heapq.heappop(heap)
+            queued.discard(name)
+            gross = self.demand[name] + sum(self.net[parent] * quantity for parent, quantity in self.parents[name])
+            net = max(0, gross - self.on_hand[name] - self.on_order[name])
+            self.gross[name] = gross
+            if net == self.net[name]:
+                continue
+            self.net[name] = net
+            for component, _ in self.children[name]:
+                if component not in queued:
+                    queued.add(component)
+                    heapq.heappush(heap, (self.level[component], component))
+
+    def set_demand(self, order_key, product, quantity):
+        """Add or replace the back order `order_key` for `quantity` of `product`"""
+        if product not in self.items:
+            return  # no bill of materials to plan with
+        with self._lock:
+            dirty = set(self._remove(order_key))
+            self._orders[order_key] = {'product': product, 'quantity': quantity, 'purchased': []}
+            self.demand[product] += quantity
+            dirty.add(product)
+            self._renet(dirty)
+
+    def _remove(self, order_key):
+        order = self._orders.pop(order_key, None)
+        if order is None:
+            return ()
+        self.demand[order['product']] -= order['quantity']
+        return (order['product'],)
+
+    def cancel(self, order_key):
+        with self._lock:
+            self._renet(self._remove(order_key))
+
+    def receive(self, name, quantity):
+        """Book a receipt of `quantity` of `name` into stock"""
+        with self._lock:
+            self.on_hand[name] += quantity
+            self._renet({name})
+
+    def shortages(self, order_key):
+        """Bought parts the order still needs that stock and open purchases do not cover"""
+        with self._lock:
+            order = self._orders.get(order_key)
+            if order is None:
+                return []
+            return self._shortages(order)
+
+    def _shortages(self, order):
+        """Purchase lines for the order's part of the net requirements
+
+        Net requirements are kept for all open back orders together, not per order:
+        each order is short of its own need or the net requirement, whichever is
+        less. Net requirements are allocated to orders first come, first served:
+        the first order to procure buys the shortfall, and the orders after it find
+        it covered by that open purchase.
+        """
+        lines = []
+        for part, per_unit in self.explode(order['product']).items():
+            quantity = min(per_unit * order['quantity'], self.net[part])
+            if quantity > 0:
+                item = self.items[part]
+                lines.append(PurchaseLine(part, quantity, item.vendor, item.unit_cost, item.lead_time))
+        return lines
+
+    def purchases(self, order_key):
+        """Purchases placed for the order, or the ones it would place now"""
+        with self._lock:
+            order = self._orders.get(order_key)
+            if order is None:
+                return []
+            return order['purchased'] or self._shortages(order)
+
+    def procure(self, order_key):
+        """Order the order's shortages from their vendors; returns the PurchaseLines"""
+        with self._lock:
+            order = self._orders.get(order_key)
+            if order is None:
+                return []
+            lines = self._shortages(order)
+            for line in lines:
+                self.on_order[line.item] += line.quantity
+            order['purchased'] = order['purchased'] + lines
+            self._renet({line.item for line in lines})
+            return lines
+
+    def complete(self, order_key):
+        """Receive the order's purchases and consume its materials in production"""
+        with self._lock:
+            order = self._orders.get(order_key)
+            if order is None:
+                return
+            for line in order['purchased']:
+                self.on_order[line.item] -= line.quantity
+                self.on_hand[line.item] += line.quantity
+            for component, quantity in self.children[order['product']]:
+                self._consume(component, quantity * order['quantity'])
+            self._remove(order_key)
+            self._renet(self._items_below(order['product']))
+
+    def _consume(self, name, quantity):
+        """Take `quantity` of `name` from stock, building any missing sub-assemblies"""
+        taken = min(self.on_hand[name], quantity)
+        self.on_hand[name] -= taken
+        missing = quantity - taken
+        if missing and not self.bought(name):
+            for component, per_unit in self.children[name]:
+                self._consume(component, missing * per_unit)
+        elif missing:
+            self.on_hand[name] -= missing
+
+    def requisitions(self):
+        """Net requirements of every bought part, consolidated per vendor"""
+        with self._lock:
+            by_vendor = {}
+            for name, net in self.net.items():
+                if net > 0 and self.bought(name):
+                    item = self.items[name]
+                    by_vendor.setdefault(item.vendor, []).append(
+                        PurchaseLine(name, net, item.vendor, item.unit_cost, item.lead_time)
+                    )
+            return by_vendor
+
+
+def load_items(path):
+    """Read (item, vendor, unit_cost, lead_time, on_hand) rows from a CSV file with those headers"""
+    with open(path, newline="") as fh:
+        return [
+            (row['item'], row.get('vendor') or None, float(row.get('unit_cost') or 0),
+             int(row.get('lead_time') or 0), int(row.get('on_hand') or 0))
+            for row in csv.DictReader(fh)
+        ]
+
+
+def load_bom(path):
+    """Read (parent, component, quantity) rows from a CSV file with those headers"""
+    with open(path, newline="") as fh:
+        return [(row['parent'], row['component'], float(row['quantity'])) for row in csv.DictReader(fh)]
+
+
+def default_mrp():
+    """MRP engine for REVENUE_ITEMS and REVENUE_BOM, or the default mountain bike BOM"""
+    items_path = os.environ.get('REVENUE_ITEMS')
+    bom_path = os.environ.get('REVENUE_BOM')
+    return MRPEngine(
+        load_items(items_path) if items_path else DEFAULT_ITEMS,
+        load_bom(bom_path) if bom_path else DEFAULT_BOM
+    )
+
+
+MRP = default_mrp()
+
+
+def check_inventory(order, decision):
+    """Step 4 transition: an order that goes to back order adds its demand to the plan"""
+    jump = inventory.check_inventory(order, decision)
+    if order['inventory_status'] == "Out of Stock":
+        MRP.set_demand(engine.order_key(order), order['product'], order['quantity'])
+    return jump
+
+
+def check_materials(order, decision):
+    """Step 5 transition: materials only count as available when nothing is short"""
+    if decision == "Available" and MRP.shortages(engine.order_key(order)):
+        decision = "Not Available"
+    return engine.check_materials(order, decision)
+
+
+def procure(order, decision=None):
+    """Step 6 transition: buy the shortages; cost and lead time come from the purchase lines"""
+    lines = MRP.procure(engine.order_key(order))
+    cost = round(sum(line.quantity * line.unit_cost for line in lines), 2)
+    order['costs']['procurement'] = engine.whole(cost)
+    engine.update_timeline(order, max((line.lead_time for line in lines), default=0))
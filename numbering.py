@@ -0,0 +1,129 @@
+import itertools
+import os
+import sqlite3
+import threading
+
+
+class _Block:
+    """A reserved range [start, end) of one sequence, handed out by an atomic counter"""
+    __slots__ = ('counter', 'end', 'low_water')
+
+    def __init__(self, start, end):
+        self.counter = itertools.count(start)
+        self.end = end
+        self.low_water = start + (end - start) // 2
+
+
+class _Sequence:
+    __slots__ = ('name', 'lock', 'block', 'spare', 'prefetching')
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.block = _Block(0, 0)
+        self.spare = None
+        self.prefetching = False
+
+
+class SequenceAllocator:
+    """Unique, gap-tolerant numbers for any number of named sequences
+
+    Numbers are handed out from blocks of `block_size` reserved in a SQLite table,
+    so the database is written once per block rather than once per number, and a
+    restart never reissues a number (the unused rest of a block is skipped). Taking a
+    number is a single next() on an itertools.count, which is atomic under the GIL,
+    so the hot path takes no lock. Once half of a block is used, the next one is
+    reserved by a background thread; a sequence's own lock is only taken to switch
+    blocks.
+    """
+
+    def __init__(self, path=':memory:', block_size=1000):
+        self.path = path
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._conn = None
+        self._sequences = {}
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, next INTEGER NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def _reserve(self, name):
+        """Persist and return a new block; other processes sharing the file get disjoint blocks"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT OR IGNORE INTO sequences VALUES (?, 1)", (name,))
+                start = conn.execute("SELECT next FROM sequences WHERE name = ?", (name,)).fetchone()[0]
+                conn.execute("UPDATE sequences SET next = ? WHERE name = ?", (start + self.block_size, name))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return _Block(start, start + self.block_size)
+
+    def _sequence(self, name):
+        sequence = self._sequences.get(name)
+        if sequence is None:
+            with self._lock:
+                sequence = self._sequences.setdefault(name, _Sequence(name))
+        return sequence
+
+    def next(self, name):
+        """Next number of sequence `name`"""
+        sequence = self._sequence(name)
+        while True:
+            block = sequence.block
+            number = next(block.counter)
+            if number < block.end:
+                if number == block.low_water:
+                    self._prefetch(sequence)
+                return number
+            self._switch(sequence, block)
+
+    def _switch(self, sequence, exhausted):
+        with sequence.lock:
+            if sequence.block is not exhausted:
+                return
+            spare, sequence.spare = sequence.spare, None
+            sequence.block = spare or self._reserve(sequence.name)
+
+    def _prefetch(self, sequence):
+        with sequence.lock:
+            if sequence.prefetching or sequence.spare is not None:
+                return
+            sequence.prefetching = True
+
+        def reserve():
+            block = None
+            try:
+                block = self._reserve(sequence.name)
+            finally:
+                with sequence.lock:
+                    sequence.prefetching = False
+                    if sequence.spare is None:
+                        sequence.spare = block
+
+        threading.Thread(target=reserve, name=f"sequence-{sequence.name}", daemon=True).start()
+
+    def number(self, prefix):
+        """Next document number with `prefix`, e.g. INV-000103"""
+        return f"{prefix}-{self.next(prefix):06d}"
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def default_allocator():
+    """Allocator persisting its blocks to DOCUMENT_NUMBERS_PATH (default document_numbers.db)"""
+    return SequenceAllocator(os.environ.get('DOCUMENT_NUMBERS_PATH', 'document_numbers.db'))
+
+
+NUMBERS = default_allocator()
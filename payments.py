@@ -0,0 +1,440 @@
+import argparse
+import csv
+import json
+import math
+import re
+import sys
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from credit import CREDIT
+from engine import order_key
+from ledger import LEDGER
+from store import open_store
+
+# One incoming payment from a bank statement
+StatementLine = namedtuple('StatementLine', 'line day amount reference payer')
+
+# One application of (part of) a payment to an invoice
+Allocation = namedtuple('Allocation', 'invoice amount rule')
+
+# BAI2 transaction type codes 100-399 are credits (money received)
+BAI2_CREDIT_TYPES = range(100, 400)
+
+_TOKENS = re.compile(r"[A-Za-z0-9-]+")
+
+
+def _cents(amount):
+    return int(round(amount * 100))
+
+
+def invoice_total(order):
+    """Amount invoiced to the order, net of freight credits once the ledger holds its invoice"""
+    summary = LEDGER.invoice_summary(order.get('invoice_number') or order_key(order))
+    if summary is not None:
+        return summary['invoiced']
+    return order['total_value'] + order['costs']['shipping']
+
+
+def apply_to_order(order, amount):
+    """Record `amount` received against the order's invoice and update its payment status"""
+    order['amount_paid'] = (order.get('amount_paid') or 0) + amount
+    if order['amount_paid'] >= invoice_total(order) - 0.005:
+        order['payment_status'] = "Paid"
+    else:
+        order['payment_status'] = "Partially Paid"
+
+
+def post_payment(invoice, amount, day):
+    """Post a received payment to the ledger and release it from the customer's credit exposure"""
+    LEDGER.record_payment(invoice, day, amount)
+    try:
+        CREDIT.record_payment(invoice, amount)
+    except KeyError:
+        pass  # invoiced before a server restart; nothing left in the exposure index
+
+
+def collect(order):
+    """Step 10: the customer pays the open balance of the order's invoice
+
+    Payments another process recorded on the order (payments.py run against the
+    same store) are posted to this process's ledger and credit exposure first,
+    and are not collected again.
+    """
+    invoice = order.get('invoice_number') or order_key(order)
+    summary = LEDGER.invoice_summary(invoice)
+    if summary is not None:
+        unposted = round((order.get('amount_paid') or 0) - summary['paid'], 2)
+        if unposted > 0.005:
+            post_payment(invoice, unposted, order['current_date'])
+    amount = invoice_total(order) - (order.get('amount_paid') or 0)
+    if amount > 0:
+        post_payment(invoice, amount, order['current_date'])
+        apply_to_order(order, amount)
+
+
+def invoiced(record):
+    """Whether a stored order's invoice was posted: its number is issued on reaching step 9, posted on leaving it"""
+    return record.invoice_number is not None and record.current_step != 9
+
+
+def restore_invoice(order):
+    """Post a stored order's invoice to a ledger and credit engine that lack it, with what was paid on it"""
+    invoice = order['invoice_number']
+    if LEDGER.invoice_summary(invoice) is not None:
+        return
+    total = order['total_value'] + order['costs']['shipping']
+    LEDGER.record_invoice(invoice, order['current_date'], order['total_value'], order['costs']['shipping'])
+    CREDIT.invoice(order['customer_name'], order_key(order), invoice, total)
+    paid = order.get('amount_paid') or 0
+    if paid:
+        post_payment(invoice, paid, order['current_date'])
+
+
+def restore_books(store):
+    """Rebuild the ledger and credit exposure of a new process from the orders in `store`
+
+    Both live in memory only. Posted invoices are posted again with what was paid
+    on them, and approved orders not yet invoiced become pending exposure again.
+    Consolidated loads are not kept across a restart, so restored invoices keep
+    the freight they were billed: no load is left to settle it.
+    """
+    for key, record in store.items():
+        if invoiced(record):
+            order = record.to_order()
+            order['order_key'] = key
+            restore_invoice(order)
+        elif record.credit_status == "Approve" and record.current_step > 3:
+            CREDIT.approve(record.customer_name, key, record.total_value)
+
+
+def _reject(rejected, number, error):
+    """Skip statement line `number`, appending it to `rejected`; raises when there is no such list"""
+    if rejected is None:
+        raise ValueError(f"Statement line {number}: {error}") from error
+    rejected.append((number, f"{type(error).__name__}: {error}"))
+
+
+def _amount(text, scale=1):
+    amount = float(text) / scale
+    if not math.isfinite(amount):
+        raise ValueError(f"amount {text!r} is not a number")
+    return amount
+
+
+def read_csv_statement(fileobj, rejected=None):
+    """StatementLines of a CSV with date, amount, reference and optional payer columns
+
+    The whole statement is read before any of it is posted. A row that does not
+    parse raises ValueError, or is skipped and appended to `rejected` as
+    (line, error) when that list is given.
+    """
+    lines = []
+    for number, row in enumerate(csv.DictReader(fileobj), 2):
+        try:
+            lines.append(StatementLine(
+                number,
+                date.fromisoformat((row.get('date') or "").strip()[:10]),
+                _amount(row.get('amount') or ""),
+                row.get('reference') or "",
+                (row.get('payer') or "").strip()
+            ))
+        except ValueError as exc:
+            _reject(rejected, number, exc)
+    return lines
+
+
+def _bai2_references(fields):
+    """Index of a 16 record's bank reference: the funds type (field 3) may add availability fields
+
+    V adds a value date and time, S the immediate, one-day and two-or-more-day
+    amounts, and D a count of distributions followed by a days, amount pair each.
+    """
+    funds_type = fields[3].strip().upper()
+    if funds_type == "V":
+        return 6
+    if funds_type == "S":
+        return 7
+    if funds_type == "D":
+        return 5 + 2 * int(fields[4])
+    return 4
+
+
+def read_bai2_statement(fileobj, rejected=None):
+    """StatementLines of the credit transactions (16 records) of a BAI2 file
+
+    Amounts are in cents, the date is the as-of date of the group (02 record), the
+    customer reference field is the reference and the text field is the payer. Text
+    continued on 88 records is appended. Records that do not parse are handled as
+    in read_csv_statement(); so are the transactions of a group whose header does not.
+    """
+    lines = []
+    day = None
+    group_error = None
+    pending = None
+    for number, line in enumerate(fileobj, 1):
+        fields = line.strip().rstrip("/").split(",")
+        code = fields[0]
+        if code == "88" and pending is not None:
+            pending = pending._replace(payer=f"{pending.payer} {','.join(fields[1:])}".strip())
+            continue
+        if pending is not None:
+            lines.append(pending)
+            pending = None
+        try:
+            if code == "02":
+                day, group_error = None, None
+                try:
+                    day = datetime.strptime(fields[4], "%y%m%d").date()
+                except (IndexError, ValueError) as exc:
+                    group_error = ValueError(f"group header on line {number} does not parse")
+                    raise ValueError(f"group header: {exc}") from exc
+            elif code == "16" and fields[1] and int(fields[1]) in BAI2_CREDIT_TYPES:
+                if group_error is not None:
+                    raise group_error
+                if not fields[2].strip():
+                    raise ValueError("credit without an amount")
+                references = _bai2_references(fields)
+                if len(fields) <= references + 1:
+                    raise ValueError("credit without a customer reference field")
+                pending = StatementLine(
+                    number, day, _amount(fields[2], 100), fields[references + 1],
+                    ",".join(fields[references + 2:]).strip()
+                )
+        except (IndexError, ValueError) as exc:
+            _reject(rejected, number, exc)
+    if pending is not None:
+        lines.append(pending)
+    return lines
+
+
+def read_statement(fileobj, fmt, rejected=None):
+    reader = read_bai2_statement if fmt == "bai2" else read_csv_statement
+    return reader(fileobj, rejected)
+
+
+class OpenInvoice:
+    """An invoice waiting for payment, as held by the matcher"""
+    __slots__ = ('key', 'customer', 'open', 'day', 'order_key')
+
+    def __init__(self, key, customer, open_amount, day, order_key=None):
+        self.key = key
+        self.customer = customer
+        self.open = open_amount
+        self.day = day
+        self.order_key = order_key
+
+
+class PaymentMatcher:
+    """Matches statement lines to open invoices through hash indexes
+
+    Invoices are indexed by number, by open amount and by customer. A payment is
+    matched in this order:
+
+    1. invoice numbers quoted in its reference, paid in the order quoted; a payment
+       short of the invoices leaves the last one partially paid
+    2. a single invoice whose open amount is within `tolerance` of the payment and
+       dated no more than `window_days` before it, preferring the payer's own invoices
+    3. the payer's oldest open invoices whose open amounts add up to the payment
+
+    The amount index is bucketed by `tolerance`, so a lookup reads three buckets
+    instead of scanning every open invoice.
+    """
+
+    def __init__(self, tolerance=1.0, window_days=90):
+        self.tolerance = _cents(tolerance)
+        self.window = timedelta(days=window_days)
+        self._bucket_size = self.tolerance + 1
+        self.invoices = {}
+        self._by_amount = {}
+        self._by_customer = {}
+
+    def __len__(self):
+        return len(self.invoices)
+
+    def _bucket(self, cents):
+        return cents // self._bucket_size
+
+    def add(self, invoice):
+        self.invoices[invoice.key] = invoice
+        self._by_amount.setdefault(self._bucket(_cents(invoice.open)), {})[invoice.key] = invoice
+        self._by_customer.setdefault(invoice.customer.casefold(), {})[invoice.key] = invoice
+
+    def _remove(self, invoice):
+        del self.invoices[invoice.key]
+        bucket = self._bucket(_cents(invoice.open))
+        del self._by_amount[bucket][invoice.key]
+        if not self._by_amount[bucket]:
+            del self._by_amount[bucket]
+        customer = invoice.customer.casefold()
+        del self._by_customer[customer][invoice.key]
+        if not self._by_customer[customer]:
+            del self._by_customer[customer]
+
+    def _apply(self, invoice, amount, rule):
+        """Take `amount` off the invoice, re-indexing it under its new open amount"""
+        self._remove(invoice)
+        invoice.open = round(invoice.open - amount, 2)
+        if invoice.open > 0.005:
+            self.add(invoice)
+        return Allocation(invoice, amount, rule)
+
+    def _by_reference(self, line):
+        quoted = dict.fromkeys(
+            self.invoices[token] for token in _TOKENS.findall(line.reference) if token in self.invoices
+        )
+        allocations = []
+        remaining = line.amount
+        for invoice in quoted:
+            if remaining <= 0.005:
+                break
+            amount = min(invoice.open, remaining)
+            allocations.append(self._apply(invoice, amount, "reference"))
+            remaining = round(remaining - amount, 2)
+        return allocations
+
+    def _by_amount_within_window(self, line):
+        cents = _cents(line.amount)
+        payer = line.payer.casefold()
+        best = None
+        for bucket in (self._bucket(cents) - 1, self._bucket(cents), self._bucket(cents) + 1):
+            for invoice in self._by_amount.get(bucket, {}).values():
+                difference = abs(_cents(invoice.open) - cents)
+                if difference > self.tolerance or not self._in_window(invoice, line):
+                    continue
+                rank = (invoice.customer.casefold() != payer, difference, invoice.day)
+                if best is None or rank < best[0]:
+                    best = (rank, invoice)
+        if best is None:
+            return []
+        invoice = best[1]
+        return [self._apply(invoice, min(invoice.open, line.amount), "amount")]
+
+    def _by_customer_total(self, line):
+        invoices = self._by_customer.get(line.payer.casefold())
+        if not invoices:
+            return []
+        cents = _cents(line.amount)
+        total = 0
+        chosen = []
+        for invoice in sorted(invoices.values(), key=lambda invoice: invoice.day):
+            if not self._in_window(invoice, line):
+                continue
+            chosen.append(invoice)
+            total += _cents(invoice.open)
+            if abs(total - cents) <= self.tolerance:
+                return [self._apply(invoice, invoice.open, "customer") for invoice in chosen]
+            if total > cents:
+                break
+        return []
+
+    def _in_window(self, invoice, line):
+        return line.day is None or invoice.day is None or line.day - self.window <= invoice.day <= line.day
+
+    def match(self, line):
+        """Allocate one statement line to open invoices; returns the Allocations"""
+        if line.amount <= 0:
+            return []
+        return self._by_reference(line) or self._by_amount_within_window(line) or self._by_customer_total(line)
+
+
+def open_invoices(store):
+    """Stream the invoiced, not yet fully paid orders of `store` as OpenInvoices, wherever the order now stands"""
+    for key, record in store.items():
+        if not invoiced(record) or record.payment_status == "Paid":
+            continue
+        order = record.to_order()
+        order['order_key'] = key
+        open_amount = invoice_total(order) - (order.get('amount_paid') or 0)
+        if open_amount > 0.005:
+            yield OpenInvoice(record.invoice_number, order['customer_name'], open_amount, order['current_date'].date(), key), order
+
+
+def load_open_invoices(store, matcher):
+    """Index every open invoice of `store`, posting it first to a ledger and credit engine that lack it
+
+    The CLI runs in a fresh process, so its ledger starts empty: payments can
+    only be posted against invoices it has been told about.
+    """
+    for invoice, order in open_invoices(store):
+        restore_invoice(order)
+        matcher.add(invoice)
+    return matcher
+
+
+def apply_statement(lines, matcher, store=None, unmatched=None):
+    """Match and post every statement line; each applied amount updates ledger, credit and store"""
+    counts = {'lines': 0, 'matched': 0, 'unmatched': 0, 'allocations': 0, 'applied': 0.0, 'unapplied': 0.0}
+    for line in lines:
+        counts['lines'] += 1
+        allocations = matcher.match(line)
+        if not allocations:
+            counts['unmatched'] += 1
+            counts['unapplied'] += line.amount
+            if unmatched is not None:
+                unmatched.write(json.dumps({**line._asdict(), 'day': str(line.day)}) + "\n")
+            continue
+        counts['matched'] += 1
+        applied = 0.0
+        for allocation in allocations:
+            invoice = allocation.invoice
+            post_payment(invoice.key, allocation.amount, line.day)
+            if store is not None and invoice.order_key is not None:
+                record = store.get(invoice.order_key)
+                if record is not None:
+                    order = record.to_order()
+                    apply_to_order(order, allocation.amount)
+                    store.put(invoice.order_key, order, record.current_step)
+            applied += allocation.amount
+        counts['allocations'] += len(allocations)
+        counts['applied'] += applied
+        counts['unapplied'] += round(line.amount - applied, 2)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Match bank statement payments to the open invoices of the order store")
+    parser.add_argument("statement", help="bank statement: CSV (date,amount,reference,payer) or BAI2")
+    parser.add_argument("--format", choices=("csv", "bai2"), help="statement format (default: from the file extension)")
+    parser.add_argument("--db", default="orders.db", help="order store holding the invoices")
+    parser.add_argument("--unmatched", help="JSONL file listing the payments that matched no invoice")
+    parser.add_argument("--rejects", help="JSONL file listing the statement lines that did not parse")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="amount difference accepted without a reference")
+    parser.add_argument("--window-days", type=int, default=90, help="how old an invoice a payment may settle")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("bai2" if args.statement.lower().endswith((".bai", ".bai2")) else "csv")
+    rejected = []
+    with open(args.statement, newline="") as fileobj:
+        lines = read_statement(fileobj, fmt, rejected)
+    if rejected:
+        print(f"{len(rejected):,} statement lines do not parse and are skipped", file=sys.stderr)
+        if args.rejects:
+            with open(args.rejects, "w") as rejects:
+                for number, error in rejected:
+                    rejects.write(json.dumps({'line': number, 'error': error}) + "\n")
+    store = open_store(args.db)
+    matcher = load_open_invoices(store, PaymentMatcher(args.tolerance, args.window_days))
+    print(f"{len(matcher):,} open invoices", file=sys.stderr)
+
+    started = time.perf_counter()
+    unmatched = open(args.unmatched, "w") if args.unmatched else None
+    try:
+        counts = apply_statement(lines, matcher, store, unmatched)
+    finally:
+        store.close()
+        if unmatched is not None:
+            unmatched.close()
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{counts['lines']:,} payments in {elapsed:.1f}s: {counts['matched']:,} matched to "
+        f"{counts['allocations']:,} invoices (${counts['applied']:,.2f}), {counts['unmatched']:,} unmatched, "
+        f"${counts['unapplied']:,.2f} unapplied",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
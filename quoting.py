@@ -0,0 +1,250 @@
+import bisect
+import csv
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date
+
+from business_days import ordinal
+from engine import DELIVERY_BUFFER_DAYS, MATERIALS_CHECK_DAYS, whole
+from inventory import INVENTORY
+from scheduling import SCHEDULER
+
+# Price rows used when no REVENUE_PRICES file is configured:
+# (product, customer or None for the list price, minimum quantity, unit price, effective from, effective to)
+DEFAULT_PRICES = (
+    ('Mountain Bike (Black)', None, 1, 500, None, None),
+    ('Mountain Bike (Black)', None, 250, 480, None, None),
+    ('Mountain Bike (Black)', None, 500, 460, None, None),
+)
+
+# Where an order's unit price came from; a price stated on the customer's PO is never re-quoted
+LIST_PRICE = "List price"
+CONTRACT_PRICE = "Contract price"
+PO_PRICE = "Purchase order"
+
+# Answer to one inquiry line
+Quote = namedtuple('Quote', 'customer product quantity unit_price total price_source available lead_days')
+
+
+class _PriceList:
+    """Volume tiers of one product for one customer (or the list) over one effective period"""
+    __slots__ = ('start', 'end', 'breaks', 'prices')
+
+    def __init__(self, start, end, tiers):
+        tiers = sorted(tiers)
+        self.start = start
+        self.end = end
+        self.breaks = [quantity for quantity, _ in tiers]
+        self.prices = [price for _, price in tiers]
+
+    def price(self, quantity):
+        """Unit price of the highest tier `quantity` reaches, or None below the first tier"""
+        i = bisect.bisect_right(self.breaks, quantity) - 1
+        return self.prices[i] if i >= 0 else None
+
+
+class PriceCatalogue:
+    """Price lists indexed by (product, customer), each sorted by the day it takes effect
+
+    Rows of one product, customer and effective period form one price list of
+    volume tiers. When periods overlap, the list that took effect last wins.
+    """
+
+    def __init__(self, rows=DEFAULT_PRICES):
+        tiers = {}
+        for product, customer, min_quantity, unit_price, effective_from, effective_to in rows:
+            start = effective_from.toordinal() if effective_from else date.min.toordinal()
+            end = effective_to.toordinal() if effective_to else date.max.toordinal()
+            tiers.setdefault((product, customer or None, start, end), []).append((min_quantity, unit_price))
+        self._lists = {}
+        for (product, customer, start, end), breaks in sorted(tiers.items(), key=lambda item: item[0][2]):
+            self._lists.setdefault((product, customer), []).append(_PriceList(start, end, breaks))
+        self._starts = {key: [price_list.start for price_list in lists] for key, lists in self._lists.items()}
+        self.products = frozenset(product for product, _ in self._lists)
+
+    def _price(self, product, customer, quantity, day):
+        lists = self._lists.get((product, customer))
+        if lists is None:
+            return None
+        for i in range(bisect.bisect_right(self._starts[product, customer], day) - 1, -1, -1):
+            price_list = lists[i]
+            if price_list.end >= day:
+                price = price_list.price(quantity)
+                if price is not None:
+                    return price
+        return None
+
+    def price(self, product, customer, quantity, day):
+        """(unit price, source) on date ordinal `day`: the customer's contract, else the list"""
+        price = self._price(product, customer, quantity, day)
+        if price is not None:
+            return price, CONTRACT_PRICE
+        price = self._price(product, None, quantity, day)
+        if price is not None:
+            return price, LIST_PRICE
+        raise KeyError(f"No price for {quantity} of {product} on {date.fromordinal(day)}")
+
+
+class QuoteCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after they were stored"""
+
+    def __init__(self, maxsize=65536, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
+
+
+class QuoteEngine:
+    """Prices, availability and lead times for customer inquiries
+
+    Prices come from the catalogue and are cached per (customer, product, quantity,
+    day), so repeated inquiries are a dictionary hit. Availability is read live
+    from inventory on every quote: it changes with every reservation. load()
+    swaps in a new catalogue and drops the cached prices.
+    """
+
+    def __init__(self, prices=DEFAULT_PRICES, cache=None, inventory=INVENTORY, scheduler=SCHEDULER):
+        self.catalogue = PriceCatalogue(prices)
+        self.cache = cache or QuoteCache()
+        self.inventory = inventory
+        self.scheduler = scheduler
+
+    def load(self, prices):
+        self.catalogue = PriceCatalogue(prices)
+        self.cache.clear()
+
+    def price(self, customer, product, quantity, on=None):
+        """(unit price, price source) for `quantity` of `product` on date `on`; raises KeyError"""
+        return self._price(customer, product, quantity, ordinal(on))
+
+    def _price(self, customer, product, quantity, day):
+        key = (customer, product, quantity, day)
+        price = self.cache.get(key)
+        if price is None:
+            price = self.catalogue.price(product, customer, quantity, day)
+            self.cache.put(key, price)
+        return price
+
+    def lead_days(self, quantity, available):
+        """Business days to deliver: from stock, or after materials and production for the rest"""
+        if available >= quantity:
+            return DELIVERY_BUFFER_DAYS
+        return DELIVERY_BUFFER_DAYS + MATERIALS_CHECK_DAYS + self.scheduler.work_days(quantity - max(available, 0))
+
+    def _quote(self, customer, product, quantity, day, available):
+        unit_price, source = self._price(customer, product, quantity, day)
+        return Quote(customer, product, quantity, unit_price, round(unit_price * quantity, 2), source, available,
+                     self.lead_days(quantity, available))
+
+    def quote(self, customer, product, quantity, on=None):
+        """Quote one line; raises KeyError when the product has no price"""
+        day = ordinal(on)
+        return self._quote(customer, product, quantity, day, self.inventory.available(product, on=on))
+
+    def quote_many(self, lines, on=None):
+        """Quote (customer, product, quantity) lines; None for lines without a price
+
+        Availability is read once per product for the whole batch.
+        """
+        day = ordinal(on)
+        available = {}
+        quotes = []
+        for customer, product, quantity in lines:
+            if product not in available:
+                available[product] = self.inventory.available(product, on=on)
+            try:
+                quotes.append(self._quote(customer, product, quantity, day, available[product]))
+            except KeyError:
+                quotes.append(None)
+        return quotes
+
+
+def _date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def load_prices(path):
+    """Read (product, customer, min_quantity, unit_price, effective_from, effective_to) rows from a CSV file
+
+    An empty customer is the list price; empty dates leave the period open.
+    """
+    with open(path, newline="") as fh:
+        return [
+            (row['product'], row.get('customer') or None, int(row.get('min_quantity') or 1),
+             float(row['unit_price']), _date(row.get('effective_from')), _date(row.get('effective_to')))
+            for row in csv.DictReader(fh)
+        ]
+
+
+def default_quotes():
+    """Quote engine for the REVENUE_PRICES catalogue, caching prices for REVENUE_QUOTE_TTL seconds"""
+    path = os.environ.get('REVENUE_PRICES')
+    cache = QuoteCache(ttl=float(os.environ.get('REVENUE_QUOTE_TTL', 300)))
+    return QuoteEngine(load_prices(path) if path else DEFAULT_PRICES, cache)
+
+
+QUOTES = default_quotes()
+
+
+def quote(order, decision=None):
+    """Step 1 transition: the order takes the quoted price, unless its PO states one"""
+    if order.get('price_source') == PO_PRICE:
+        return None
+    try:
+        unit_price, source = QUOTES.price(order['customer_name'], order['product'], order['quantity'],
+                                          order['current_date'])
+    except KeyError:
+        return None  # not in the catalogue: the standard price stands
+    order['unit_price'] = whole(unit_price)
+    order['total_value'] = whole(round(unit_price * order['quantity'], 2))
+    order['price_source'] = source
+    return None
@@ -0,0 +1,91 @@
+import altair as alt
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import sweep
+
+# Heatmaps drawn for every sweep: (metric, title, number format)
+SURFACES = (
+    ('mean_margin', "Mean margin", "$,.0f"),
+    ('margin_p5', "Margin, 5th percentile", "$,.0f"),
+    ('mean_lead_time', "Mean lead time (business days)", ".1f"),
+    ('lead_time_p95', "Lead time, 95th percentile (business days)", ".1f"),
+)
+
+
+def _axis_input(label, default, column):
+    """Parameter, low, high and point count of one axis; returns (name, values)"""
+    with column:
+        name = st.selectbox(f"{label} axis", list(sweep.PARAMETERS), index=list(sweep.PARAMETERS).index(default))
+        base = float(sweep.PARAMETERS[name])
+        probability = name.startswith('p_')
+        low = st.number_input(f"{label} from", value=0.0 if probability else base * 0.5, key=f"{label}_low")
+        high = st.number_input(f"{label} to", value=1.0 if probability else base * 1.5, key=f"{label}_high")
+        points = st.slider(f"{label} points", 2, 100, 20, key=f"{label}_points")
+    values = np.linspace(low, high, points)
+    if isinstance(sweep.PARAMETERS[name], int) and not probability:
+        values = np.unique(np.round(values).astype(int))
+    return name, values.tolist()
+
+
+def _heatmap(frame, x, y, metric, title, fmt):
+    return alt.Chart(frame, title=title).mark_rect().encode(
+        x=alt.X(f"{x}:O", sort=None),
+        y=alt.Y(f"{y}:O", sort='descending'),
+        color=alt.Color(f"{metric}:Q", scale=alt.Scale(scheme='viridis'), title=None),
+        tooltip=[x, y, alt.Tooltip(f"{metric}:Q", format=fmt)]
+    )
+
+
+def render_scenarios_page():
+    """What-if sweep over two parameters, drawn as margin and lead-time heatmaps"""
+    st.title("Scenario Sweep")
+    st.caption(
+        "Every cell simulates a batch of orders with one combination of parameters. "
+        "Results are memoized on disk, so changing one axis only computes the new cells."
+    )
+
+    left, right = st.columns(2)
+    x, x_values = _axis_input("X", 'unit_price', left)
+    y, y_values = _axis_input("Y", 'quantity', right)
+    if x == y:
+        st.warning("Pick two different parameters for the axes.")
+        return
+
+    fixed = {}
+    with st.expander("Fixed parameters"):
+        for name, default in sweep.PARAMETERS.items():
+            if name not in (x, y):
+                value = st.number_input(name, value=default, key=f"fixed_{name}")
+                if value != default:
+                    fixed[name] = value
+        orders = st.number_input("Orders per scenario", min_value=100, max_value=100000, value=1000, step=100)
+
+    if st.button("Run sweep", type="primary"):
+        axes = {y: y_values, x: x_values}
+        bar = st.progress(0.0, text="Evaluating scenarios")
+        memo = sweep.default_memo()
+        try:
+            results, counts = sweep.run_sweep(
+                axes, fixed, orders=int(orders), memo=memo,
+                progress=lambda done, total: bar.progress(done / total, text=f"{done:,} of {total:,} scenarios")
+            )
+        finally:
+            memo.close()
+        bar.empty()
+        st.session_state['sweep'] = (axes, results, counts)
+
+    if 'sweep' not in st.session_state:
+        return
+    axes, results, counts = st.session_state['sweep']
+    y, x = axes
+    st.markdown(f"{counts['scenarios']:,} scenarios: {counts['cached']:,} from the cache, {counts['computed']:,} computed")
+
+    grid_y, grid_x = np.meshgrid(axes[y], axes[x], indexing='ij')
+    frame = pd.DataFrame({y: grid_y.ravel(), x: grid_x.ravel()})
+    for index, metric in enumerate(sweep.METRICS):
+        frame[metric] = results[..., index].ravel()
+    for metric, title, fmt in SURFACES:
+        st.altair_chart(_heatmap(frame, x, y, metric, title, fmt), width='stretch')
+    st.download_button("Download CSV", frame.to_csv(index=False), file_name="scenarios.csv", mime="text/csv")
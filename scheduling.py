@@ -0,0 +1,523 @@
+import bisect
+import csv
+import heapq
+import itertools
+import math
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+import engine
+import mrp
+from business_days import CALENDAR
+from engine import SHIPPING_DAYS
+
+# A work center: units it can process per business day and cost per unit processed
+WorkCenter = namedtuple('WorkCenter', 'name capacity cost_per_unit')
+
+# Routing used when no REVENUE_WORK_CENTERS file is configured; every product visits
+# these work centers in this order
+DEFAULT_WORK_CENTERS = (
+    ('Frame Prep', 150, 100),
+    ('Assembly', 100, 200),
+    ('Quality Check', 200, 50),
+)
+
+
+# Business days after its release an order may be loaded over; what does not fit is left
+# off the schedule and the order is reported late (see ProductionScheduler.shortfall)
+HORIZON_DAYS = 500
+
+# Business days a completed order stays on the schedule behind the latest release; older
+# ones are dropped, so a long run keeps a schedule of bounded size
+RETAIN_DAYS = 60
+
+
+class _Load:
+    """Load of one work center per business day
+
+    `days` holds the (rank, quantity) each order took on a day and `total` the sum;
+    days at capacity are also kept as merged [start, end] runs. `spans` is a segment
+    tree over the business days of the calendar: the rank of each operation's span,
+    from its first look to its last slot, is kept sorted on the O(log days) nodes
+    that exactly cover it, and the spans covering a day are on the path from its
+    leaf to the root.
+    """
+    __slots__ = ('capacity', 'size', 'days', 'total', 'starts', 'ends', 'spans')
+
+    def __init__(self, capacity, days):
+        self.capacity = capacity
+        self.size = 1 << max(days - 1, 1).bit_length()
+        self.days = {}
+        self.total = {}
+        self.starts = []
+        self.ends = []
+        self.spans = {}
+
+    def free(self, day, rank):
+        """Capacity higher-ranked orders left on `day` for an order of `rank`"""
+        orders = self.days.get(day)
+        if not orders:
+            return self.capacity
+        return self.capacity - sum(quantity for other, quantity in orders.values() if other < rank)
+
+    def next_open(self, day):
+        """First day on or after `day` that is not at capacity"""
+        i = bisect.bisect_right(self.starts, day) - 1
+        if i >= 0 and self.ends[i] >= day:
+            return self.ends[i] + 1
+        return day
+
+    def take(self, day, key, rank, quantity):
+        self.days.setdefault(day, {})[key] = (rank, quantity)
+        # Orders being reloaded can briefly push a day over capacity; runs track crossing it
+        total = self.total[day] = self.total.get(day, 0) + quantity
+        if total - quantity < self.capacity <= total:
+            self._mark_full(day)
+
+    def release(self, day, key):
+        orders = self.days[day]
+        _, quantity = orders.pop(key)
+        total = self.total[day]
+        if total - quantity < self.capacity <= total:
+            self._mark_free(day)
+        if orders:
+            self.total[day] = total - quantity
+        else:
+            del self.days[day], self.total[day]
+
+    def _nodes(self, start, end):
+        """Nodes of the span tree that together cover exactly the days [start, end]"""
+        low, high = start + self.size, end + 1 + self.size
+        while low < high:
+            if low & 1:
+                yield low
+                low += 1
+            if high & 1:
+                high -= 1
+                yield high
+            low >>= 1
+            high >>= 1
+
+    def watch(self, rank, start, end):
+        for node in self._nodes(start, end):
+            bisect.insort(self.spans.setdefault(node, []), rank)
+
+    def unwatch(self, rank, start, end):
+        for node in self._nodes(start, end):
+            spans = self.spans[node]
+            del spans[bisect.bisect_left(spans, rank)]
+            if not spans:
+                del self.spans[node]
+
+    def below(self, day, rank):
+        """Rank of the highest-ranked order below `rank` whose operation here covers `day`, or None"""
+        found = None
+        node = day + self.size
+        while node:
+            spans = self.spans.get(node)
+            if spans:
+                i = bisect.bisect_right(spans, rank)
+                if i < len(spans) and (found is None or spans[i] < found):
+                    found = spans[i]
+            node >>= 1
+        return found
+
+    def holders(self, day, rank):
+        """Ranks of the orders below `rank` that took capacity on `day`"""
+        return [other for other, _ in self.days.get(day, {}).values() if other > rank]
+
+    def _mark_full(self, day):
+        i = bisect.bisect_right(self.starts, day)
+        joins_left = i > 0 and self.ends[i - 1] == day - 1
+        joins_right = i < len(self.starts) and self.starts[i] == day + 1
+        if joins_left and joins_right:
+            self.ends[i - 1] = self.ends[i]
+            del self.starts[i], self.ends[i]
+        elif joins_left:
+            self.ends[i - 1] = day
+        elif joins_right:
+            self.starts[i] = day
+        else:
+            self.starts.insert(i, day)
+            self.ends.insert(i, day)
+
+    def _mark_free(self, day):
+        i = bisect.bisect_right(self.starts, day) - 1
+        start, end = self.starts[i], self.ends[i]
+        if start == end:
+            del self.starts[i], self.ends[i]
+        elif day == start:
+            self.starts[i] = day + 1
+        elif day == end:
+            self.ends[i] = day - 1
+        else:
+            self.ends[i] = day - 1
+            self.starts.insert(i + 1, day + 1)
+            self.ends.insert(i + 1, end)
+
+
+class ProductionOrder:
+    """An order on the production schedule; days are business-day numbers (see BusinessCalendar.index)
+
+    `slots` holds (work center, day, quantity) for every day the order loaded, and
+    `spans` (work center, first day, last day) for every operation. `short` counts
+    the units left off the schedule past the horizon.
+    """
+    __slots__ = ('key', 'quantity', 'release', 'due', 'rank', 'slots', 'spans', 'finish', 'short', 'done')
+
+    def __init__(self, key, quantity, release, due, rank):
+        self.key = key
+        self.quantity = quantity
+        self.release = release
+        self.due = due
+        self.rank = rank
+        self.slots = []
+        self.spans = []
+        self.finish = None
+        self.short = 0
+        self.done = False
+
+
+class ProductionScheduler:
+    """Finite-capacity scheduler for production orders over a routing of work centers
+
+    Orders are ranked by priority, earliest due date ('edd') or lowest critical ratio
+    of slack to work content ('cr'), then by arrival. Each operation takes what
+    capacity higher-ranked orders left on each business day from the order's
+    release, after the previous operation has finished. An order ranked below every
+    loaded order skips days at capacity through the run lists.
+
+    Adding, moving or cancelling an order changes the load of some days. The
+    lower-ranked orders whose operations cover those days are queued on a heap and
+    popped in rank order; one is reloaded only if the net change above it on those
+    days can move it: freed capacity on a day it covers, or more taken on a day it
+    holds capacity. Its own changes spread the same way until spare capacity absorbs
+    them, so the rest of the schedule keeps its slots. The cost of a change thus
+    follows the orders that really move: in an overloaded shop an urgent order
+    pushes back every order queued behind it, however the schedule is indexed.
+
+    An order is loaded over at most `horizon` business days from its release, and
+    never so close to the calendar's end that its delivery date would fall off it.
+    Units that do not fit are left off the schedule and reported by shortfall().
+    Completed orders are frozen: they outrank every open order and never move.
+    They are dropped once they finished `retain_days` before the latest release, so
+    the schedule holds at most the orders loaded from then to the horizon.
+    """
+
+    def __init__(self, work_centers=DEFAULT_WORK_CENTERS, rule='edd', calendar=CALENDAR, horizon=HORIZON_DAYS,
+                 retain_days=RETAIN_DAYS):
+        if rule not in ('edd', 'cr'):
+            raise ValueError(f"Unknown scheduling rule {rule!r}")
+        self.work_centers = tuple(WorkCenter(*center) for center in work_centers)
+        for center in self.work_centers:
+            if center.capacity <= 0:
+                raise ValueError(f"Work center {center.name!r} needs a positive capacity")
+        self.rule = rule
+        self.calendar = calendar
+        self.horizon = horizon
+        self.retain_days = retain_days
+        # Last day an order may be loaded on: its completion and delivery dates stay on the calendar
+        self._last = calendar.days.size - 2 - SHIPPING_DAYS
+        self._lock = threading.Lock()
+        self._loads = {center.name: _Load(center.capacity, calendar.days.size) for center in self.work_centers}
+        self._orders = {}
+        self._ranks = []  # sorted ranks of the loaded orders
+        self._counter = itertools.count()
+        self._completed = []  # heap of (finish, key) of the completed orders
+        self._latest = 0  # latest release seen
+        self.reloads = 0  # orders (re)loaded, for benchmarks
+
+    def work_days(self, quantity):
+        """Business days the routing needs for `quantity` on otherwise idle work centers"""
+        return sum(math.ceil(quantity / center.capacity) for center in self.work_centers)
+
+    def unit_cost(self):
+        return sum(center.cost_per_unit for center in self.work_centers)
+
+    def _priority(self, quantity, release, due):
+        if self.rule == 'cr':
+            return ((due - release) / self.work_days(quantity), due)
+        return (due, release)
+
+    def _load(self, order):
+        # Below every loaded order, a day at capacity has nothing left for this one
+        lowest = not self._ranks or order.rank > self._ranks[-1]
+        limit = min(order.release + self.horizon, self._last)
+        day = order.release
+        for center in self.work_centers:
+            load = self._loads[center.name]
+            remaining = order.quantity
+            start = day
+            while True:
+                if lowest:
+                    day = load.next_open(day)
+                if day > limit:
+                    break
+                taken = min(max(load.free(day, order.rank), 0), remaining)
+                if taken:
+                    load.take(day, order.key, order.rank, taken)
+                    order.slots.append((center.name, day, taken))
+                    remaining -= taken
+                if remaining <= 0:
+                    break
+                day += 1
+            if remaining > 0:
+                # Past the horizon: the rest of the order and its later operations stay off the schedule
+                if start <= limit:
+                    load.watch(order.rank, start, limit)
+                    order.spans.append((center.name, start, limit))
+                order.short = remaining
+                day = limit + 1
+                break
+            load.watch(order.rank, start, day)
+            order.spans.append((center.name, start, day))
+            day += 1  # the next operation starts the following day
+        order.finish = day - 1
+        bisect.insort(self._ranks, order.rank)
+
+    def _unload(self, order):
+        for name, day, _ in order.slots:
+            self._loads[name].release(day, order.key)
+        for name, start, end in order.spans:
+            self._loads[name].unwatch(order.rank, start, end)
+        del self._ranks[bisect.bisect_left(self._ranks, order.rank)]
+        order.slots = []
+        order.spans = []
+        order.finish = None
+        order.short = 0
+
+    def _moved(self, order, cells):
+        """Whether the load above `order` on any of the `cells` now gives it a different take
+
+        Before the last day of an operation the order took all the capacity left to
+        it; on the last day, what remained of its quantity.
+        """
+        last = {name: end for name, _, end in order.spans}
+        if order.short:
+            last[order.spans[-1][0]] = None  # cut off at the horizon, still wanting more
+        for name, day in cells:
+            load = self._loads[name]
+            free = load.free(day, order.rank)
+            held = load.days.get(day, {}).get(order.key, (None, 0))[1]
+            if free < held if day == last[name] else max(free, 0) != held:
+                return True
+        return False
+
+    def _reschedule(self, changed, rank, orders=()):
+        """Load `orders`, and reload the orders ranked below `rank` that the `changed` cells or the loads move
+
+        Cells are (work center, day). Everything is (re)loaded in rank order, so each
+        order sees the final load of every order ranked above it, and is reloaded only
+        if its take on a day that changed above it changed. Capacity taken on a day
+        can only move the orders holding some of it. Capacity freed on a day goes to
+        the highest-ranked order whose operation covers it, and on down to the next
+        one only while some is left over, as an order short of its quantity takes
+        everything left to it.
+        """
+        heap = [order.rank for order in orders]
+        heapq.heapify(heap)
+        triggers = {order.key: None for order in orders}  # key -> {cell: freed}, None to load unconditionally
+
+        def queue(other, cell, freed):
+            cells = triggers.get(other[2])
+            if cells is None and other[2] not in triggers:
+                cells = triggers[other[2]] = {}
+                heapq.heappush(heap, other)
+            if cells is not None:
+                cells[cell] = cells.get(cell, False) or freed
+
+        def free(cell, rank):
+            other = self._loads[cell[0]].below(cell[1], rank)
+            if other is not None:
+                queue(other, cell, True)
+
+        def taken(cell, rank):
+            for other in self._loads[cell[0]].holders(cell[1], rank):
+                queue(other, cell, False)
+
+        for cell in changed:
+            free(cell, rank)
+        while heap:
+            order = self._orders[heapq.heappop(heap)[2]]
+            cells = triggers.pop(order.key)
+            if cells is None or self._moved(order, cells):
+                change = {(name, day): -quantity for name, day, quantity in order.slots}
+                if order.finish is not None:
+                    self._unload(order)
+                self._load(order)
+                self.reloads += 1
+                for name, day, quantity in order.slots:
+                    change[name, day] = change.get((name, day), 0) + quantity
+                for cell, units in change.items():
+                    if units < 0:
+                        free(cell, order.rank)
+                    elif units > 0:
+                        taken(cell, order.rank)
+            for (name, day), freed in (cells or {}).items():
+                load = self._loads[name]
+                if freed and load.free(day, order.rank) > load.days.get(day, {}).get(order.key, (None, 0))[1]:
+                    free((name, day), order.rank)
+
+    def schedule(self, key, quantity, release, due):
+        """Add (or move) order `key`; `release` and `due` are dates. Returns the completion date."""
+        with self._lock:
+            previous = self._orders.get(key)
+            if previous is not None and previous.done:
+                return self.calendar.nth(previous.finish + 1)
+            changed = set()
+            if previous is not None:
+                changed = {(name, day) for name, day, _ in previous.slots}
+                self._unload(previous)
+            release = self.calendar.index(release)
+            if release > self._latest:
+                self._latest = release
+                self._prune()
+            # A due date past the calendar's end is as good as the last day on it
+            if due.toordinal() < self.calendar.end.toordinal():
+                due = self.calendar.index(due)
+            else:
+                due = self.calendar.days.size - 1
+            rank = (self._priority(quantity, release, due), next(self._counter), key)
+            order = self._orders[key] = ProductionOrder(key, quantity, release, due, rank)
+            # A moved order is loaded at its new rank; its old slots free capacity only for orders below the old one
+            self._reschedule(changed, rank if previous is None else previous.rank, (order,))
+            return self.calendar.nth(order.finish + 1)
+
+    def cancel(self, key):
+        """Drop an open order; returns whether there was one"""
+        with self._lock:
+            order = self._orders.get(key)
+            if order is None or order.done:
+                return False
+            changed = {(name, day) for name, day, _ in order.slots}
+            self._unload(order)
+            del self._orders[key]
+            self._reschedule(changed, order.rank)
+            return True
+
+    def complete(self, key):
+        """Freeze a finished order; returns it, or None if it was not scheduled"""
+        with self._lock:
+            order = self._orders.get(key)
+            if order is None or order.done:
+                return order
+            # An empty priority sorts before every other, so open orders never take its capacity
+            rank = ((), order.rank[1], key)
+            for name, day, quantity in order.slots:
+                self._loads[name].days[day][key] = (rank, quantity)
+            for name, start, end in order.spans:
+                self._loads[name].unwatch(order.rank, start, end)
+            del self._ranks[bisect.bisect_left(self._ranks, order.rank)]
+            bisect.insort(self._ranks, rank)
+            order.rank = rank
+            order.spans = []
+            order.done = True
+            if order.slots:
+                heapq.heappush(self._completed, (order.finish, key))
+            else:
+                # Past the horizon altogether: nothing on the schedule to keep
+                del self._orders[key], self._ranks[bisect.bisect_left(self._ranks, rank)]
+            return order
+
+    def _prune(self):
+        """Drop the completed orders that finished `retain_days` before the latest release"""
+        cutoff = self._latest - self.retain_days
+        while self._completed and self._completed[0][0] < cutoff:
+            order = self._orders.pop(heapq.heappop(self._completed)[1])
+            changed = {(name, day) for name, day, _ in order.slots}
+            self._unload(order)
+            self._reschedule(changed, order.rank)
+
+    def shortfall(self, key):
+        """Units of a scheduled order left off the schedule past the horizon; an order short of any is late"""
+        order = self._orders.get(key)
+        return 0 if order is None else order.short
+
+    def completion(self, key):
+        """Completion date of a scheduled order, or None"""
+        order = self._orders.get(key)
+        if order is None or order.finish is None:
+            return None
+        return self.calendar.nth(order.finish + 1)
+
+    def operations(self, key):
+        """(work center, first date, last date) of each operation of a scheduled order"""
+        order = self._orders.get(key)
+        if order is None:
+            return []
+        spans = {}
+        for name, day, _ in order.slots:
+            first, last = spans.get(name, (day, day))
+            spans[name] = (min(first, day), max(last, day))
+        return [
+            (center.name, self.calendar.nth(spans[center.name][0]), self.calendar.nth(spans[center.name][1]))
+            for center in self.work_centers if center.name in spans
+        ]
+
+    def utilization(self, start, days):
+        """Loaded share of capacity per work center over `days` business days from date `start`"""
+        first = self.calendar.index(start)
+        with self._lock:
+            return {
+                name: sum(load.total.get(day, 0) for day in range(first, first + days)) / (load.capacity * days)
+                for name, load in self._loads.items()
+            }
+
+
+def load_work_centers(path):
+    """Read (work_center, capacity, cost_per_unit) rows, in routing order, from a CSV file"""
+    with open(path, newline="") as fh:
+        return [
+            (row['work_center'], int(row['capacity']), float(row.get('cost_per_unit') or 0))
+            for row in csv.DictReader(fh)
+        ]
+
+
+def default_scheduler():
+    """Scheduler for REVENUE_WORK_CENTERS (default routing otherwise) and REVENUE_SCHEDULING_RULE"""
+    path = os.environ.get('REVENUE_WORK_CENTERS')
+    return ProductionScheduler(
+        load_work_centers(path) if path else DEFAULT_WORK_CENTERS,
+        os.environ.get('REVENUE_SCHEDULING_RULE', 'edd')
+    )
+
+
+SCHEDULER = default_scheduler()
+
+
+def schedule(order):
+    """Put the order on the production schedule; its delivery promise follows the completion date"""
+    need_by = CALENDAR.add(order['expected_delivery'], -SHIPPING_DAYS)
+    completion = SCHEDULER.schedule(engine.order_key(order), order['quantity'], order['current_date'], need_by)
+    order['costs']['production'] = order['quantity'] * SCHEDULER.unit_cost()
+    delivery = datetime.combine(CALENDAR.add(completion, SHIPPING_DAYS), order['current_date'].time())
+    order['expected_delivery'] = max(order['expected_delivery'], delivery)
+
+
+def check_materials(order, decision):
+    """Step 5 transition: an order with its materials goes straight onto the schedule"""
+    jump = mrp.check_materials(order, decision)
+    if jump == 7:
+        schedule(order)
+    return jump
+
+
+def procure(order, decision=None):
+    """Step 6 transition: once purchased, the order is scheduled from the materials' arrival"""
+    jump = mrp.procure(order, decision)
+    schedule(order)
+    return jump
+
+
+def produce(order, decision=None):
+    """Step 7 transition: production runs to the scheduled completion date"""
+    key = engine.order_key(order)
+    if SCHEDULER.completion(key) is None:
+        schedule(order)
+    completion = SCHEDULER.completion(key)
+    SCHEDULER.complete(key)
+    mrp.MRP.complete(key)
+    days = CALENDAR.between(order['current_date'], completion)
+    engine.update_timeline(order, max(days, 1))
@@ -0,0 +1,294 @@
+import bisect
+import csv
+import math
+import os
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+import inventory
+import ledger
+from engine import DESTINATION, SERVICE_LEVEL, order_key, whole
+
+# Where every shipment leaves from
+ORIGIN = "CA"
+
+# Weight of one unit of each product in kg; other products weigh DEFAULT_UNIT_WEIGHT
+PRODUCT_WEIGHTS = {'Mountain Bike (Black)': 15}
+DEFAULT_UNIT_WEIGHT = 15
+
+# Most a single load (one truck) carries, in kg
+LOAD_CAPACITY = 20000
+
+# Days a closed load is kept for load_of(), e.g. for the Bill of Lading
+RETAIN_DAYS = 30
+
+# Rate table used when no REVENUE_RATES file is configured. Per-kg rates fall with
+# each weight break; lanes, carriers and service levels scale the base rates.
+_BASE_RATES = ((0, 3.20), (500, 2.60), (1000, 2.00), (2000, 1.60), (5000, 1.20), (10000, 0.95))
+_LANES = {'NY': 1.0, 'FL': 1.05, 'IL': 0.8, 'TX': 0.7, 'WA': 0.5, 'CA': 0.3}
+_SERVICES = {'Standard': 1.0, 'Expedited': 1.6}
+# (carrier, factor below 2,000 kg, factor from 2,000 kg, minimum charge)
+_CARRIERS = (
+    ('Fast Freight Logistics', 1.0, 1.0, 250),
+    ('Continental Carriers', 1.1, 0.9, 400),
+)
+DEFAULT_RATES = tuple(
+    (carrier, ORIGIN, destination, service, weight,
+     round(rate * lane * scale * (light if weight < 2000 else heavy), 2), minimum)
+    for destination, lane in _LANES.items()
+    for service, scale in _SERVICES.items()
+    for carrier, light, heavy, minimum in _CARRIERS
+    for weight, rate in _BASE_RATES
+)
+DESTINATIONS = tuple(_LANES)
+SERVICE_LEVELS = tuple(_SERVICES)
+
+# One order to ship; `key` is its order key
+Shipment = namedtuple('Shipment', 'key origin destination service weight')
+
+
+class _Tariff:
+    """One carrier's weight-break rates on one lane and service level"""
+    __slots__ = ('carrier', 'breaks', 'rates', 'next_best', 'minimum')
+
+    def __init__(self, carrier, breaks, minimum):
+        breaks = sorted(breaks)
+        self.carrier = carrier
+        self.breaks = [weight for weight, _ in breaks]
+        self.rates = [rate for _, rate in breaks]
+        self.minimum = minimum
+        # Cheapest charge of shipping at any higher break's minimum weight, per break
+        self.next_best = [math.inf] * len(breaks)
+        for i in range(len(breaks) - 2, -1, -1):
+            self.next_best[i] = min(self.next_best[i + 1], self.breaks[i + 1] * self.rates[i + 1])
+
+    def cost(self, weight):
+        """Charge for `weight` kg: its break's rate, or a higher break's if that is cheaper"""
+        i = max(bisect.bisect_right(self.breaks, weight) - 1, 0)
+        return max(self.minimum, min(weight * self.rates[i], self.next_best[i]))
+
+
+class RateTable:
+    """Carrier rate tables indexed by lane (origin, destination) and service level
+
+    Each carrier's weight breaks are sorted once, with the cheapest higher break
+    precomputed, so rating a weight is one bisection per carrier on the lane.
+    """
+
+    def __init__(self, rows=DEFAULT_RATES):
+        breaks = {}
+        minimums = {}
+        for carrier, origin, destination, service, weight, rate, minimum in rows:
+            key = (origin, destination, service, carrier)
+            breaks.setdefault(key, []).append((weight, rate))
+            minimums[key] = max(minimums.get(key, 0), minimum)
+        self.tariffs = {}
+        for (origin, destination, service, carrier), rates in breaks.items():
+            tariff = _Tariff(carrier, rates, minimums[origin, destination, service, carrier])
+            self.tariffs.setdefault((origin, destination, service), []).append(tariff)
+
+    def tariffs_for(self, origin, destination, service):
+        tariffs = self.tariffs.get((origin, destination, service))
+        if not tariffs:
+            raise KeyError(f"No rates from {origin} to {destination} for {service} service")
+        return tariffs
+
+    def quote(self, origin, destination, service, weight):
+        """(carrier, charge) of the cheapest carrier for `weight` kg on the lane"""
+        return min(
+            ((tariff.carrier, tariff.cost(weight)) for tariff in self.tariffs_for(origin, destination, service)),
+            key=lambda quote: quote[1]
+        )
+
+
+class Load:
+    """Shipments consolidated into one truck on one lane"""
+    __slots__ = ('lane', 'shipments', 'weight', 'tariff', 'charges')
+
+    def __init__(self, lane):
+        self.lane = lane
+        self.shipments = []
+        self.weight = 0
+        self.tariff = None
+        self.charges = {}
+
+    @property
+    def carrier(self):
+        return self.tariff.carrier if self.tariff else None
+
+    def cost(self):
+        return self.tariff.cost(self.weight)
+
+
+class _Loads:
+    """Open loads of one lane, packed best fit: each shipment goes into the load it fills most"""
+    __slots__ = ('capacity', 'loads', 'room')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.loads = []
+        self.room = []  # sorted (room left, load index) of loads that still have room
+
+    def place(self, shipment):
+        i = bisect.bisect_left(self.room, (shipment.weight, -1))
+        if i < len(self.room):
+            left, index = self.room.pop(i)
+            load = self.loads[index]
+        else:
+            # Shipments over a truck's capacity travel on a load of their own
+            left, index = self.capacity, len(self.loads)
+            load = Load((shipment.origin, shipment.destination, shipment.service))
+            self.loads.append(load)
+        load.shipments.append(shipment)
+        load.weight += shipment.weight
+        if left - shipment.weight > 0:
+            bisect.insort(self.room, (left - shipment.weight, index))
+        return load
+
+
+def _allocate(load):
+    """Split the load's charge over its shipments by weight, to the cent"""
+    total = round(load.cost(), 2)
+    charges = {}
+    remaining = total
+    for shipment in load.shipments[:-1]:
+        charges[shipment.key] = round(total * shipment.weight / load.weight, 2)
+        remaining -= charges[shipment.key]
+    charges[load.shipments[-1].key] = round(remaining, 2)
+    return charges
+
+
+class ShippingEngine:
+    """Rates shipments and consolidates the ones going the same way into shared loads
+
+    consolidate() plans a whole day at once: per lane and service level, shipments
+    are packed best fit decreasing into loads of `capacity` kg, each load goes to
+    the carrier that is cheapest for its weight, and the load's charge is split by
+    weight. ship() adds one order to the open loads of its ship date as it arrives;
+    the order pays its weight's share of the load as it stands, and the load keeps
+    the carrier it was opened with. The first shipment of a later day closes the
+    loads of earlier days: their charges are split again over the final loads and
+    returned, so what earlier orders paid can be settled. Closed loads stay
+    available to load_of() for `retain_days`.
+    """
+
+    def __init__(self, rates=None, capacity=LOAD_CAPACITY, retain_days=RETAIN_DAYS):
+        self.rates = rates or RateTable()
+        self.capacity = capacity
+        self.retain_days = retain_days
+        self._lock = threading.Lock()
+        self._open = {}
+        self._loads = {}
+        self._shipped = {}  # ship day -> keys shipped that day
+        self._latest = None
+
+    def _cheapest(self, lane, weight):
+        return min(self.rates.tariffs_for(*lane), key=lambda tariff: tariff.cost(weight))
+
+    def consolidate(self, shipments):
+        """Plan the loads for `shipments`; returns (loads, {order key: charge})"""
+        lanes = {}
+        for shipment in shipments:
+            lanes.setdefault((shipment.origin, shipment.destination, shipment.service), []).append(shipment)
+        loads = []
+        charges = {}
+        for lane, group in lanes.items():
+            group.sort(key=lambda shipment: shipment.weight, reverse=True)
+            packed = _Loads(self.capacity)
+            for shipment in group:
+                packed.place(shipment)
+            for load in packed.loads:
+                load.tariff = self._cheapest(lane, load.weight)
+                load.charges = _allocate(load)
+                charges.update(load.charges)
+            loads.extend(packed.loads)
+        return loads, charges
+
+    def _close_before(self, day):
+        """Close the loads of days before `day`; returns {order key: final charge} for them"""
+        settled = {}
+        for open_day, lane in [open_key for open_key in self._open if open_key[0] < day]:
+            for load in self._open.pop((open_day, lane)).loads:
+                load.charges = _allocate(load)
+                settled.update(load.charges)
+        expired = day - timedelta(days=self.retain_days)
+        for shipped_day in [shipped_day for shipped_day in self._shipped if shipped_day < expired]:
+            for key in self._shipped.pop(shipped_day):
+                self._loads.pop(key, None)
+        return settled
+
+    def ship(self, key, day, origin, destination, service, weight):
+        """Put order `key` on an open load of `day`; returns (carrier, charge, settled)
+
+        `settled` maps the orders on the loads this shipment closed to their final charge.
+        """
+        lane = (origin, destination, service)
+        self.rates.tariffs_for(*lane)  # a lane without rates raises before any load changes
+        with self._lock:
+            settled = {}
+            if self._latest is None or day > self._latest:
+                self._latest = day
+                settled = self._close_before(day)
+            load = self._loads.get(key)
+            if load is None:
+                shipment = Shipment(key, origin, destination, service, weight)
+                packed = self._open.setdefault((day, lane), _Loads(self.capacity))
+                load = packed.place(shipment)
+                if load.tariff is None:
+                    load.tariff = self._cheapest(lane, weight)
+                self._loads[key] = load
+                self._shipped.setdefault(day, []).append(key)
+            elif key in load.charges:
+                return load.carrier, load.charges[key], settled  # its load has closed
+            else:
+                weight = next(shipment.weight for shipment in load.shipments if shipment.key == key)
+            return load.carrier, round(load.cost() * weight / load.weight, 2), settled
+
+    def load_of(self, key):
+        return self._loads.get(key)
+
+
+def load_rates(path):
+    """Read (carrier, origin, destination, service, min_weight, rate_per_kg, minimum_charge) rows from a CSV file"""
+    with open(path, newline="") as fh:
+        return [
+            (row['carrier'], row['origin'], row['destination'], row['service'], float(row['min_weight']),
+             float(row['rate_per_kg']), float(row.get('minimum_charge') or 0))
+            for row in csv.DictReader(fh)
+        ]
+
+
+def default_shipping():
+    """Shipping engine for the REVENUE_RATES rate table, or the default one"""
+    path = os.environ.get('REVENUE_RATES')
+    return ShippingEngine(RateTable(load_rates(path) if path else DEFAULT_RATES))
+
+
+SHIPPING = default_shipping()
+
+
+def shipment_weight(order):
+    return order['quantity'] * PRODUCT_WEIGHTS.get(order['product'], DEFAULT_UNIT_WEIGHT)
+
+
+def ship(order, decision=None):
+    """Step 8 transition: the order joins a consolidated load and pays its share of the freight
+
+    Loads this shipment closed are settled in the ledger at their final split.
+    """
+    day = order['current_date'].date()
+    key = order_key(order)
+    weight = shipment_weight(order)
+    jump = inventory.ship(order, decision)
+    try:
+        carrier, charge, settled = SHIPPING.ship(
+            key, day, ORIGIN,
+            order.get('destination') or DESTINATION, order.get('service_level') or SERVICE_LEVEL, weight
+        )
+    except KeyError:
+        return jump  # no rates for the lane: the flat freight charge stands
+    ledger.settle_freight(settled, order['current_date'])
+    order['carrier'] = carrier
+    order['costs']['shipping'] = whole(charge)
+    return jump
@@ -0,0 +1,85 @@
+import importlib
+import sys
+import time
+
+import metrics
+from engine import STEPS
+
+# Step number -> (module with the step's render() page, transition "module:function" or None).
+# Modules are imported on first use, so adding steps does not slow down cold start.
+REGISTRY = {
+    1: ('steps.inquiry', 'quoting:quote'),
+    2: ('steps.order_placement', None),
+    3: ('steps.credit', 'credit:check_credit'),
+    4: ('steps.inventory', 'mrp:check_inventory'),
+    5: ('steps.back_order', 'scheduling:check_materials'),
+    6: ('steps.procurement', 'scheduling:procure'),
+    7: ('steps.production', 'scheduling:produce'),
+    8: ('steps.shipping', 'shipping:ship'),
+    9: ('steps.billing', 'ledger:invoice'),
+    10: ('steps.cash_collections', None),
+}
+
+# Shared engines an order holds capacity in, and the method dropping its hold:
+# pending credit exposure, reserved stock, material demand and its production slots
+HOLDS = (
+    ('credit', 'CREDIT', 'cancel'),
+    ('inventory', 'INVENTORY', 'release'),
+    ('mrp', 'MRP', 'cancel'),
+    ('scheduling', 'SCHEDULER', 'cancel'),
+)
+
+# Seconds spent importing each lazily loaded module
+IMPORT_TIMES = {}
+
+_resolved = {}
+
+
+def _import(name):
+    module = sys.modules.get(name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed = time.perf_counter() - started
+        IMPORT_TIMES[name] = elapsed
+        metrics.observe("step_import_seconds", elapsed, module=name)
+    return module
+
+
+def _resolve(spec):
+    """Load "module" or "module:attribute" once and remember the result"""
+    target = _resolved.get(spec)
+    if target is None:
+        module, _, attribute = spec.partition(':')
+        target = _import(module)
+        if attribute:
+            target = getattr(target, attribute)
+        _resolved[spec] = target
+    return target
+
+
+def page(step):
+    """Module rendering `step`; it provides render(order) and optionally DECISION_KEY"""
+    return _resolve(REGISTRY[step][0])
+
+
+def transition(step):
+    """Transition handler out of `step`, or None when the step only moves on"""
+    spec = REGISTRY[step][1]
+    return _resolve(spec) if spec else None
+
+
+def release(order_key):
+    """Drop what order `order_key` holds in the shared engines, before running it again or abandoning it"""
+    for module, name, method in HOLDS:
+        getattr(getattr(_import(module), name), method)(order_key)
+
+
+def decision_key(step):
+    """Session state key of the decision widget on `step`, if it has one"""
+    return getattr(page(step), 'DECISION_KEY', None)
+
+
+missing = set(STEPS) - set(REGISTRY)
+if missing:
+    raise RuntimeError(f"Steps without a registry entry: {sorted(missing)}")
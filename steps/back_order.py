@@ -0,0 +1,19 @@
+import streamlit as st
+
+from components import display_document, scenario
+from mrp import MRP
+
+DECISION_KEY = 'materials_decision'
+
+
+def render(order):
+    scenario("Production Manager", """📥 Input: Back Order is created. Production must be scheduled.""")
+
+    display_document("back_order_processing", order)
+
+    # Suggest the status the material plan supports; Available falls back to procurement when short
+    short = MRP.shortages(order.get('order_key'))
+    st.radio("Raw Materials Status", ["Available", "Not Available"], index=1 if short else 0, key=DECISION_KEY)
+    st.markdown("""**Note:**
+    - If 'Available': Production Order will be issued
+    - If 'Not Available': Procurement Process will begin""")
@@ -0,0 +1,8 @@
+from components import display_document, scenario
+
+
+def render(order):
+    scenario("Billing Clerk", """📥 Input: Shipping documents received, ready for invoice generation.""")
+
+    display_document("customer_invoice", order)
+    display_document("ar_journal_entry", order)
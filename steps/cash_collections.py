@@ -0,0 +1,14 @@
+import streamlit as st
+
+import payments
+from components import display_document, order_action, scenario
+
+
+def render(order):
+    scenario("Accounts Receivable", """📥 Input: Awaiting customer payment processing.""")
+
+    display_document("payment_processing", order)
+
+    if order.get('payment_status') != "Paid":
+        order_action("Record Payment Received", payments.collect)
+    st.success("🎉 Revenue Cycle Complete! All documents generated and processed.")
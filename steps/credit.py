@@ -0,0 +1,17 @@
+import streamlit as st
+
+from credit import CREDIT
+from components import display_document, scenario
+
+DECISION_KEY = 'credit_decision'
+
+
+def render(order):
+    scenario("Credit Manager", """📥 Input: The system retrieves customer's credit information for review.""")
+
+    display_document("credit_check_report", order)
+
+    # Suggest the decision the customer's limit supports; the manager can override it
+    limit, _, exposure_after = CREDIT.exposure_after(order['customer_name'], order.get('order_key'), order['total_value'])
+    st.radio("Credit Check Decision", ["Approve", "Reject"], index=0 if exposure_after <= limit else 1, key=DECISION_KEY)
+    st.markdown("""**Note:** If you reject, the process will restart and a rejection notice will be generated.""")
@@ -0,0 +1,11 @@
+from components import display_document, scenario
+
+
+def render(order):
+    scenario("Sales Representative", """📥 Input: Customer submits an inquiry about product availability, pricing, and delivery times.""")
+
+    display_document("response_to_inquiry", order)
+
+    # Show rejection notice if coming back from credit check
+    if 'rejection_notice' in order.get('documents', {}):
+        display_document("order_rejection_notice", order)
@@ -0,0 +1,19 @@
+import streamlit as st
+
+from components import display_document, scenario
+from inventory import INVENTORY
+
+DECISION_KEY = 'inventory_decision'
+
+
+def render(order):
+    scenario("Inventory Manager", """📥 Input: The system checks Finished Goods (FG) inventory.""")
+
+    display_document("inventory_status_report", order)
+
+    # Suggest the status the shared stock supports; In Stock still has to win the reservation
+    in_stock = INVENTORY.available(order['product']) >= order['quantity']
+    st.radio("Inventory Status", ["In Stock", "Out of Stock"], index=0 if in_stock else 1, key=DECISION_KEY)
+    st.markdown("""**Note:** 
+    - If 'In Stock': Process will skip to Shipping
+    - If 'Out of Stock': Back Order process will begin""")
@@ -0,0 +1,7 @@
+from components import display_document, scenario
+
+
+def render(order):
+    scenario("Sales Representative", """📥 Input: Customer submits a Purchase Order (PO) specifying product details and requirements.""")
+
+    display_document("purchase_order", order)
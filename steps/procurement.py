@@ -0,0 +1,8 @@
+from components import display_document, scenario
+
+
+def render(order):
+    scenario("Procurement Manager", """📥 Input: Purchase Requisition (PR) is issued to Procurement.""")
+
+    display_document("purchase_requisition", order)
+    display_document("purchase_order_vendor", order)
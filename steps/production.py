@@ -0,0 +1,7 @@
+from components import display_document, scenario
+
+
+def render(order):
+    scenario("Production Manager", """📥 Input: Raw Materials are available, production can begin.""")
+
+    display_document("production_order", order)
@@ -0,0 +1,10 @@
+from components import display_document, scenario
+
+
+def render(order):
+    shipping_source = "Production" if order.get('inventory_status') == "Out of Stock" else "Inventory"
+    scenario("Warehouse Operations", f"""📥 Input: Shipping process initiated for order from {shipping_source}.""")
+
+    display_document("picking_ticket", order)
+    display_document("packing_slip", order)
+    display_document("bill_of_lading", order)
@@ -0,0 +1,318 @@
+import atexit
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from engine import whole
+
+# Fixed order schema: (column, SQLite type). Costs are flattened with a cost_ prefix
+# and datetimes are kept as POSIX timestamps so a row is a handful of scalars.
+COLUMNS = (
+    ('current_step', 'INTEGER'),
+    ('customer_name', 'TEXT'),
+    ('product', 'TEXT'),
+    ('quantity', 'INTEGER'),
+    ('unit_price', 'REAL'),
+    ('total_value', 'REAL'),
+    ('price_source', 'TEXT'),
+    ('credit_status', 'TEXT'),
+    ('inventory_status', 'TEXT'),
+    ('materials_status', 'TEXT'),
+    ('payment_status', 'TEXT'),
+    ('amount_paid', 'REAL'),
+    ('destination', 'TEXT'),
+    ('service_level', 'TEXT'),
+    ('carrier', 'TEXT'),
+    ('start_date', 'REAL'),
+    ('current_date', 'REAL'),
+    ('expected_delivery', 'REAL'),
+    ('cost_product_cost', 'REAL'),
+    ('cost_shipping', 'REAL'),
+    ('cost_procurement', 'REAL'),
+    ('cost_production', 'REAL'),
+    ('po_number', 'TEXT'),
+    ('sales_order_number', 'TEXT'),
+    ('back_order_number', 'TEXT'),
+    ('requisition_number', 'TEXT'),
+    ('vendor_po_number', 'TEXT'),
+    ('production_order_number', 'TEXT'),
+    ('picking_ticket_number', 'TEXT'),
+    ('packing_slip_number', 'TEXT'),
+    ('bol_number', 'TEXT'),
+    ('shipment_number', 'TEXT'),
+    ('invoice_number', 'TEXT'),
+    ('rejection_reason', 'TEXT'),
+    ('rejection_date', 'TEXT'),
+)
+FIELDS = tuple(name for name, _ in COLUMNS)
+DATE_FIELDS = ('start_date', 'current_date', 'expected_delivery')
+COST_FIELDS = ('product_cost', 'shipping', 'procurement', 'production')
+
+
+def new_key():
+    """Generate a key for a new order session"""
+    return uuid.uuid4().hex
+
+
+def _columns(names):
+    """Quote column names; some of them (current_date) are SQL keywords"""
+    return ", ".join(f'"{name}"' for name in names)
+
+
+class OrderRecord:
+    """Compact fixed-schema row holding one order and its current step"""
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for name in FIELDS:
+            setattr(self, name, values.get(name))
+
+    @staticmethod
+    def flatten(order, current_step):
+        """Map an order dict onto the fixed schema"""
+        values = {name: order.get(name) for name in FIELDS if name in order}
+        values['current_step'] = current_step
+        for name in DATE_FIELDS:
+            values[name] = order[name].timestamp()
+        for name in COST_FIELDS:
+            values[f"cost_{name}"] = order['costs'][name]
+        notice = order.get('documents', {}).get('rejection_notice')
+        values['rejection_reason'] = notice['reason'] if notice else None
+        values['rejection_date'] = notice['date'] if notice else None
+        return values
+
+    @classmethod
+    def from_order(cls, order, current_step):
+        return cls(**cls.flatten(order, current_step))
+
+    def to_order(self):
+        """Rebuild the order dict used by the engine and the step pages"""
+        order = {}
+        for name in FIELDS:
+            if name == 'current_step' or name.startswith(('cost_', 'rejection_')):
+                continue
+            value = getattr(self, name)
+            if name in DATE_FIELDS:
+                value = datetime.fromtimestamp(value)
+            order[name] = whole(value)
+        order['costs'] = {name: whole(getattr(self, f"cost_{name}")) for name in COST_FIELDS}
+        order['documents'] = {}
+        if self.rejection_reason is not None:
+            order['documents']['rejection_notice'] = {
+                'reason': self.rejection_reason,
+                'date': self.rejection_date,
+                'customer': self.customer_name
+            }
+        return order
+
+    def update(self, order, current_step):
+        """Copy `order` into the record and return only the fields that changed"""
+        changed = {}
+        for name, value in self.flatten(order, current_step).items():
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed[name] = value
+        return changed
+
+
+class OrderStore:
+    """In-memory order store shared by all sessions; base class for persistent stores"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+
+    def get(self, key):
+        """Return the OrderRecord for `key`, or None if it does not exist"""
+        with self._lock:
+            return self._records.get(key)
+
+    def refresh(self, key):
+        """get(), re-reading `key` from durable storage in case another process changed it"""
+        return self.get(key)
+
+    def put(self, key, order, current_step):
+        """Save `order` under `key` and return the changed fields"""
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                record = self._records[key] = OrderRecord.from_order(order, current_step)
+                return dict.fromkeys(FIELDS)
+            return record.update(order, current_step)
+
+    def items(self):
+        """Iterate over (key, OrderRecord) pairs for every stored order"""
+        with self._lock:
+            records = list(self._records.items())
+        yield from records
+
+    def flush(self):
+        """Write pending changes to durable storage"""
+
+    def close(self):
+        """Flush and release resources"""
+        self.flush()
+
+
+class SQLiteOrderStore(OrderStore):
+    """Order store backed by a local SQLite database in WAL mode
+
+    Recently used records are kept in a bounded LRU cache. `put` only records the
+    changed columns of a record; a background thread writes them behind in one
+    transaction every `flush_interval` seconds.
+    """
+
+    def __init__(self, path, cache_size=10000, flush_interval=0.5):
+        super().__init__()
+        self.path = path
+        self.cache_size = cache_size
+        self._records = OrderedDict()
+        self._pending = {}
+        self._flushing = {}
+        self._inserts = set()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._ensure_schema()
+
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_loop, args=(flush_interval,), name="order-store-flush", daemon=True
+        )
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _connection(self):
+        """Per-thread connection so readers never share a cursor"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        conn = self._connection()
+        columns = ", ".join(f'"{name}" {kind}' for name, kind in COLUMNS)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS orders (key TEXT PRIMARY KEY, {columns})")
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(orders)")}
+        for name, kind in COLUMNS:
+            if name not in existing:
+                conn.execute(f'ALTER TABLE orders ADD COLUMN "{name}" {kind}')
+        conn.commit()
+
+    def _cache(self, key, record):
+        self._records[key] = record
+        self._records.move_to_end(key)
+        while len(self._records) > self.cache_size:
+            self._records.popitem(last=False)
+
+    def _load(self, key):
+        """Read one record from disk, overlaying changes that are not flushed yet"""
+        row = self._connection().execute(
+            f"SELECT {_columns(FIELDS)} FROM orders WHERE key = ?", (key,)
+        ).fetchone()
+        overlays = [changes[key] for changes in (self._flushing, self._pending) if key in changes]
+        if row is None and not overlays:
+            return None
+        record = OrderRecord(**dict(zip(FIELDS, row))) if row else OrderRecord()
+        for changed in overlays:
+            for name, value in changed.items():
+                setattr(record, name, value)
+        return record
+
+    def get(self, key):
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                record = self._load(key)
+                if record is None:
+                    return None
+            self._cache(key, record)
+            return record
+
+    def refresh(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+        return self.get(key)
+
+    def put(self, key, order, current_step):
+        with self._lock:
+            record = self._records.get(key) or self._load(key)
+            if record is None:
+                record = OrderRecord.from_order(order, current_step)
+                changed = {name: getattr(record, name) for name in FIELDS}
+                self._inserts.add(key)
+            else:
+                changed = record.update(order, current_step)
+            self._cache(key, record)
+            if changed:
+                self._pending.setdefault(key, {}).update(changed)
+            return changed
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                pending, inserts = self._pending, self._inserts
+                self._pending, self._inserts = {}, set()
+                self._flushing = pending
+            if not pending:
+                return
+            try:
+                self._write(pending, inserts)
+            except BaseException:
+                # Put the changes back under any made since, so the next flush retries them
+                with self._lock:
+                    for key, changed in pending.items():
+                        self._pending[key] = {**changed, **self._pending.get(key, {})}
+                    self._inserts |= inserts
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def _write(self, pending, inserts):
+        conn = self._connection()
+        with conn:
+            for key, changed in pending.items():
+                if key in inserts:
+                    names = ["key", *changed]
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO orders ({_columns(names)}) "
+                        f"VALUES ({', '.join('?' * len(names))})",
+                        (key, *changed.values())
+                    )
+                else:
+                    assignments = ", ".join(f'"{name}" = ?' for name in changed)
+                    conn.execute(
+                        f"UPDATE orders SET {assignments} WHERE key = ?",
+                        (*changed.values(), key)
+                    )
+
+    def items(self, batch_size=1000):
+        """Stream every stored order from disk without loading the whole table"""
+        self.flush()
+        cursor = self._connection().execute(f"SELECT key, {_columns(FIELDS)} FROM orders")
+        while rows := cursor.fetchmany(batch_size):
+            for key, *values in rows:
+                yield key, OrderRecord(**dict(zip(FIELDS, values)))
+
+    def _flush_loop(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # e.g. the database is locked; the changes stay pending for the next round
+
+    def close(self):
+        self._stopped.set()
+        self.flush()
+
+
+def open_store(path=None):
+    """Open the order store configured by `path`; None or ':memory:' keeps orders in memory"""
+    if not path or path == ':memory:':
+        return OrderStore()
+    return SQLiteOrderStore(path)
@@ -0,0 +1,231 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import engine
+
+# Costs a sweep varies per unit, so they follow quantity: parameter -> simulate_batch argument for the order total
+UNIT_COSTS = {
+    'product_cost_per_unit': 'product_cost',
+    'production_cost_per_unit': 'production_cost',
+    'procurement_cost_per_unit': 'procurement_cost',
+    'shipping_cost_from_stock_per_unit': 'shipping_cost_from_stock',
+    'shipping_cost_from_production_per_unit': 'shipping_cost_from_production',
+}
+
+# Parameters a sweep can vary, with the values the app uses; the app's costs are for an order of QUANTITY units
+PARAMETERS = {
+    'unit_price': engine.UNIT_PRICE,
+    'quantity': engine.QUANTITY,
+    'product_cost_per_unit': engine.PRODUCT_COST // engine.QUANTITY,
+    'production_cost_per_unit': engine.PRODUCTION_COST // engine.QUANTITY,
+    'procurement_cost_per_unit': engine.PROCUREMENT_COST // engine.QUANTITY,
+    'shipping_cost_from_stock_per_unit': engine.SHIPPING_COST_FROM_STOCK // engine.QUANTITY,
+    'shipping_cost_from_production_per_unit': engine.SHIPPING_COST_FROM_PRODUCTION // engine.QUANTITY,
+    'production_days': engine.PRODUCTION_DAYS,
+    'procurement_days': engine.PROCUREMENT_DAYS,
+    'shipping_days': engine.SHIPPING_DAYS,
+    'p_credit_approve': 0.9,
+    'p_in_stock': 0.5,
+    'p_materials_available': 0.5,
+}
+
+# Figures kept per scenario, over the orders that completed
+METRICS = ('completed', 'mean_margin', 'margin_p5', 'mean_lead_time', 'lead_time_p95')
+
+# Part of every scenario key: bump it when evaluate() changes so memoized results are recomputed
+MODEL_VERSION = 2
+
+
+def scenario_key(scenario, orders):
+    """Stable hash of a scenario's parameters and the number of simulated orders"""
+    payload = json.dumps({'model': MODEL_VERSION, 'orders': orders, **scenario}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def grid(axes, fixed=None):
+    """Every combination of the `axes` values, in row-major order, over `fixed` and the defaults"""
+    for name in (*axes, *(fixed or {})):
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown parameter {name!r}")
+    base = {**PARAMETERS, **(fixed or {})}
+    names = list(axes)
+    return [{**base, **dict(zip(names, values))} for values in itertools.product(*axes.values())]
+
+
+def _percentile(values, q):
+    """Lower nearest-rank percentile; one partition instead of np.percentile's interpolation"""
+    k = int(q / 100 * (len(values) - 1))
+    return float(np.partition(values, k)[k])
+
+
+def batch_arguments(scenario):
+    """simulate_batch keyword arguments for a scenario: unit costs become order totals"""
+    arguments = {name: value for name, value in scenario.items() if name not in UNIT_COSTS}
+    for name, argument in UNIT_COSTS.items():
+        arguments[argument] = scenario[name] * scenario['quantity']
+    return arguments
+
+
+def evaluate(scenario, orders, key):
+    """Simulate `orders` orders of one scenario; the seed comes from its key, so reruns agree"""
+    result = engine.simulate_batch(orders, seed=int(key[:16], 16), **batch_arguments(scenario))
+    completed = result['path'] != engine.PATH_REJECTED
+    if not completed.any():
+        return (0.0, np.nan, np.nan, np.nan, np.nan)
+    margin = result['margin'][completed]
+    lead_time = result['lead_time'][completed]
+    return (
+        float(completed.mean()),
+        float(margin.mean()),
+        _percentile(margin, 5),
+        float(lead_time.mean()),
+        _percentile(lead_time, 95),
+    )
+
+
+def _evaluate_chunk(chunk, orders):
+    """Worker: evaluate a list of (key, scenario)"""
+    return [(key, evaluate(scenario, orders, key)) for key, scenario in chunk]
+
+
+class ScenarioMemo:
+    """Scenario results on disk in SQLite, keyed by scenario_key()"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        columns = ", ".join(f"{name} REAL" for name in METRICS)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS scenarios (key TEXT PRIMARY KEY, {columns})")
+
+    def get_many(self, keys):
+        """{key: metrics} for the keys already computed"""
+        found = {}
+        keys = list(keys)
+        # SQLite caps the number of bound parameters, so look keys up in slices
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, {', '.join(METRICS)} FROM scenarios WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            for key, *values in rows:
+                found[key] = tuple(np.nan if value is None else value for value in values)
+        return found
+
+    def put_many(self, results):
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO scenarios VALUES (?, {', '.join('?' * len(METRICS))})",
+                [(key, *(None if np.isnan(value) else value for value in values)) for key, values in results]
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def default_memo():
+    """Memo at SWEEP_CACHE_PATH (default sweep_cache.db)"""
+    return ScenarioMemo(os.environ.get('SWEEP_CACHE_PATH', 'sweep_cache.db'))
+
+
+def run_sweep(axes, fixed=None, orders=1000, memo=None, workers=None, chunk_size=256, progress=None):
+    """Evaluate the grid of `axes` over `fixed`, computing only scenarios missing from `memo`
+
+    Missing scenarios are evaluated in chunks on a process pool of `workers`
+    (default: every core); a sweep that fits in one chunk runs in this process.
+    `progress(done, total)` is called as chunks finish. Returns an array of shape
+    (*axis lengths, len(METRICS)) and counts of cached and computed scenarios.
+    """
+    scenarios = grid(axes, fixed)
+    keys = [scenario_key(scenario, orders) for scenario in scenarios]
+    known = memo.get_many(set(keys)) if memo is not None else {}
+    missing = list({key: scenario for key, scenario in zip(keys, scenarios) if key not in known}.items())
+    counts = {'scenarios': len(scenarios), 'cached': len(scenarios) - len(missing), 'computed': len(missing)}
+
+    chunks = [missing[start:start + chunk_size] for start in range(0, len(missing), chunk_size)]
+    if len(chunks) <= 1:
+        results = (_evaluate_chunk(chunk, orders) for chunk in chunks)
+        pool = None
+    else:
+        # Spawn, not fork: the app's process holds server threads and locks a forked child would inherit
+        pool = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context('spawn')
+        )
+        results = pool.map(_evaluate_chunk, chunks, itertools.repeat(orders))
+    try:
+        done = 0
+        for chunk in results:
+            known.update(chunk)
+            if memo is not None:
+                memo.put_many(chunk)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, len(missing))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    values = np.array([known[key] for key in keys], dtype=np.float64)
+    shape = tuple(len(axis) for axis in axes.values())
+    return values.reshape(*shape, len(METRICS)), counts
+
+
+def parse_axis(text):
+    """'name=v1,v2,...' or 'name=start:stop:step' (stop included) -> (name, values)"""
+    name, _, values = text.partition('=')
+    if name not in PARAMETERS:
+        raise argparse.ArgumentTypeError(f"unknown parameter {name!r}; choose from {', '.join(PARAMETERS)}")
+    try:
+        if ':' in values:
+            start, stop, step = (float(part) for part in values.split(':'))
+            points = np.arange(start, stop + step / 2, step).tolist()
+        else:
+            points = [float(value) for value in values.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad values for {name}: {values!r}") from None
+    return name, [engine.whole(point) for point in points]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a what-if grid of order economics on a process pool")
+    parser.add_argument("--axis", type=parse_axis, action="append", required=True,
+                        help="parameter to vary: name=v1,v2,... or name=start:stop:step")
+    parser.add_argument("--orders", type=int, default=1000, help="simulated orders per scenario")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cache", default=os.environ.get('SWEEP_CACHE_PATH', 'sweep_cache.db'),
+                        help="SQLite file memoizing scenario results")
+    parser.add_argument("--out", help="CSV file to write every scenario and its metrics to")
+    args = parser.parse_args(argv)
+
+    axes = dict(args.axis)
+    memo = ScenarioMemo(args.cache)
+    started = time.perf_counter()
+    try:
+        results, counts = run_sweep(axes, orders=args.orders, memo=memo, workers=args.workers)
+    finally:
+        memo.close()
+    elapsed = time.perf_counter() - started
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(",".join((*axes, *METRICS)) + "\n")
+            for values, metrics in zip(itertools.product(*axes.values()), results.reshape(-1, len(METRICS))):
+                fh.write(",".join(str(value) for value in (*values, *metrics)) + "\n")
+    print(
+        f"{counts['scenarios']:,} scenarios in {elapsed:.1f}s: {counts['cached']:,} from the cache, "
+        f"{counts['computed']:,} computed on {args.workers} workers",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
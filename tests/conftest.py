@@ -0,0 +1,6 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('ORDER_STORE_PATH', ':memory:')
+os.environ.setdefault('DOCUMENT_NUMBERS_PATH', ':memory:')
@@ -0,0 +1,51 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from business_days import BusinessCalendar, us_federal_holidays
+
+HOLIDAY = date(2026, 7, 3)  # Friday: Independence Day observed
+THURSDAY, MONDAY = date(2026, 7, 2), date(2026, 7, 6)
+
+
+@pytest.fixture
+def calendar():
+    return BusinessCalendar({HOLIDAY}, start=date(2026, 1, 1), end=date(2027, 1, 1))
+
+
+def test_add_skips_the_weekend_and_the_holiday_both_ways(calendar):
+    assert calendar.add(THURSDAY, 1) == MONDAY
+    assert calendar.add(MONDAY, -1) == THURSDAY
+    assert calendar.add(HOLIDAY, 1) == MONDAY  # from a day off, the first business day counts
+    assert calendar.add(date(2026, 7, 4), -1) == THURSDAY
+    assert calendar.add(datetime(2026, 7, 2, 15, 30), 2) == datetime(2026, 7, 7, 15, 30)
+
+
+def test_add_array_matches_add(calendar):
+    days = [date(2026, 6, 29) + timedelta(days=i) for i in range(10)]
+    steps = np.array([1, 2, -1, 3, -2, 0, 1, -3, 4, 1])
+    expected = [calendar.add(day, int(n)) for day, n in zip(days, steps)]
+    assert calendar.add_array(np.array(days, dtype='datetime64[D]'), steps).astype(date).tolist() == expected
+
+
+def test_index_and_between_count_only_business_days(calendar):
+    assert calendar.between(THURSDAY, MONDAY) == 1
+    assert calendar.between(THURSDAY, date(2026, 7, 7)) == 2
+    assert calendar.index(HOLIDAY) == calendar.index(date(2026, 7, 5)) == calendar.index(MONDAY)
+    assert calendar.nth(calendar.index(MONDAY)) == MONDAY
+    assert calendar.roll_forward(HOLIDAY) == MONDAY
+
+
+def test_dates_outside_the_range_raise(calendar):
+    with pytest.raises(ValueError):
+        calendar.add(date(2026, 12, 31), 5)
+    with pytest.raises(ValueError):
+        calendar.index(date(2027, 1, 1))
+
+
+def test_weekend_holidays_are_observed_on_the_nearest_weekday():
+    holidays = us_federal_holidays([2022, 2026])
+    assert date(2026, 7, 3) in holidays  # Saturday, observed Friday
+    assert date(2022, 12, 26) in holidays  # Sunday, observed Monday
+    assert date(2022, 12, 25) not in holidays
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from credit import CreditEngine
+
+
+@pytest.fixture
+def engine():
+    return CreditEngine([("Acme", 100000, 20000), ("Bolt", 50000, 0)])
+
+
+def test_evaluate_stacks_a_customers_orders_in_sequence(engine):
+    engine.approve("Acme", 'pending', 30000)
+    result = engine.evaluate(["Acme", "Bolt", "Acme", "Acme", "Bolt"], [25000, 40000, 25000, 1, 20000])
+    # Acme starts at 20,000 open + 30,000 pending, Bolt at nothing
+    assert result['exposure_after'].tolist() == [75000, 40000, 100000, 100001, 60000]
+    assert result['approved'].tolist() == [True, True, True, False, False]
+    assert result['utilization'].tolist() == pytest.approx([0.75, 0.8, 1.0, 1.00001, 1.2])
+
+
+def test_evaluate_matches_scoring_one_order_at_a_time(engine):
+    rng = np.random.default_rng(7)
+    names = rng.choice(["Acme", "Bolt"], 50).tolist()
+    amounts = rng.integers(1000, 20000, 50)
+    result = engine.evaluate(names, amounts)
+    for n, (name, amount) in enumerate(zip(names, amounts)):
+        _, _, after = engine.exposure_after(name, None, amount)
+        assert result['exposure_after'][n] == after
+        engine.approve(name, f"order-{n}", amount)  # the next order stacks on this one
+    assert engine.account("Acme")['pending_orders'] + engine.account("Bolt")['pending_orders'] == amounts.sum()
+
+
+def test_evaluate_does_not_change_exposure(engine):
+    engine.evaluate(["Acme", "Bolt"], [90000, 90000])
+    assert engine.account("Acme")['exposure'] == 20000
+    assert engine.account("Bolt")['exposure'] == 0
+
+
+def test_a_customer_without_a_limit_is_not_approved(engine):
+    result = engine.evaluate(["Walk-in"], [1])
+    assert result['approved'].tolist() == [False]
+    assert result['utilization'].tolist() == [np.inf]
+
+
+def test_reading_an_unknown_customer_does_not_add_it(engine):
+    assert engine.account("Walk-in")['exposure'] == 0
+    assert engine.exposure_after("Walk-in", 'a', 500) == (0, 0, 500)
+    result = engine.evaluate(["Walk-in", "Acme", "Drop-in", "Walk-in"], [100, 100, 200, 300])
+    assert result['exposure_after'].tolist() == [100, 20100, 200, 400]  # unknown customers stack separately
+    assert engine.customers == ["Acme", "Bolt"]
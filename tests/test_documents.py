@@ -0,0 +1,55 @@
+import collections
+
+import pytest
+
+import documents
+from ingest import to_order
+
+RECORD = {'customer_name': 'BikeWorld Wholesale', 'product': 'Mountain Bike (Black)', 'quantity': 5}
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Count the reads of every live source"""
+    counts = collections.Counter()
+
+    def counted(name, read):
+        def wrapper(order):
+            counts[name] += 1
+            return read(order)
+        return wrapper
+
+    for name, read in list(documents.SOURCES.items()):
+        monkeypatch.setitem(documents.SOURCES, name, counted(name, read))
+    documents.cache.clear()
+    return counts
+
+
+@pytest.mark.parametrize('step, name', [
+    (1, 'response_to_inquiry'),
+    (3, 'credit_check_report'),
+    (5, 'back_order_processing'),
+    (7, 'production_order'),
+])
+def test_each_source_is_read_once_per_render(reads, step, name):
+    order, _ = to_order(RECORD)
+    order['order_key'] = f"test-{name}"
+    documents.issue_numbers(order, step)
+    first = documents.render(name, order)
+    assert set(reads) == set(documents.TEMPLATES[name].sources)
+    assert all(count == 1 for count in reads.values())
+    # A cache hit reads the sources for the key and renders nothing
+    assert documents.render(name, order) is first
+    assert all(count == 2 for count in reads.values())
+
+
+def test_captured_sources_are_rendered_as_captured(reads):
+    order, _ = to_order(RECORD)
+    order['order_key'] = "test-captured"
+    live = documents.live_values(order, 1)
+    template = documents.TEMPLATES['response_to_inquiry']
+    live['quote'] = (123, "Contract price", 0, 9)
+    reads.clear()
+    content = template.render(order, live).content
+    assert not reads
+    assert "$123 (Contract price)" in content
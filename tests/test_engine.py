@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import engine
+from business_days import CALENDAR
+
+START = datetime(2026, 3, 2)
+
+# Branch probabilities forcing each path, with the decisions advance() takes on it
+PATHS = {
+    engine.PATH_FROM_STOCK: ({'p_in_stock': 1}, {3: "Approve", 4: "In Stock"}),
+    engine.PATH_PRODUCTION: ({'p_in_stock': 0, 'p_materials_available': 1},
+                             {3: "Approve", 4: "Out of Stock", 5: "Available"}),
+    engine.PATH_PROCUREMENT: ({'p_in_stock': 0, 'p_materials_available': 0},
+                              {3: "Approve", 4: "Out of Stock", 5: "Not Available"}),
+}
+
+
+def _walk(decisions):
+    """Run one order through the flat TRANSITIONS, as the batch models them"""
+    order = engine.new_order(START)
+    step = 1
+    while step < len(engine.STEPS):
+        step = engine.advance(order, step, decisions.get(step))
+    return order
+
+
+@pytest.mark.parametrize('path', sorted(PATHS))
+def test_each_path_matches_advance_through_transitions(path):
+    probabilities, decisions = PATHS[path]
+    result = engine.simulate_batch(5, p_credit_approve=1, start_date=START.date(), seed=1, **probabilities)
+    order = _walk(decisions)
+    assert (result['path'] == path).all()
+    assert result['total_cost'][0] == sum(order['costs'].values())
+    assert result['revenue'][0] == order['total_value'] + order['costs']['shipping']
+    assert result['lead_time'][0] == CALENDAR.between(START, order['current_date'])
+    assert result['completion_date'][0] == np.datetime64(order['current_date'].date())
+
+
+def test_rejected_orders_are_lost_without_cost_or_lead_time():
+    result = engine.simulate_batch(100, p_credit_approve=0, max_credit_attempts=3, seed=1)
+    assert (result['path'] == engine.PATH_REJECTED).all()
+    assert (result['total_cost'] == 0).all() and (result['revenue'] == 0).all()
+    assert np.isnan(result['lead_time']).all()
+
+
+def test_path_shares_follow_the_branch_probabilities():
+    result = engine.simulate_batch(200_000, p_credit_approve=0.5, max_credit_attempts=2, p_in_stock=0.4,
+                                   p_materials_available=0.25, seed=3)
+    shares = engine.summarize(result)['paths']
+    approved = 1 - 0.5 ** 2
+    expected = {
+        engine.PATH_REJECTED: 1 - approved,
+        engine.PATH_FROM_STOCK: approved * 0.4,
+        engine.PATH_PRODUCTION: approved * 0.6 * 0.25,
+        engine.PATH_PROCUREMENT: approved * 0.6 * 0.75,
+    }
+    for code, share in expected.items():
+        assert shares[engine.PATH_NAMES[code]] == pytest.approx(share, abs=0.005)
+    assert result['credit_attempts'].max() == 2
+
+
+def test_a_seed_makes_the_batch_reproducible():
+    first, second = engine.simulate_batch(1000, seed=42), engine.simulate_batch(1000, seed=42)
+    assert all(np.array_equal(first[key], second[key], equal_nan=True) for key in first)
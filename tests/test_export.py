@@ -0,0 +1,60 @@
+import io
+import zipfile
+
+import documents
+import export
+from engine import visited_steps
+from ingest import to_order
+
+RECORD = {'customer_name': 'BikeWorld Wholesale', 'product': 'Mountain Bike (Black)', 'quantity': 5}
+
+
+class Unseekable(io.RawIOBase):
+    """A pipe-like sink: writes only, like stdout"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, chunk):
+        self.data += chunk
+        return len(chunk)
+
+
+def _order(key, step, **fields):
+    """An order at `step`, with the document numbers of the steps it passed"""
+    order, _ = to_order(RECORD)
+    order.update(order_key=key, **fields)
+    for visited in visited_steps(order, step):
+        documents.issue_numbers(order, visited)
+    return order
+
+
+def test_packet_holds_the_documents_of_the_steps_the_order_passed():
+    order = _order('from-stock', 9, inventory_status="In Stock", credit_status="Approve")
+    names = zipfile.ZipFile(io.BytesIO(export.order_packet(order, 9))).namelist()
+    expected = [name for step in (1, 2, 3, 4, 8, 9) for name in documents.STEP_DOCUMENTS[step]]
+    assert names == [f"{documents.TEMPLATES[name].filename}.md" for name in expected]
+
+
+def test_export_streams_one_folder_per_order_to_an_unseekable_file():
+    orders = [
+        ('a', _order('a', 4, inventory_status="In Stock"), 4),
+        ('b', _order('b', 2), 2),
+    ]
+    sink = Unseekable()
+    count = export.export_orders(iter(orders), sink)
+    archive = zipfile.ZipFile(io.BytesIO(bytes(sink.data)))
+    folders = [name.split("/")[0] for name in archive.namelist()]
+    assert count == len(folders) == 4 + 2
+    assert folders == ['a'] * 4 + ['b'] * 2
+    assert archive.testzip() is None
+    assert all(archive.read(name).strip() for name in archive.namelist())
+
+
+def test_export_does_not_touch_the_live_document_cache():
+    documents.cache.clear()
+    export.export_orders(iter([('a', _order('a', 3), 3)]), io.BytesIO())
+    assert documents.cache_info()['size'] == 0
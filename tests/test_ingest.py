@@ -0,0 +1,82 @@
+import io
+import json
+import re
+from datetime import datetime
+
+import pytest
+
+import credit
+import mrp
+import scheduling
+from documents import order_documents
+from ingest import Ingestor, run_order, to_order
+from store import OrderStore
+
+RECORD = {'customer_name': 'BikeWorld Wholesale', 'product': 'Mountain Bike (Black)', 'quantity': 5}
+
+
+@pytest.mark.parametrize('fields', [
+    {'unit_price': [1]},
+    {'unit_price': 'nan'},
+    {'unit_price': float('inf')},
+    {'unit_price': -5},
+    {'order_date': 20260101},
+    {'order_date': 'not a date'},
+    {'quantity': 1.5},
+    {'quantity': '1.5'},
+    {'quantity': None},
+    {'quantity': 0},
+])
+def test_invalid_records_are_rejected(fields):
+    with pytest.raises(ValueError):
+        to_order({**RECORD, **fields})
+
+
+def test_whole_quantities_and_iso_dates_are_accepted():
+    order, _ = to_order({**RECORD, 'quantity': '7', 'unit_price': '480.0', 'order_date': '2026-01-05'})
+    assert (order['quantity'], order['unit_price'], order['total_value']) == (7, 480, 3360)
+    assert order['start_date'].isoformat() == '2026-01-05T00:00:00'
+
+
+def test_documents_show_each_step_as_it_ran():
+    order, decisions = to_order({**RECORD, 'quantity': 120, 'inventory_decision': 'Out of Stock'})
+    order['order_key'] = "test-snapshots"
+    current_step, snapshots = run_order(order, decisions)
+    assert current_step == 10
+    documents = {document.filename: document.content for document in
+                 order_documents(order, current_step, cached=False, snapshots=snapshots)}
+    production = documents['production_order']
+    start = datetime.strptime(re.search(r"Start Date: (.*)", production).group(1), "%B %d, %Y")
+    completion = datetime.strptime(re.search(r"Estimated Completion: (.*)", production).group(1), "%B %d, %Y")
+    assert start <= completion
+    # Step 8 documents predate shipping: no carrier yet, and the load is still open
+    assert "Carrier: Assigned on shipping" in documents['bill_of_lading']
+    assert "Consolidated on shipping" in documents['bill_of_lading']
+    assert order['carrier'] is not None
+
+
+def test_an_order_failing_its_transitions_is_rejected_and_released(monkeypatch):
+    schedule = scheduling.SCHEDULER.schedule
+    calls = []
+
+    def schedule_once(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise ValueError("2099-12-24 plus 5 business days is outside the calendar range")
+        return schedule(*args)
+
+    monkeypatch.setattr(scheduling.SCHEDULER, 'schedule', schedule_once)
+    record = {**RECORD, 'customer_name': 'Failing Cycles', 'credit_decision': 'Approve',
+              'inventory_decision': 'Out of Stock'}
+    demand = len(mrp.MRP._orders)
+    rejects = io.StringIO()
+    ingestor = Ingestor(OrderStore(), rejects=rejects)
+    counts = ingestor.run(enumerate([record] * 3, 2))
+
+    assert (counts['failed'], counts['completed']) == (1, 2)
+    assert json.loads(rejects.getvalue()) == {
+        'line': 2, 'error': "ValueError: 2099-12-24 plus 5 business days is outside the calendar range"
+    }
+    # What the failed order held is released: no pending credit, no material demand
+    assert credit.CREDIT.account('Failing Cycles')['pending_orders'] == 0
+    assert len(mrp.MRP._orders) == demand
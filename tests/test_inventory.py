@@ -0,0 +1,68 @@
+import threading
+from datetime import date, timedelta
+
+from inventory import InventoryEngine
+
+SKU = "Test Bike"
+SHELF, YARD = "Shelf", "Yard"
+
+
+def _engine(*stock):
+    return InventoryEngine(stock or [(SKU, SHELF, 100)])
+
+
+def test_reserve_issue_and_release_move_availability_and_stock():
+    engine = _engine()
+    reservation = engine.reserve(SKU, 30, 'a')
+    assert (reservation.location, reservation.quantity, reservation.scheduled) == (SHELF, 30, False)
+    assert engine.available(SKU) == 70
+
+    assert engine.reserve(SKU, 40, 'a').quantity == 40  # reserving again replaces the reservation
+    assert engine.available(SKU) == 60
+    assert engine.release('a').quantity == 40
+    assert engine.available(SKU) == 100 and engine.release('a') is None
+
+    engine.reserve(SKU, 25, 'b')
+    engine.issue('b')
+    assert engine.position(SKU, SHELF).on_hand == 75
+    assert engine.available(SKU) == 75 and engine.reservation('b') is None
+
+
+def test_reserve_takes_the_first_location_that_covers_the_whole_quantity():
+    engine = _engine((SKU, SHELF, 10), (SKU, YARD, 50))
+    assert engine.reserve(SKU, 30, 'a').location == YARD
+    assert engine.reserve(SKU, 30, 'b') is None
+    assert engine.available(SKU) == 30
+
+
+def test_a_future_reservation_counts_against_stock_from_its_need_date():
+    engine = _engine()
+    need = date.today() + timedelta(days=10)
+    assert engine.reserve(SKU, 80, 'later', need_date=need).scheduled
+    assert engine.available(SKU) == 20  # promising today must not starve the later order
+    engine.receive(SKU, 50, SHELF, on=need + timedelta(days=1))
+    assert engine.available(SKU) == engine.available(SKU, on=need) == 20  # arrives too late to help
+    assert engine.available(SKU, on=need + timedelta(days=1)) == 70
+    engine.receive(SKU, 50, SHELF, on=need - timedelta(days=1))
+    assert engine.available(SKU) == 70
+    engine.release('later')
+    assert engine.available(SKU) == 100
+
+
+def test_concurrent_reservations_never_oversell():
+    engine = _engine()
+    start = threading.Barrier(40)
+    granted = []
+
+    def reserve(n):
+        start.wait()
+        if engine.reserve(SKU, 7, f"order-{n}") is not None:
+            granted.append(n)
+
+    threads = [threading.Thread(target=reserve, args=(n,)) for n in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(granted) == 100 // 7
+    assert engine.available(SKU) == 100 - 7 * len(granted)
@@ -0,0 +1,55 @@
+from datetime import date, datetime
+
+import pytest
+
+import credit
+import ledger
+from engine import new_order
+
+
+@pytest.fixture
+def books(monkeypatch):
+    """A fresh ledger and credit engine"""
+    monkeypatch.setattr(ledger, 'LEDGER', ledger.Ledger())
+    monkeypatch.setattr(credit, 'CREDIT', credit.CreditEngine([("Restart Cycles", 100000, 0)]))
+    return ledger.LEDGER, credit.CREDIT
+
+
+def _order():
+    order = new_order(datetime(2026, 3, 2))
+    order.update(order_key="ledger-test", invoice_number="INV-L1", customer_name="Restart Cycles", total_value=50000)
+    order['costs']['shipping'] = 2000
+    return order
+
+
+def test_invoicing_again_after_start_over_releases_the_new_approval(books):
+    books_ledger, engine = books
+    order = _order()
+    credit.check_credit(order, "Approve")
+    ledger.invoice(order)
+    credit.check_credit(order, "Approve")  # started over: step 3 approves again
+    assert engine.account("Restart Cycles")['pending_orders'] == 50000
+    ledger.invoice(order)
+    assert engine.account("Restart Cycles") == {
+        'credit_limit': 100000, 'open_invoices': 52000, 'pending_orders': 0, 'exposure': 52000
+    }
+    assert books_ledger.invoice_summary("INV-L1")['invoiced'] == 52000
+
+
+def test_paid_invoice_is_not_reopened(books):
+    _, engine = books
+    order = _order()
+    ledger.invoice(order)
+    engine.record_payment("INV-L1", 52000)
+    ledger.invoice(order)
+    assert engine.account("Restart Cycles")['open_invoices'] == 0
+
+
+def test_aging_defaults_to_the_latest_day_posted(books):
+    books_ledger, _ = books
+    order = _order()
+    order['current_date'] = datetime(2030, 1, 15)  # simulated orders run ahead of today
+    ledger.invoice(order)
+    books_ledger.record_payment("INV-L0", datetime(2030, 3, 1), 0.01)  # a later posting moves the as-of day
+    assert books_ledger.last_day() == date(2030, 3, 1)
+    assert books_ledger.aging() == {'0-30': 0.0, '31-60': 52000.0, '61-90': 0.0, '90+': 0.0}
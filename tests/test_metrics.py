@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+import metrics
+
+
+def test_profile_path_keeps_generated_keys(tmp_path):
+    key = "0123456789abcdef0123456789abcdef"
+    assert metrics.profile_path(tmp_path, key) == os.path.join(os.path.realpath(tmp_path), f"{key}.folded")
+
+
+@pytest.mark.parametrize('key', ["../../somewhere", "/etc/passwd", "..", "a/b", "C:\\temp\\x"])
+def test_profile_path_never_leaves_its_directory(tmp_path, key):
+    path = metrics.profile_path(tmp_path, key)
+    assert os.path.dirname(path) == os.path.realpath(tmp_path)
+    assert os.path.basename(path) != f"{key}.folded"
+
+
+def test_profile_path_rejects_a_link_out_of_its_directory(tmp_path):
+    key = "ab" * 16
+    os.symlink(tmp_path.parent / "elsewhere.folded", tmp_path / f"{key}.folded")
+    with pytest.raises(ValueError):
+        metrics.profile_path(tmp_path, key)
@@ -0,0 +1,66 @@
+import pytest
+
+from mrp import MRPEngine
+
+# Bolts go into the bike directly and into each wheel, so their low-level code is 2
+ITEMS = (
+    ('Bike', None, 0, 0, 0),
+    ('Wheel', None, 0, 0, 3),
+    ('Frame', 'Frame Co', 100, 10, 4),
+    ('Bolt', 'Bolt Co', 1, 3, 5),
+)
+BOM = (
+    ('Bike', 'Wheel', 2),
+    ('Bike', 'Bolt', 1),
+    ('Bike', 'Frame', 1),
+    ('Wheel', 'Bolt', 4),
+)
+
+
+@pytest.fixture
+def mrp():
+    return MRPEngine(ITEMS, BOM)
+
+
+def _shortages(mrp, order_key):
+    return {line.item: line.quantity for line in mrp.shortages(order_key)}
+
+
+def test_low_level_codes_are_the_deepest_level():
+    assert MRPEngine(ITEMS, BOM).level == {'Bike': 0, 'Wheel': 1, 'Frame': 1, 'Bolt': 2}
+
+
+def test_a_cyclic_bom_is_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        MRPEngine(ITEMS, BOM + (('Bolt', 'Bike', 1),))
+
+
+def test_netting_nets_parents_before_their_shared_components(mrp):
+    mrp.set_demand('a', 'Bike', 10)
+    assert mrp.net['Wheel'] == 17  # 20 wheels, 3 on hand
+    assert mrp.gross['Bolt'] == 10 + 17 * 4  # both parents are netted before the bolts
+    assert mrp.net['Bolt'] == 73 and mrp.net['Frame'] == 6
+    assert _shortages(mrp, 'a') == {'Bolt': 73, 'Frame': 6}
+
+
+def test_the_first_order_to_procure_covers_the_shortfall(mrp):
+    mrp.set_demand('a', 'Bike', 10)
+    assert sum(line.quantity * line.unit_cost for line in mrp.procure('a')) == 73 + 600
+    mrp.set_demand('b', 'Bike', 1)
+    assert _shortages(mrp, 'b') == {'Bolt': 9, 'Frame': 1}  # only what the open purchases do not cover
+    mrp.cancel('b')
+    assert _shortages(mrp, 'a') == {} and mrp.net['Wheel'] == 17
+
+
+def test_incremental_netting_matches_netting_from_scratch(mrp):
+    for key, quantity in (('a', 10), ('b', 4), ('c', 7)):
+        mrp.set_demand(key, 'Bike', quantity)
+    mrp.procure('b')
+    mrp.cancel('a')
+    mrp.receive('Bolt', 20)
+
+    fresh = MRPEngine(ITEMS, BOM)
+    fresh.on_hand, fresh.on_order = dict(mrp.on_hand), dict(mrp.on_order)
+    for key, quantity in (('b', 4), ('c', 7)):
+        fresh.set_demand(key, 'Bike', quantity)
+    assert (fresh.gross, fresh.net) == (mrp.gross, mrp.net)
@@ -0,0 +1,44 @@
+import threading
+
+from numbering import SequenceAllocator
+
+
+def test_numbers_are_never_reissued_across_restarts(tmp_path):
+    path = str(tmp_path / "numbers.db")
+    first = SequenceAllocator(path, block_size=10)
+    issued = [first.next("INV") for _ in range(25)]
+    assert len(set(issued)) == 25 and issued[:10] == list(range(1, 11))
+    first.close()
+
+    second = SequenceAllocator(path, block_size=10)
+    resumed = [second.next("INV") for _ in range(25)]
+    assert len(set(resumed)) == 25 and min(resumed) > max(issued)  # the rest of the open blocks is skipped
+    assert second.next("SO") == 1  # sequences are independent
+    second.close()
+
+
+def test_allocators_sharing_a_file_get_disjoint_blocks(tmp_path):
+    path = str(tmp_path / "numbers.db")
+    allocators = [SequenceAllocator(path, block_size=8) for _ in range(2)]
+    issued = [allocator.next("INV") for _ in range(40) for allocator in allocators]
+    assert len(set(issued)) == len(issued)
+    for allocator in allocators:
+        allocator.close()
+
+
+def test_concurrent_threads_get_unique_numbers():
+    allocator = SequenceAllocator(block_size=16)
+    start = threading.Barrier(8)
+    issued = []
+
+    def take():
+        start.wait()
+        issued.extend(allocator.next("INV") for _ in range(500))
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(issued) == len(set(issued)) == 4000
+    assert allocator.number("PO") == "PO-000001"
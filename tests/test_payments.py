@@ -0,0 +1,126 @@
+import io
+from datetime import date, datetime
+
+import pytest
+
+import credit
+import ledger
+import payments
+from engine import new_order
+from store import OrderStore
+
+
+@pytest.fixture
+def books(monkeypatch):
+    """An empty ledger and credit engine, as in a freshly started process"""
+    monkeypatch.setattr(payments, 'LEDGER', ledger.Ledger())
+    monkeypatch.setattr(payments, 'CREDIT', credit.CreditEngine())
+    return payments.LEDGER, payments.CREDIT
+
+
+def _stored(store, key, step, **fields):
+    order = new_order(datetime(2026, 3, 2))
+    order.update(customer_name="Restored Cycles", credit_status="Approve", **fields)
+    order['costs']['shipping'] = 2000
+    store.put(key, order, step)
+
+
+def test_restored_books_match_the_store(books):
+    books_ledger, engine = books
+    store = OrderStore()
+    _stored(store, 'paid-in-part', 10, invoice_number="INV-R1", amount_paid=20000)
+    _stored(store, 'started-over', 2, invoice_number="INV-R2")
+    _stored(store, 'at-invoicing', 9, invoice_number="INV-R3")
+    _stored(store, 'in-production', 7)
+    _stored(store, 'quoted', 1)
+    payments.restore_books(store)
+
+    invoice = 50000 + 2000
+    assert books_ledger.invoice_summary("INV-R1") == {'invoiced': invoice, 'paid': 20000, 'open': invoice - 20000}
+    assert books_ledger.invoice_summary("INV-R2")['open'] == invoice
+    assert books_ledger.invoice_summary("INV-R3") is None  # posted when the order leaves step 9
+    assert engine.account("Restored Cycles") == {
+        'credit_limit': 0, 'open_invoices': 2 * invoice - 20000, 'pending_orders': 2 * 50000,
+        'exposure': 2 * invoice - 20000 + 2 * 50000
+    }
+
+    # Collecting the resumed order settles its invoice instead of driving A/R negative
+    order = store.get('paid-in-part').to_order()
+    order['order_key'] = 'paid-in-part'
+    payments.collect(order)
+    assert books_ledger.invoice_summary("INV-R1")['open'] == 0
+    assert order['payment_status'] == "Paid"
+
+
+def test_statement_settles_invoices_the_process_never_posted(books):
+    books_ledger, _ = books
+    store = OrderStore()
+    _stored(store, 'awaiting-payment', 10, invoice_number="INV-S1", amount_paid=2000)
+    _stored(store, 'started-over', 2, invoice_number="INV-S2")
+    _stored(store, 'settled', 10, invoice_number="INV-S3", amount_paid=52000, payment_status="Paid")
+    matcher = payments.load_open_invoices(store, payments.PaymentMatcher())
+    assert len(matcher) == 2
+
+    lines = [payments.StatementLine(2, date(2026, 3, 20), 50000, "INV-S1", "Restored Cycles"),
+             payments.StatementLine(3, date(2026, 3, 20), 52000, "INV-S2", "Restored Cycles")]
+    counts = payments.apply_statement(lines, matcher, store)
+    assert counts['matched'] == 2 and counts['unapplied'] == 0
+    for invoice, key in (("INV-S1", 'awaiting-payment'), ("INV-S2", 'started-over')):
+        assert books_ledger.invoice_summary(invoice) == {'invoiced': 52000, 'paid': 52000, 'open': 0}
+        assert store.get(key).payment_status == "Paid"
+
+
+def test_malformed_csv_rows_are_skipped_before_anything_is_posted():
+    statement = io.StringIO(
+        "date,amount,reference,payer\n"
+        "2026-03-20,100.50,INV-1,Acme\n"
+        "2026-03-20,,INV-2,Acme\n"
+        "20th March,10,INV-3,Acme\n"
+        "2026-03-21,nan,INV-4,Acme\n"
+        "2026-03-21,75,INV-5,Acme\n"
+    )
+    rejected = []
+    lines = payments.read_csv_statement(statement, rejected)
+    assert [(line.line, line.amount) for line in lines] == [(2, 100.5), (6, 75.0)]
+    assert [number for number, _ in rejected] == [3, 4, 5]
+
+    statement.seek(0)
+    with pytest.raises(ValueError, match="Statement line 3"):
+        payments.read_csv_statement(statement)
+
+
+def test_bai2_funds_types_shift_the_reference_fields():
+    statement = io.StringIO(
+        "01,BANK,COMPANY,260320,0800,1,,,2/\n"
+        "02,COMPANY,BANK,1,260320,,USD,2/\n"
+        "16,195,10050,Z,B1,INV-1,Acme/\n"
+        "16,195,20000,V,260321,,B2,INV-2,Bolt Co/\n"
+        "16,195,30000,S,10000,10000,10000,B3,INV-3,Cog/\n"
+        "88,Works/\n"
+        "16,195,40000,D,2,0,20000,1,20000,B4,INV-4,Dyn/\n"
+        "16,195,,Z,B5,INV-5,Blank/\n"
+        "16,475,9900,Z,B6,CHK-1,Debit/\n"
+        "02,COMPANY,BANK,1,2603XX,,USD,2/\n"
+        "16,195,500,Z,B7,INV-7,Late/\n"
+    )
+    rejected = []
+    lines = payments.read_bai2_statement(statement, rejected)
+    assert [(line.amount, line.reference, line.payer) for line in lines] == [
+        (100.5, "INV-1", "Acme"), (200.0, "INV-2", "Bolt Co"), (300.0, "INV-3", "Cog Works"), (400.0, "INV-4", "Dyn"),
+    ]
+    assert all(line.day == date(2026, 3, 20) for line in lines)
+    assert [number for number, _ in rejected] == [8, 10, 11]
+
+
+def test_collect_posts_what_another_process_received_instead_of_collecting_it_again(books):
+    books_ledger, _ = books
+    store = OrderStore()
+    _stored(store, 'paid-elsewhere', 10, invoice_number="INV-C1")
+    order = store.get('paid-elsewhere').to_order()
+    order['order_key'] = 'paid-elsewhere'
+    payments.restore_invoice(order)
+    order['amount_paid'] = 30000  # posted by payments.py to the store only
+
+    payments.collect(order)
+    assert books_ledger.invoice_summary("INV-C1") == {'invoiced': 52000, 'paid': 52000, 'open': 0}
+    assert order['amount_paid'] == 52000 and order['payment_status'] == "Paid"
@@ -0,0 +1,68 @@
+from datetime import date
+
+import pytest
+
+from quoting import CONTRACT_PRICE, LIST_PRICE, PriceCatalogue, QuoteCache, QuoteEngine
+
+BIKE = "Test Bike"
+MARCH, JULY = date(2026, 3, 2).toordinal(), date(2026, 7, 1).toordinal()
+PRICES = (
+    (BIKE, None, 1, 500, None, None),
+    (BIKE, None, 100, 480, None, None),
+    (BIKE, None, 500, 460, None, None),
+    (BIKE, "Acme", 50, 450, date(2026, 1, 1), date(2026, 6, 30)),
+    (BIKE, None, 1, 520, date(2026, 7, 1), None),  # a list price increase; its tiers replace the old ones
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("quantity, unit_price", [(1, 500), (99, 500), (100, 480), (499, 480), (500, 460)])
+def test_the_highest_tier_reached_sets_the_list_price(quantity, unit_price):
+    assert PriceCatalogue(PRICES).price(BIKE, "Walk-in", quantity, MARCH) == (unit_price, LIST_PRICE)
+
+
+def test_a_contract_price_applies_within_its_tiers_and_period():
+    catalogue = PriceCatalogue(PRICES)
+    assert catalogue.price(BIKE, "Acme", 50, MARCH) == (450, CONTRACT_PRICE)
+    assert catalogue.price(BIKE, "Acme", 10, MARCH) == (500, LIST_PRICE)  # below the contract's first tier
+    assert catalogue.price(BIKE, "Acme", 50, JULY) == (520, LIST_PRICE)  # the contract ended
+    assert catalogue.price(BIKE, "Acme", 500, JULY) == (520, LIST_PRICE)  # the newer list has one tier
+    with pytest.raises(KeyError):
+        catalogue.price("Unknown", "Acme", 1, MARCH)
+
+
+def test_cached_prices_expire_after_the_ttl():
+    clock = Clock()
+    engine = QuoteEngine(PRICES, QuoteCache(ttl=60, clock=clock))
+    assert engine.price("Acme", BIKE, 50, date(2026, 3, 2)) == (450, CONTRACT_PRICE)
+    engine.catalogue = PriceCatalogue(PRICES[:3])  # swapped in place: the cache still answers
+    clock.now = 59
+    assert engine.price("Acme", BIKE, 50, date(2026, 3, 2)) == (450, CONTRACT_PRICE)
+    clock.now = 60
+    assert engine.price("Acme", BIKE, 50, date(2026, 3, 2)) == (500, LIST_PRICE)
+    info = engine.cache.info()
+    assert (info['hits'], info['misses'], info['expirations']) == (1, 2, 1)
+
+
+def test_the_cache_evicts_the_least_recently_used_entry():
+    cache = QuoteCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    assert cache.info()['evictions'] == 1
+
+
+def test_load_drops_cached_prices():
+    engine = QuoteEngine(PRICES, QuoteCache(clock=Clock()))
+    engine.price("Acme", BIKE, 50, date(2026, 3, 2))
+    engine.load(PRICES[:3])
+    assert engine.price("Acme", BIKE, 50, date(2026, 3, 2)) == (500, LIST_PRICE)
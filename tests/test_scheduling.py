@@ -0,0 +1,115 @@
+import random
+from datetime import date
+
+import pytest
+
+from business_days import CALENDAR
+from engine import SHIPPING_DAYS
+from scheduling import DEFAULT_WORK_CENTERS, ProductionScheduler
+
+
+def _rebuild(scheduler):
+    """Slots of every open order, loaded from scratch in rank order: {key: [(work center, day, quantity)]}"""
+    used = {center.name: {} for center in scheduler.work_centers}
+    slots = {}
+    for order in sorted(scheduler._orders.values(), key=lambda order: order.rank):
+        slots[order.key] = []
+        day = order.release
+        for center in scheduler.work_centers:
+            remaining = order.quantity
+            while True:
+                taken = min(max(center.capacity - used[center.name].get(day, 0), 0), remaining)
+                if taken:
+                    used[center.name][day] = used[center.name].get(day, 0) + taken
+                    slots[order.key].append((center.name, day, taken))
+                    remaining -= taken
+                if remaining <= 0:
+                    break
+                day += 1
+            day += 1
+    return slots
+
+
+def _check(scheduler):
+    assert {key: order.slots for key, order in scheduler._orders.items()} == _rebuild(scheduler)
+    for center in scheduler.work_centers:
+        load = scheduler._loads[center.name]
+        assert all(total <= center.capacity for total in load.total.values())
+        for day, orders in load.days.items():
+            assert load.total[day] == sum(quantity for _, quantity in orders.values())
+
+
+def test_moved_order_is_reloaded_below_orders_it_freed():
+    scheduler = ProductionScheduler()
+    scheduler.schedule('o0', 160, date(2026, 1, 5), date(2026, 1, 6))
+    scheduler.schedule('o1', 150, date(2026, 1, 9), date(2026, 1, 15))
+    scheduler.schedule('o2', 76, date(2026, 1, 7), date(2026, 1, 10))
+    scheduler.schedule('o3', 87, date(2026, 1, 8), date(2026, 1, 14))
+    scheduler.schedule('o3', 117, date(2026, 1, 8), date(2026, 1, 16))
+    _check(scheduler)
+
+
+@pytest.mark.parametrize('rule', ['edd', 'cr'])
+@pytest.mark.parametrize('seed', range(20))
+def test_incremental_changes_match_a_rebuild(rule, seed):
+    rng = random.Random(seed)
+    scheduler = ProductionScheduler(rule=rule)
+    first = CALENDAR.index(date(2026, 1, 5))
+    keys = [f"o{n}" for n in range(25)]
+    for _ in range(150):
+        key = rng.choice(keys)
+        if key in scheduler._orders and rng.random() < 0.3:
+            scheduler.cancel(key)
+        else:
+            release = first + rng.randrange(20)
+            due = release + rng.randrange(1, 15)
+            scheduler.schedule(key, rng.randrange(1, 300), CALENDAR.nth(release), CALENDAR.nth(due))
+        _check(scheduler)
+
+
+def test_completion_follows_the_last_operation():
+    scheduler = ProductionScheduler(DEFAULT_WORK_CENTERS)
+    completion = scheduler.schedule('o', 100, date(2026, 1, 5), date(2026, 1, 20))
+    # One day per work center, finishing on the third business day; completion is the day after
+    assert completion == date(2026, 1, 8)
+    assert [first for _, first, _ in scheduler.operations('o')] == [date(2026, 1, 5), date(2026, 1, 6), date(2026, 1, 7)]
+
+
+def test_order_past_the_horizon_is_short_instead_of_raising():
+    scheduler = ProductionScheduler(DEFAULT_WORK_CENTERS, horizon=3)
+    # Frame Prep makes 150 a day: four days from the release get 600 of the 1,000 units
+    completion = scheduler.schedule('o', 1000, date(2026, 1, 5), date(2026, 1, 20))
+    assert scheduler.shortfall('o') == 400
+    assert completion == date(2026, 1, 9)
+    assert scheduler.operations('o') == [('Frame Prep', date(2026, 1, 5), date(2026, 1, 8))]
+
+    # Orders below it still see the capacity it holds
+    scheduler.schedule('p', 100, date(2026, 1, 8), date(2026, 1, 21))
+    assert scheduler.operations('p')[0][1] == date(2026, 1, 9)
+    scheduler.cancel('o')
+    assert scheduler.shortfall('o') == 0
+    _check(scheduler)
+
+
+def test_schedule_stops_short_of_the_calendar_end():
+    scheduler = ProductionScheduler(DEFAULT_WORK_CENTERS)
+    completion = scheduler.schedule('o', 100_000, date(2099, 11, 2), date(2100, 6, 1))
+    assert scheduler.shortfall('o') > 0
+    # The delivery date after shipping still falls on the calendar
+    CALENDAR.add(completion, SHIPPING_DAYS)
+
+
+def test_completed_orders_are_dropped_behind_the_latest_release():
+    scheduler = ProductionScheduler(DEFAULT_WORK_CENTERS, retain_days=20)
+    scheduler.schedule('done', 100, date(2026, 1, 5), date(2026, 1, 20))
+    scheduler.complete('done')
+    scheduler.schedule('open', 100, date(2026, 1, 5), date(2026, 1, 21))
+    scheduler.schedule('recent', 100, date(2026, 1, 26), date(2026, 2, 20))
+    assert scheduler.completion('done') is not None
+
+    scheduler.schedule('later', 100, date(2026, 3, 2), date(2026, 3, 20))
+    assert scheduler.completion('done') is None
+    assert all('done' not in orders for load in scheduler._loads.values() for orders in load.days.values())
+    # The open order it ranked above takes the capacity it left
+    assert scheduler.operations('open')[0][1] == date(2026, 1, 5)
+    _check(scheduler)
@@ -0,0 +1,105 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import ledger
+import shipping
+from shipping import ORIGIN, ShippingEngine
+
+DAY = date(2026, 3, 2)
+WEIGHTS = (600, 900, 1500)
+
+
+@pytest.fixture
+def books(monkeypatch):
+    """A fresh ledger and freight settlement state"""
+    monkeypatch.setattr(ledger, 'LEDGER', ledger.Ledger())
+    return ledger.LEDGER
+
+
+def _order(n, carrier, charge):
+    return {
+        'order_key': f"freight-{n}",
+        'invoice_number': f"INV-F{n}",
+        'customer_name': "Freight Test",
+        'total_value': 10000,
+        'current_date': datetime.combine(DAY, datetime.min.time()),
+        'carrier': carrier,
+        'costs': {'shipping': charge},
+    }
+
+
+def _ship(engine, key, day, weight):
+    return engine.ship(key, day, ORIGIN, 'NY', 'Standard', weight)
+
+
+def test_closed_load_charges_sum_to_its_cost():
+    engine = ShippingEngine()
+    charged = [_ship(engine, f"freight-{n}", DAY, weight)[1] for n, weight in enumerate(WEIGHTS)]
+    load = engine.load_of("freight-0")
+    assert sum(charged) > round(load.cost(), 2)  # earlier orders paid for a smaller load
+
+    _, _, settled = _ship(engine, "next-day", DAY + timedelta(days=1), 15)
+    assert set(settled) == {f"freight-{n}" for n in range(len(WEIGHTS))}
+    assert round(sum(settled.values()), 2) == round(load.cost(), 2)
+    assert all(settled[f"freight-{n}"] <= charge for n, charge in enumerate(charged))
+
+
+def test_past_days_are_pruned():
+    engine = ShippingEngine(retain_days=30)
+    _ship(engine, "old", DAY, 600)
+    _ship(engine, "new", DAY + timedelta(days=1), 600)
+    assert [day for day, _ in engine._open] == [DAY + timedelta(days=1)]
+    assert engine.load_of("old") is not None
+    _ship(engine, "later", DAY + timedelta(days=40), 600)
+    assert engine.load_of("old") is None
+    assert engine.load_of("new") is None
+    assert engine.load_of("later") is not None
+
+
+def test_invoiced_freight_is_credited_when_the_load_closes(books):
+    engine = ShippingEngine()
+    for n, weight in enumerate(WEIGHTS):
+        carrier, charge, _ = _ship(engine, f"freight-{n}", DAY, weight)
+        ledger.invoice(_order(n, carrier, charge))
+    _, _, settled = _ship(engine, "next-day", DAY + timedelta(days=1), 15)
+    ledger.settle_freight(settled, DAY + timedelta(days=1))
+
+    load = engine.load_of("freight-0")
+    assert books.balance('freight_revenue') == pytest.approx(-round(load.cost(), 2))
+    for n in range(len(WEIGHTS)):
+        assert books.invoice_summary(f"INV-F{n}")['invoiced'] == pytest.approx(10000 + settled[f"freight-{n}"])
+
+
+def test_order_invoiced_after_its_load_closed_is_billed_the_final_charge(books):
+    engine = ShippingEngine()
+    carrier, first, _ = _ship(engine, "freight-0", DAY, WEIGHTS[0])
+    _ship(engine, "freight-1", DAY, WEIGHTS[1])
+    _, _, settled = _ship(engine, "next-day", DAY + timedelta(days=1), 15)
+    ledger.settle_freight(settled, DAY + timedelta(days=1))
+
+    order = _order(0, carrier, first)
+    ledger.invoice(order)
+    assert settled["freight-0"] < first
+    assert order['costs']['shipping'] == pytest.approx(settled["freight-0"])
+    assert books.invoice_summary("INV-F0")['invoiced'] == pytest.approx(10000 + settled["freight-0"])
+
+
+def test_freight_no_load_can_settle_is_forgotten(books):
+    books.invoice_order("before-restart", "INV-R1", DAY, 10000, 500, consolidated=True)
+    books.settle_freight({"closed-early": 300.0}, DAY)
+    assert set(books._billed) == {"before-restart"} and set(books._settled) == {"closed-early"}
+
+    books.settle_freight({}, DAY + timedelta(days=1))
+    assert books._billed == {}
+    books.settle_freight({}, DAY + timedelta(days=ledger.SETTLED_RETAIN_DAYS + 1))
+    assert books._settled == {}
+
+
+def test_ship_step_raises_for_an_order_without_a_key_instead_of_keeping_the_flat_charge(books):
+    order = _order(0, None, 3500)
+    del order['order_key']
+    order.update(product='Mountain Bike (Black)', quantity=5, inventory_status="Out of Stock")
+    with pytest.raises(KeyError, match="order_key"):
+        shipping.ship(order)
+    assert order['costs']['shipping'] == 3500
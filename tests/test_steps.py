@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+
+import credit
+import inventory
+import mrp
+import scheduling
+import steps
+from engine import STEPS
+
+ENGINES = ('credit', 'inventory', 'ledger', 'mrp', 'numbering', 'quoting', 'scheduling', 'shipping')
+
+# Opens the first step's page in a fresh interpreter, with streamlit itself already loaded
+COLD_START = f"""
+import json, sys
+import streamlit
+import steps
+steps.page(1)
+print(json.dumps({{
+    'engines': [name for name in {ENGINES!r} if name in sys.modules],
+    'imports': steps.IMPORT_TIMES,
+}}))
+"""
+
+
+def test_opening_a_page_loads_no_engine():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", COLD_START], cwd=root, capture_output=True, text=True, check=True)
+    cold = json.loads(result.stdout.splitlines()[-1])
+    assert cold['engines'] == []
+    assert list(cold['imports']) == ['steps.inquiry']
+    assert cold['imports']['steps.inquiry'] < 0.5
+
+
+def test_every_step_resolves_to_a_page_and_its_transition():
+    for step in STEPS:
+        assert callable(steps.page(step).render)
+        handler = steps.transition(step)
+        assert handler is None or callable(handler)
+        assert steps.transition(step) is handler  # resolved once
+    assert steps.transition(3) is credit.check_credit
+    assert steps.transition(2) is None
+    assert {step for step in STEPS if steps.decision_key(step)} == {3, 4, 5}
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    """Fresh engines in place of the shared ones the steps hold capacity in"""
+    fresh = {
+        credit: ('CREDIT', credit.CreditEngine([("Acme", 100000, 0)])),
+        inventory: ('INVENTORY', inventory.InventoryEngine([("Test Bike", "Shelf", 10)])),
+        mrp: ('MRP', mrp.MRPEngine()),
+        scheduling: ('SCHEDULER', scheduling.ProductionScheduler()),
+    }
+    for module, (name, engine) in fresh.items():
+        monkeypatch.setattr(module, name, engine)
+    return {name: engine for name, engine in fresh.values()}
+
+
+def test_release_drops_every_hold_of_the_order(engines):
+    engines['CREDIT'].approve("Acme", 'held', 5000)
+    engines['INVENTORY'].reserve("Test Bike", 4, 'held')
+    engines['MRP'].set_demand('held', 'Mountain Bike (Black)', 10)
+    engines['SCHEDULER'].schedule('held', 10, date(2026, 3, 2), date(2026, 3, 20))
+    assert engines['SCHEDULER'].completion('held') is not None
+
+    steps.release('held')
+    assert engines['CREDIT'].account("Acme")['pending_orders'] == 0
+    assert engines['INVENTORY'].available("Test Bike") == 10
+    assert 'held' not in engines['MRP']._orders
+    assert engines['SCHEDULER'].completion('held') is None
+    steps.release('held')  # releasing again is harmless
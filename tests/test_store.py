@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from engine import new_order
+from store import SQLiteOrderStore
+
+
+def test_failed_flush_keeps_changes_for_the_next_one(tmp_path):
+    path = tmp_path / "orders.db"
+    store = SQLiteOrderStore(str(path), flush_interval=3600)
+    order = new_order()
+    store.put('a', order, 1)
+    store.flush()
+    order['quantity'] = 7
+    store.put('a', order, 2)
+    store.put('b', new_order(), 1)
+
+    write = store._write
+
+    def fail(pending, inserts):
+        raise sqlite3.OperationalError("database is locked")
+
+    store._write = fail
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    assert store._flushing == {}
+
+    order['quantity'] = 9
+    store.put('a', order, 3)
+    store._write = write
+    store.flush()
+    store._records.clear()
+    assert (store.get('a').quantity, store.get('a').current_step) == (9, 3)
+    rows = sqlite3.connect(path).execute("SELECT key, quantity, current_step FROM orders ORDER BY key").fetchall()
+    assert rows == [('a', 9, 3), ('b', 100, 1)]
+    store.close()
+
+
+def test_refresh_sees_what_another_process_wrote(tmp_path):
+    path = str(tmp_path / "orders.db")
+    app = SQLiteOrderStore(path, flush_interval=3600)
+    order = new_order()
+    app.put('a', order, 10)
+    app.flush()
+
+    cli = SQLiteOrderStore(path, flush_interval=3600)
+    paid = cli.get('a').to_order()
+    paid['amount_paid'] = 500
+    cli.put('a', paid, 10)
+    cli.close()
+
+    assert app.get('a').amount_paid != 500  # still the cached copy
+    assert app.refresh('a').amount_paid == 500
+    app.close()
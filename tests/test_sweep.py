@@ -0,0 +1,18 @@
+import numpy as np
+
+import sweep
+
+
+def test_margin_scales_with_quantity():
+    fixed = {'p_credit_approve': 1.0, 'p_in_stock': 0.0, 'p_materials_available': 0.0}
+    results, counts = sweep.run_sweep({'quantity': [50, 100, 200]}, fixed, orders=200)
+    assert counts == {'scenarios': 3, 'cached': 0, 'computed': 3}
+    margin = results[:, sweep.METRICS.index('mean_margin')]
+    np.testing.assert_allclose(margin / margin[1], [0.5, 1.0, 2.0])
+
+
+def test_default_unit_costs_match_the_app_order():
+    arguments = sweep.batch_arguments(sweep.grid({'quantity': [sweep.engine.QUANTITY]})[0])
+    assert arguments['product_cost'] == sweep.engine.PRODUCT_COST
+    assert arguments['production_cost'] == sweep.engine.PRODUCTION_COST
+    assert arguments['shipping_cost_from_production'] == sweep.engine.SHIPPING_COST_FROM_PRODUCTION